@@ -0,0 +1,218 @@
+import os
+import tempfile
+import time
+
+from pulp import LpStatusInfeasible, LpSolutionOptimal
+
+from cbc import write_mps, write_mip_start, run_cbc, start_cbc, read_solution
+
+# CBC 超过时间限制后允许的收尾时间（秒），之后强制结束子进程
+TIMEOUT_GRACE = 10
+
+
+class SolveResult:
+    """一次求解的结果：PuLP 的求解状态和解的状态、目标值，以及 {变量名: 取值}"""
+
+    def __init__(self, status, sol_status, objective, values):
+        self.status = status
+        self.sol_status = sol_status
+        self.objective = objective
+        self.values = values
+
+
+class SolverBackend:
+    """求解后端接口
+
+    solve(scheduler) 读取排课器的变量和编译好的约束行，返回 SolveResult；
+    排课器负责把取值写回变量并提取排课方案，换后端不影响其余流程。
+    reads_model 表示后端是否求解排课器的 PuLP 模型（scheduler.prob），
+    只有这样的后端才能看到 solve_pool 等直接加到模型上的约束。
+    """
+    name = None
+    reads_model = True
+
+    def solve(self, scheduler):
+        raise NotImplementedError
+
+
+class CbcBackend(SolverBackend):
+    """把 PuLP 模型写成 MPS 文件，调用 CBC 子进程求解
+
+    传入 ModelCache 时按课表和约束规则的内容哈希查找已编译的模型，命中则跳过建模；
+    排课器设置了初始解（warm_start_values）时写成 CBC 的初始解文件。
+    time_limit（秒）交给 CBC 的 sec 选项，到时返回已找到的最好解；CBC 超过
+    time_limit + TIMEOUT_GRACE 秒仍未结束时强制结束子进程。
+    gap 为相对 MIP 间隙（CBC 的 ratio 选项），最好解与下界的差不超过 gap×最好解时即停止；
+    threads 为 CBC 的线程数。progress(info) 在 CBC 报告新的可行解或下界时调用，
+    info 为 {'seconds', 'incumbent', 'bound'}，目标值与排课器的 objective_value 同口径。
+    """
+    name = 'cbc'
+
+    def __init__(self, cache=None, options=(), msg=False, time_limit=None, gap=None, threads=None, progress=None):
+        self.cache = cache
+        self.options = options
+        self.msg = msg
+        self.time_limit = time_limit
+        self.gap = gap
+        self.threads = threads
+        self.progress = progress
+
+    def solve(self, scheduler):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mps_path, names, mst_path = self._write_model(scheduler, tmp_dir)
+            return self._run(scheduler, tmp_dir, mps_path, names, mst_path)
+
+    def _write_model(self, scheduler, tmp_dir):
+        """写出（或从缓存取出）MPS 和初始解文件，返回 (MPS 路径, 变量名映射, 初始解路径或 None)"""
+        entry = None
+        if self.cache is not None:
+            key = self.cache.key(scheduler.fixed_schedule, scheduler.spec)
+            entry = self.cache.lookup(key)
+            if entry is None:
+                scheduler._build_model()
+                entry = self.cache.store(key, lambda path: self._write_mps(scheduler, path))
+        if entry is None:
+            scheduler._build_model()
+            mps_path = os.path.join(tmp_dir, 'model.mps')
+            entry = mps_path, {'names': self._write_mps(scheduler, mps_path)}
+
+        mps_path, meta = entry
+        mst_path = None
+        if scheduler.warm_start_values:
+            mst_path = os.path.join(tmp_dir, 'model.mst')
+            write_mip_start(mst_path, meta['names'], scheduler.warm_start_values)
+        return mps_path, meta['names'], mst_path
+
+    @staticmethod
+    def _write_mps(scheduler, path):
+        with scheduler.profiler.phase('write_mps'):
+            return write_mps(scheduler.prob, path)
+
+    def _cbc_options(self):
+        """CBC 选项和子进程的最长运行时间"""
+        options, timeout = list(self.options), None
+        if self.time_limit is not None:
+            options.append(f"sec {self.time_limit}")
+            timeout = self.time_limit + TIMEOUT_GRACE
+        if self.gap is not None:
+            options.append(f"ratio {self.gap}")
+        if self.threads is not None:
+            options.append(f"threads {self.threads}")
+        return options, timeout
+
+    def _run(self, scheduler, tmp_dir, mps_path, names, mst_path):
+        options, timeout = self._cbc_options()
+        sol_path = os.path.join(tmp_dir, 'model.sol')
+        progress = None
+        if self.progress is not None:
+            progress = self._progress_callback(scheduler._fixed_continuity_penalty())
+        with scheduler.profiler.phase('cbc'):
+            run_cbc(mps_path, sol_path, options=options, msg=self.msg, mip_start=mst_path, timeout=timeout,
+                    progress=progress)
+        with scheduler.profiler.phase('read_solution'):
+            return SolveResult(*read_solution(sol_path, names))
+
+    def _progress_callback(self, penalty):
+        """CBC 日志中的目标值不含只有正课的窗口，回调前加上这部分常数"""
+        def callback(info):
+            for key in ('incumbent', 'bound'):
+                if info[key] is not None:
+                    info[key] += penalty
+            self.progress(info)
+        return callback
+
+
+# PortfolioBackend 中各个 CBC 的设置：随机种子和分支、预处理策略各不相同，
+# 成员多于这里列出的设置时，其余成员只换随机种子
+PORTFOLIO_CONFIGS = [
+    (),
+    ('randomCbcSeed 1', 'randomSeed 1'),
+    ('strategy 2', 'randomCbcSeed 2'),
+    ('preprocess off', 'randomCbcSeed 3'),
+]
+# 检查各个 CBC 是否结束的间隔（秒）
+POLL_INTERVAL = 0.01
+
+
+class PortfolioBackend(CbcBackend):
+    """同时运行多个设置不同的 CBC 子进程（PORTFOLIO_CONFIGS），取最先证明最优（或无解）的结果，其余立即结束
+
+    同一个难的年级，不同的随机种子和策略求解时间可能相差很多，同时跑几个可以减少偶尔特别慢的情况。
+    size 为同时运行的 CBC 个数，默认取 CPU 核数（不超过 PORTFOLIO_CONFIGS 的个数）。
+    模型和初始解文件只写一次，各个 CBC 共用。都没有证明最优时（如都到了 time_limit）返回目标值最好的解。
+    winner 记录最近一次求解中胜出的成员的选项。不支持 progress。
+    """
+    name = 'portfolio'
+
+    def __init__(self, size=None, cache=None, options=(), time_limit=None, gap=None, threads=None):
+        super().__init__(cache=cache, options=options, time_limit=time_limit, gap=gap, threads=threads)
+        self.size = size or max(1, min(len(PORTFOLIO_CONFIGS), os.cpu_count() or 1))
+        self.winner = None
+
+    def configs(self):
+        """各成员额外的 CBC 选项"""
+        return [PORTFOLIO_CONFIGS[i] if i < len(PORTFOLIO_CONFIGS) else (f"randomCbcSeed {i}", f"randomSeed {i}")
+                for i in range(self.size)]
+
+    def _run(self, scheduler, tmp_dir, mps_path, names, mst_path):
+        with scheduler.profiler.phase('cbc'):
+            return self._run_members(tmp_dir, mps_path, names, mst_path)
+
+    def _run_members(self, tmp_dir, mps_path, names, mst_path):
+        options, timeout = self._cbc_options()
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        members = []
+        for i, config in enumerate(self.configs()):
+            sol_path = os.path.join(tmp_dir, f'model_{i}.sol')
+            members.append((start_cbc(mps_path, sol_path, options + list(config), mst_path), sol_path, config))
+
+        self.winner = None
+        results = []
+        running = list(members)
+        try:
+            while running:
+                for member in list(running):
+                    process, sol_path, config = member
+                    if process.poll() is None:
+                        continue
+                    running.remove(member)
+                    if process.returncode != 0 or not os.path.exists(sol_path):
+                        continue
+                    result = SolveResult(*read_solution(sol_path, names))
+                    if result.status == LpStatusInfeasible or result.sol_status == LpSolutionOptimal:
+                        self.winner = config
+                        return result
+                    results.append((result, config))
+                if deadline is not None and time.perf_counter() > deadline:
+                    raise RuntimeError(f"CBC 超过 {timeout} 秒未结束: {mps_path}")
+                if running:
+                    time.sleep(POLL_INTERVAL)
+        finally:
+            for process, _, _ in members:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+        # 都没有证明最优：取目标值最好的可行解
+        feasible = [(result, config) for result, config in results if result.objective is not None]
+        if feasible:
+            result, self.winner = min(feasible, key=lambda item: item[0].objective)
+            return result
+        if results:
+            result, self.winner = results[0]
+            return result
+        raise RuntimeError(f"CBC 求解失败: {mps_path}")
+
+
+def _native_backend(**options):
+    """NativeBackend 在 native.py 中，只在选用时才导入"""
+    from native import NativeBackend
+    return NativeBackend(**options)
+
+
+# 按名称选择后端，如 BACKENDS['native'](time_limit=10)
+BACKENDS = {
+    CbcBackend.name: CbcBackend,
+    'native': _native_backend,
+    PortfolioBackend.name: PortfolioBackend,
+}
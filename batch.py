@@ -0,0 +1,119 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pulp import LpStatus, LpSolutionOptimal
+
+from backends import BACKENDS
+from main import StudySessionScheduler, DEFAULT_CONSTRAINTS_FILE
+from validation import ScheduleValidator
+
+
+def solve_grade(classes_file, output_file, constraints_file=DEFAULT_CONSTRAINTS_FILE, backend='cbc',
+                time_limit=None, gap=None):
+    """求解一个年级并写出完整课表，返回该年级的汇总（在工作进程中运行）"""
+    summary = {
+        'grade': os.path.splitext(os.path.basename(classes_file))[0],
+        'classes_file': classes_file,
+        'output_file': None,
+        'status': None,
+        'optimal': False,
+        'objective': None,
+        'valid': None,
+        'continuous_count': None,
+        'science_continuous': None,
+        'seconds': None,
+        'error': None,
+    }
+    start = time.perf_counter()
+    try:
+        scheduler = StudySessionScheduler(classes_file, constraints_file)
+        summary['classes'] = scheduler.classes
+        schedule = scheduler.solve(backend=BACKENDS[backend](time_limit=time_limit, gap=gap))
+        summary['status'] = LpStatus[scheduler.prob.status]
+        if schedule is not None:
+            summary['optimal'] = scheduler.prob.sol_status == LpSolutionOptimal
+            summary['objective'] = scheduler.objective_value
+            result = ScheduleValidator(scheduler).validate(schedule)
+            summary['valid'] = result.valid
+            summary['continuous_count'] = result.continuous_count
+            summary['science_continuous'] = result.science_continuous
+
+            complete_schedule = scheduler.generate_complete_schedule(schedule)
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump({"study_schedule": schedule, "complete_schedule": complete_schedule.to_dict()},
+                          f, ensure_ascii=False, indent=2)
+            summary['output_file'] = output_file
+    except Exception as e:
+        summary['error'] = f"{type(e).__name__}: {e}"
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def solve_batch(directory, output_dir=None, constraints_file=DEFAULT_CONSTRAINTS_FILE, backend='cbc',
+                time_limit=None, workers=None, gap=None):
+    """并行求解目录下的所有年级课表（*.json）
+
+    每个年级在进程池的一个工作进程中求解，time_limit 限制每个年级的求解时间（到时取已找到的最好解），
+    gap 为相对 MIP 间隙；先完成的年级先输出，慢的年级不会挡住其他年级。每个年级写出 <年级>_complete_schedule.json，
+    全部完成后写出 summary.json，返回各年级汇总的列表（按文件名排序）。
+    """
+    output_dir = output_dir or directory
+    os.makedirs(output_dir, exist_ok=True)
+    files = sorted(glob.glob(os.path.join(directory, '*.json')))
+    files = [f for f in files if not os.path.basename(f).endswith('_complete_schedule.json')
+             and os.path.basename(f) != 'summary.json']
+    if not files:
+        print(f"{directory} 下没有课表文件")
+        return []
+
+    print(f"共 {len(files)} 个年级，开始求解...")
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for classes_file in files:
+            grade = os.path.splitext(os.path.basename(classes_file))[0]
+            output_file = os.path.join(output_dir, f"{grade}_complete_schedule.json")
+            future = pool.submit(solve_grade, classes_file, output_file, constraints_file, backend, time_limit,
+                                 gap)
+            futures[future] = classes_file
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries[futures[future]] = summary
+            if summary['error']:
+                print(f"❌ {summary['grade']}: {summary['error']}")
+            elif summary['output_file'] is None:
+                print(f"❌ {summary['grade']}: 求解状态 {summary['status']}（{summary['seconds']}秒）")
+            else:
+                quality = "最优" if summary['optimal'] else "可行（未证明最优）"
+                print(f"✅ {summary['grade']}: {quality}，连续上课{summary['continuous_count']}次"
+                      f"（{summary['seconds']}秒）")
+
+    summaries = [summaries[f] for f in files]
+    summary_file = os.path.join(output_dir, 'summary.json')
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(summaries, f, ensure_ascii=False, indent=2)
+    solved = sum(1 for s in summaries if s['output_file'])
+    print(f"\n完成 {solved}/{len(summaries)} 个年级，汇总已保存到 {summary_file}")
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量求解多个年级的自修课安排")
+    parser.add_argument('directory', help="课表目录，每个年级一个 classes.json 格式的文件")
+    parser.add_argument('-o', '--output', help="输出目录，默认与课表目录相同")
+    parser.add_argument('-c', '--constraints', default=DEFAULT_CONSTRAINTS_FILE, help="约束规则文件")
+    parser.add_argument('-b', '--backend', default='cbc', choices=sorted(BACKENDS), help="求解后端")
+    parser.add_argument('-t', '--time-limit', type=float, help="每个年级的求解时间上限（秒）")
+    parser.add_argument('-j', '--workers', type=int, help="并行的进程数，默认为CPU核数")
+    parser.add_argument('-g', '--gap', type=float, help="相对 MIP 间隙，如 0.05 表示与最优值相差5%%以内即可")
+    args = parser.parse_args()
+    solve_batch(args.directory, args.output, args.constraints, args.backend, args.time_limit, args.workers,
+                args.gap)
+
+
+if __name__ == "__main__":
+    main()
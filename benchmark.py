@@ -0,0 +1,280 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from backends import BACKENDS
+from main import StudySessionScheduler, DEFAULT_CONSTRAINTS_FILE
+from study_hours import count_weekly_hours_simple
+from timetable import SUBJECTS
+
+DAYS = ['周一', '周二', '周三', '周四', '周五', '周六']
+# 参与自修课的科目之外的正课，按需要取前几门
+EXTRA_COURSES = ['体育', '美术', '音乐', '信息', '劳动', '心理', '班会', '综合']
+# 每天各科的正课节数，取自 classes.json（七、八两个班相同），其余节次排 EXTRA_COURSES；
+# 自修课规则是按这样的分布定的（如英语午自修在周二周四，这两天英语只有1节），分布不同时可能无解。
+# 第6天与周三相同。
+DAILY_HOURS = [
+    {'语': 1, '数': 2, '英': 1, '科': 1, '社': 2},
+    {'语': 2, '数': 1, '英': 1, '科': 1, '社': 1},
+    {'语': 1, '数': 1, '英': 1, '科': 1, '社': 1},
+    {'语': 1, '数': 1, '英': 1, '科': 2, '社': 1},
+    {'语': 1, '数': 1, '英': 1, '科': 1, '社': 1},
+    {'语': 1, '数': 1, '英': 1, '科': 1, '社': 1},
+]
+DEFAULT_SIZES = [2, 10, 20, 30, 40]
+# 合成课表的生成方法改变时加1，只与同一版本生成的课表的结果对比
+GENERATOR_VERSION = 2
+DEFAULT_RESULTS_FILE = 'benchmark_results.jsonl'
+# 启动用时的目标（毫秒）：新进程中与 main.py 相同，从导入 main、读课表、编译规则到第一次调用求解器
+# （模型缓存命中），不含 Python 解释器本身的启动。其中导入 NumPy 和 PuLP 约 110-130ms，本身的部分约 10-20ms，
+# 机器繁忙时整体可达 180ms 左右，目标留出余量
+STARTUP_TARGET_MS = 200
+# 在新进程中运行，输出用时（毫秒）和是否加载了 pandas
+_STARTUP_SCRIPT = '''
+import sys, tempfile, time
+start = time.perf_counter()
+from main import StudySessionScheduler
+from backends import CbcBackend
+from model_cache import ModelCache
+scheduler = StudySessionScheduler(sys.argv[1])
+with tempfile.TemporaryDirectory() as tmp_dir:
+    CbcBackend(cache=ModelCache())._write_model(scheduler, tmp_dir)
+print((time.perf_counter() - start) * 1000, 'pandas' in sys.modules)
+'''
+
+
+def generate_timetable(n_classes, n_subjects=8, n_days=5, seed=0, clustered_days=1):
+    """生成 classes.json 格式的合成正课课表
+
+    n_subjects 为正课的课程数（SUBJECTS 的5门加上至少1门 EXTRA_COURSES），n_days 为5或6。
+    各科每天的节数按 DAILY_HOURS，每天的节次顺序随机；按文件顺序两个班一组共用老师，
+    组内第二个班一般是第一个班上下午对调，生成时保证老师不会同时在两个班上正课。
+    每组随机选 clustered_days 天，第二个班改为第一个班的课整体后移一节：同一位老师在两个班的课前后相连，
+    紧挨自修时段的两节课会让这位老师在该自修时段上课时连上3节，因此最优解的连续上课次数一般不为0（与实际课表相近）。
+    """
+    if not len(SUBJECTS) < n_subjects <= len(SUBJECTS) + len(EXTRA_COURSES):
+        raise ValueError(f"课程数应为{len(SUBJECTS) + 1}-{len(SUBJECTS) + len(EXTRA_COURSES)}: {n_subjects}")
+    if n_days not in (5, 6):
+        raise ValueError(f"上课日应为5或6天: {n_days}")
+    if not 0 <= clustered_days <= n_days:
+        raise ValueError(f"后移的天数应为0-{n_days}: {clustered_days}")
+    rng = np.random.RandomState(seed)
+    days = DAYS[:n_days]
+    extras = EXTRA_COURSES[:n_subjects - len(SUBJECTS)]
+
+    timetable = {}
+    for pair in range(0, n_classes, 2):
+        # 第二个班相对第一个班后移的节数：4为上下午对调，1为后移一节
+        shifts = [4] * n_days
+        for d in rng.choice(n_days, clustered_days, replace=False):
+            shifts[d] = 1
+        week = [_generate_day(rng, d, extras, shift) for d, shift in enumerate(shifts)]
+        for k, class_idx in enumerate(range(pair, min(pair + 2, n_classes))):
+            class_name = f"班级{class_idx + 1}"
+            timetable[class_name] = {}
+            for day, courses, shift in zip(days, week, shifts):
+                if k == 1:
+                    courses = courses[-shift:] + courses[:-shift]
+                timetable[class_name][day] = [{'period': i + 1, 'course': course} for i, course in enumerate(courses)]
+    return timetable
+
+
+def _generate_day(rng, d, extras, shift=4):
+    """一个班第 d 天的8节正课，后移 shift 节后同一节次不会是同一门课（两个班不冲突）
+
+    后移一节时还要求隔一节的两节课也不同，否则老师在两个班交替上课，只有正课就连上3节。
+    """
+    courses = [subject for subject, count in DAILY_HOURS[d].items() for _ in range(count)]
+    offset = rng.randint(len(extras))
+    courses += [extras[(offset + i) % len(extras)] for i in range(8 - len(courses))]
+    apart = [shift] if shift != 1 else [1, 2]
+
+    # 打乱直到第 p 节和第 p - shift 节（循环）不是同一门课
+    for _ in range(1000):
+        rng.shuffle(courses)
+        if all(courses[p] != courses[p - a] for p in range(8) for a in apart):
+            return courses
+    raise RuntimeError("无法生成不冲突的课表")
+
+
+def _timed(func, repeat):
+    """运行 repeat 次，返回 (最后一次的结果, 最短用时秒数)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def benchmark_size(n_classes, n_subjects=8, n_days=5, backend='cbc', constraints_file=DEFAULT_CONSTRAINTS_FILE,
+                   repeat=1, seed=0):
+    """生成一个规模的合成课表，测量建模、求解、验证、生成完整课表和课时统计的用时"""
+    timetable = generate_timetable(n_classes, n_subjects, n_days, seed)
+    record = {'classes': n_classes, 'subjects': n_subjects, 'days': n_days, 'backend': backend}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        classes_file = os.path.join(tmp_dir, 'classes.json')
+        with open(classes_file, 'w', encoding='utf-8') as f:
+            json.dump(timetable, f, ensure_ascii=False)
+
+        def build():
+            scheduler = StudySessionScheduler(classes_file, constraints_file)
+            scheduler._build_model()
+            return scheduler
+
+        scheduler, record['build'] = _timed(build, repeat)
+        # 求解会改动模型（写回取值），每次都用新建的排课器
+        schedulers = [scheduler] + [build() for _ in range(repeat - 1)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            schedule, record['solve'] = _timed(lambda: schedulers.pop().solve(backend=BACKENDS[backend]()), repeat)
+    record['status'] = 'Optimal' if schedule is not None else 'NoSolution'
+    record['objective'] = scheduler.objective_value
+    record['variables'] = int(scheduler.x.size + scheduler.continuous_x.size)
+    record['constraints'] = int(scheduler.presolved.stats['rows_after'])
+    if schedule is None:
+        return record
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        record['valid'], record['validate'] = _timed(lambda: scheduler.validate_constraints(schedule), repeat)
+    complete_schedule, record['complete_schedule'] = _timed(
+        lambda: scheduler.generate_complete_schedule(schedule), repeat)
+    _, record['study_hours'] = _timed(
+        lambda: count_weekly_hours_simple(schedule, scheduler.fixed_schedule, scheduler.teachers), repeat)
+    return record
+
+
+def measure_startup(classes_file='classes.json', repeat=5):
+    """在新的 Python 进程中测量启动用时（见 STARTUP_TARGET_MS），取 repeat 次中最短的（第一次会写入模型缓存）
+
+    返回 {'startup_ms', 'target_ms', 'pandas_loaded'}；只求解、不打印表格时不应加载 pandas。
+    """
+    best, pandas_loaded = None, False
+    root = os.path.dirname(os.path.abspath(__file__))
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT, os.path.abspath(classes_file)],
+                                capture_output=True, text=True, check=True, cwd=root).stdout.split()
+        milliseconds = float(output[0])
+        best = milliseconds if best is None else min(best, milliseconds)
+        pandas_loaded = pandas_loaded or output[1] == 'True'
+    return {'startup_ms': round(best, 1), 'target_ms': STARTUP_TARGET_MS, 'pandas_loaded': pandas_loaded}
+
+
+def display_startup(startup):
+    """打印启动用时和目标"""
+    status = "✅" if startup['startup_ms'] <= startup['target_ms'] else "❌"
+    print(f"{status} 启动到可以调用求解器: {startup['startup_ms']:.1f}ms（目标 {startup['target_ms']}ms）")
+    if startup['pandas_loaded']:
+        print("❌ 只求解时加载了 pandas")
+
+
+def _git_version():
+    """当前代码的 git 提交，不在 git 仓库中时为 None"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(results_file):
+    """读取之前保存的各次测试结果"""
+    if not os.path.exists(results_file):
+        return []
+    with open(results_file, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+PHASES = ['build', 'solve', 'validate', 'complete_schedule', 'study_hours']
+
+
+def display_results(run, previous=None):
+    """打印本次结果；给出上一次同参数的结果时，同时显示用时的变化"""
+    print(f"\n基准测试（版本 {run['version']}，后端 {run['backend']}，{run['subjects']}门课，{run['days']}天）:")
+    print("=" * 80)
+    earlier = {r['classes']: r for r in previous['results']} if previous else {}
+    header = f"{'班级数':>6}{'状态':>12}{'目标值':>8}" + ''.join(f"{phase:>20}" for phase in PHASES)
+    print(header)
+    for record in run['results']:
+        line = f"{record['classes']:>6}{record['status']:>12}{str(record['objective']):>8}"
+        for phase in PHASES:
+            seconds = record.get(phase)
+            cell = "-" if seconds is None else f"{seconds * 1000:.1f}ms"
+            old = earlier.get(record['classes'], {}).get(phase)
+            if seconds is not None and old:
+                cell += f"({seconds / old:.2f}x)"
+            line += f"{cell:>20}"
+        print(line)
+    if previous:
+        print(f"括号内为相对上一次（版本 {previous['version']}）的用时比例，大于1表示变慢")
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, n_subjects=8, n_days=5, backend='cbc', repeat=1, seed=0,
+                  constraints_file=DEFAULT_CONSTRAINTS_FILE, results_file=DEFAULT_RESULTS_FILE):
+    """依次测试各个规模，结果追加到 results_file（每次一行 JSON），并与上一次同参数的结果对比"""
+    run = {
+        'version': _git_version(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'backend': backend,
+        'subjects': n_subjects,
+        'days': n_days,
+        'seed': seed,
+        'generator': GENERATOR_VERSION,
+        'repeat': repeat,
+        'results': [],
+    }
+    for n_classes in sizes:
+        print(f"测试 {n_classes} 个班...")
+        run['results'].append(benchmark_size(n_classes, n_subjects, n_days, backend, constraints_file, repeat, seed))
+
+    same = [r for r in load_results(results_file)
+            if all(r.get(key) == run[key] for key in ('backend', 'subjects', 'days', 'seed', 'generator'))]
+    display_results(run, same[-1] if same else None)
+    with open(results_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run, ensure_ascii=False) + '\n')
+    print(f"\n结果已追加到 {results_file}")
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用合成课表测试各个规模下的建模、求解和统计用时")
+    parser.add_argument('-n', '--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="班级数，用逗号分隔")
+    parser.add_argument('-m', '--subjects', type=int, default=8, help="正课的课程数（6-13门）")
+    parser.add_argument('-d', '--days', type=int, default=5, choices=[5, 6], help="每周上课天数")
+    parser.add_argument('-b', '--backend', default='cbc', choices=sorted(BACKENDS), help="求解后端")
+    parser.add_argument('-r', '--repeat', type=int, default=1, help="每项重复次数，取最短用时")
+    parser.add_argument('-s', '--seed', type=int, default=0, help="生成课表的随机种子")
+    parser.add_argument('-c', '--constraints', default=DEFAULT_CONSTRAINTS_FILE, help="约束规则文件")
+    parser.add_argument('-o', '--output', default=DEFAULT_RESULTS_FILE, help="结果文件（JSON Lines，每次追加一行）")
+    parser.add_argument('--write-timetable', metavar='FILE', help="只生成一个规模（-n 的第一个）的课表写到文件，不做测试")
+    parser.add_argument('--startup', action='store_true', help="只测量 classes.json 的启动用时，与目标比较")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    if args.startup:
+        display_startup(measure_startup(repeat=max(args.repeat, 5)))
+        return
+
+    if args.write_timetable:
+        with open(args.write_timetable, 'w', encoding='utf-8') as f:
+            json.dump(generate_timetable(sizes[0], args.subjects, args.days, args.seed), f, ensure_ascii=False,
+                      indent=2)
+        print(f"课表已保存到 {args.write_timetable}")
+        return
+    run_benchmark(sizes, args.subjects, args.days, args.backend, args.repeat, args.seed, args.constraints,
+                  args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import os
+import re
+import subprocess
+import threading
+import time
+
+from pulp import (PULP_CBC_CMD, LpStatusOptimal, LpStatusNotSolved, LpSolutionIntegerFeasible,
+                  LpSolutionNoSolutionFound)
+
+
+def write_mps(prob, mps_path):
+    """把模型写成 MPS 文件，变量按 X0000000 的形式重命名
+
+    返回 {MPS中的变量名: 原变量名}，读取解时用来还原。
+    """
+    _, variables_names, _, _ = prob.writeMPS(mps_path, rename=1)
+    return {renamed: name for name, renamed in variables_names.items()}
+
+
+def write_mip_start(mst_path, names, values):
+    """写出 CBC 的初始解文件（-mips 参数），格式与 PuLP 的 warmStart 相同
+
+    names 为 {MPS中的变量名: 原变量名}，values 为 {原变量名: 初始值}，未给出的变量不写。
+    """
+    lines = ["Stopped on time - objective value 0\n"]
+    for i, (renamed, name) in enumerate(names.items()):
+        if name in values:
+            lines.append(f"{i:>7} {renamed} {values[name]:>15} {0:>23}\n")
+    with open(mst_path, 'w') as f:
+        f.writelines(lines)
+
+
+# CBC 日志中报告新的可行解和下界的行
+_NUMBER = r"(-?\d+(?:\.\d*)?(?:e[-+]?\d+)?)"
+_INCUMBENT = re.compile(r"Cbc00(?:04|12)I Integer solution of " + _NUMBER)
+_NODES = re.compile(r"Cbc0010I After \d+ nodes, \d+ on tree, " + _NUMBER + " best solution, best possible " + _NUMBER)
+_ROOT = re.compile(r"Cbc0013I At root node, .* objective from \S+ to " + _NUMBER)
+_CONTINUOUS = re.compile(r"Continuous objective value is " + _NUMBER)
+_COMPLETED = re.compile(r"Cbc0001I Search completed - best objective " + _NUMBER)
+# CBC 用 1e+50 表示还没有可行解
+_NO_SOLUTION = 1e49
+
+
+def parse_progress(line):
+    """从 CBC 日志的一行读出可行解（incumbent）和下界（bound），返回其中出现的项，无关的行返回 {}"""
+    match = _INCUMBENT.search(line) or _COMPLETED.search(line)
+    if match:
+        return {'incumbent': float(match.group(1))}
+    match = _NODES.search(line)
+    if match:
+        progress = {'bound': float(match.group(2))}
+        if float(match.group(1)) < _NO_SOLUTION:
+            progress['incumbent'] = float(match.group(1))
+        return progress
+    match = _ROOT.search(line) or _CONTINUOUS.search(line)
+    if match:
+        return {'bound': float(match.group(1))}
+    return {}
+
+
+def cbc_args(mps_path, sol_path, options=(), mip_start=None):
+    """CBC 的命令行参数，options 为 "sec 60" 这样的选项（不带 -）"""
+    args = [PULP_CBC_CMD(msg=False).path, mps_path]
+    if mip_start:
+        args += ['-mips', mip_start]
+    for option in options:
+        args.extend(f"-{option}".split())
+    args += ['-solve', '-printingOptions', 'all', '-solution', sol_path]
+    return args
+
+
+def start_cbc(mps_path, sol_path, options=(), mip_start=None):
+    """启动 CBC 子进程但不等待结束，返回 Popen；用于同时运行多个 CBC（见 PortfolioBackend）"""
+    return subprocess.Popen(cbc_args(mps_path, sol_path, options, mip_start), stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+
+
+def run_cbc(mps_path, sol_path, options=(), msg=False, mip_start=None, timeout=None, progress=None):
+    """直接调用 CBC 求解 MPS 文件，解写入 sol_path；mip_start 为初始解文件
+
+    timeout（秒）为子进程的最长运行时间，超时后结束 CBC 并报错；
+    正常的时间限制应通过 CBC 的 sec 选项给出，让它返回已找到的最好解。
+    progress(info) 在 CBC 日志报告新的可行解或下界时调用，info 为
+    {'seconds': 已用秒数, 'incumbent': 目前最好的目标值或 None, 'bound': 目标值下界或 None}。
+    """
+    args = cbc_args(mps_path, sol_path, options, mip_start)
+    if progress is None:
+        pipe = None if msg else subprocess.DEVNULL
+        try:
+            returncode = subprocess.run(args, stdout=pipe, stderr=pipe, stdin=subprocess.DEVNULL,
+                                        timeout=timeout).returncode
+        except subprocess.TimeoutExpired:
+            raise RuntimeError(f"CBC 超过 {timeout} 秒未结束: {' '.join(args)}")
+    else:
+        returncode = _run_with_progress(args, msg, timeout, progress)
+    if returncode != 0 or not os.path.exists(sol_path):
+        raise RuntimeError(f"CBC 求解失败: {' '.join(args)}")
+
+
+def _run_with_progress(args, msg, timeout, progress):
+    """逐行读取 CBC 的日志并回调进度，返回 CBC 的退出码"""
+    start = time.perf_counter()
+    state = {'seconds': 0.0, 'incumbent': None, 'bound': None}
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                               text=True)
+    killed = threading.Event()
+
+    def kill():
+        killed.set()
+        process.kill()
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+    try:
+        for line in process.stdout:
+            if msg:
+                print(line, end='')
+            update = parse_progress(line)
+            if update and any(state[key] != value for key, value in update.items()):
+                state.update(update, seconds=time.perf_counter() - start)
+                progress(dict(state))
+        returncode = process.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+        process.stdout.close()
+    if killed.is_set():
+        raise RuntimeError(f"CBC 超过 {timeout} 秒未结束: {' '.join(args)}")
+    return returncode
+
+
+def read_solution(sol_path, names):
+    """读取 CBC 的解文件，返回 (求解状态, 解的状态, 目标值, {原变量名: 取值})"""
+    status, sol_status = PULP_CBC_CMD(msg=False).get_status(sol_path)
+    objective = None
+    values = {}
+    with open(sol_path) as f:
+        header = f.readline()
+        if 'objective value' in header:
+            objective = float(header.split()[-1])
+        for line in f:
+            fields = line.split()
+            if len(fields) < 3:
+                break
+            if fields[0] == '**':
+                fields = fields[1:]
+            if fields[1] in names:
+                values[names[fields[1]]] = float(fields[2])
+    if sol_status == LpSolutionIntegerFeasible and any(abs(v - round(v)) > 1e-6 for v in values.values()):
+        # 在解线性松弛时就停下了（如 "Stopped on iterations"），PuLP 仍报告为可行解，但取值不是整数
+        status, sol_status = LpStatusNotSolved, LpSolutionNoSolutionFound
+    if status != LpStatusOptimal:
+        # 没有整数解时 CBC 写出的是线性松弛的目标值
+        objective = None
+    return status, sol_status, objective, values
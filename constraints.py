@@ -0,0 +1,379 @@
+import json
+
+import numpy as np
+
+from timetable import teacher_label
+
+# 约束方向，与 PuLP 的 LpConstraintLE/EQ/GE 取值一致
+LE, EQ, GE = -1, 0, 1
+SENSE_SYMBOLS = {LE: '<=', EQ: '=', GE: '>='}
+
+# 每行约束的上下文：班级、天、自修时段、科目、老师的下标，不适用时为 -1
+KEY_FIELDS = ('class', 'day', 'period', 'subject', 'teacher')
+# 不能设为软约束的规则类型：放宽后排课方案本身不成立（一个时段两门课、一位老师同时在两个班）
+HARD_RULE_TYPES = ('one_per_slot', 'teacher_conflict')
+
+
+def load_constraint_spec(spec_file):
+    """加载约束规则文件（constraints.json）"""
+    with open(spec_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def apply_soft_weights(spec, soft):
+    """返回把部分规则设为软约束后的规则（不修改 spec）
+
+    规则中的 "soft_weight" 为软约束的惩罚权重：违反时不再无解，而是每违反1节在目标中加上这个权重。
+    soft 为 {规则名称: 权重} 时设置列出的规则；为一个数时把 HARD_RULE_TYPES 以外、
+    还没有设置权重的规则都设为这个权重（放宽模式，总能得到排课方案）；为 None 时不改动。
+    """
+    if soft is None:
+        return spec
+    rules = [dict(rule) for rule in spec['rules']]
+    if isinstance(soft, dict):
+        names = [rule['name'] for rule in rules]
+        for name, weight in soft.items():
+            if name not in names:
+                raise ValueError(f"未知的约束规则: {name}")
+            rules[names.index(name)]['soft_weight'] = weight
+    else:
+        for rule in rules:
+            if rule['type'] not in HARD_RULE_TYPES:
+                rule.setdefault('soft_weight', soft)
+    return dict(spec, rules=rules)
+
+
+class CompiledConstraints:
+    """编译后的约束行
+
+    所有规则都编译成 x（班级×天×自修时段×科目 展平后）上的线性约束行，按 CSR 格式保存：
+    第 r 行为 sum(coefs[indptr[r]:indptr[r+1]] * x[indices[indptr[r]:indptr[r+1]]]) sense rhs[r]。
+    建模时逐行生成 PuLP 约束，验证时对 0/1 数组做同样的运算，两边共用同一份规则。
+    正课带来的常数项已移到右端，offset 记录移走的部分，便于报告实际节数。
+    weights[行] 为软约束的惩罚权重（所属规则的 soft_weight），硬约束为0。
+    """
+
+    def __init__(self, rules, family, indptr, indices, coefs, sense, rhs, offset, keys, context):
+        self.rules = rules
+        self.names = [rule['name'] for rule in rules]
+        self.family = family
+        self.indptr = indptr
+        self.indices = indices
+        self.coefs = coefs
+        self.sense = sense
+        self.rhs = rhs
+        self.offset = offset
+        self.keys = keys
+        self.weights = np.array([rule.get('soft_weight', 0) for rule in rules], dtype=np.float64)[family]
+        self._context = context
+
+    @property
+    def n_rows(self):
+        return len(self.rhs)
+
+    def row_name(self, r):
+        """约束行在模型中的名称"""
+        return f"f{self.family[r]:02d}_r{r}"
+
+    @property
+    def soft(self):
+        """每行是否为软约束"""
+        return self.weights > 0
+
+    def rows_of(self, name):
+        """某条规则编译出的所有行下标"""
+        return np.flatnonzero(self.family == self.names.index(name))
+
+    def activity(self, values):
+        """values 为 N×变量数 的0/1数组，返回 N×行数 的左端取值"""
+        if self.n_rows == 0:
+            return np.zeros((values.shape[0], 0), dtype=np.int32)
+        terms = values[:, self.indices].astype(np.int32) * self.coefs
+        return np.add.reduceat(terms, self.indptr[:-1], axis=1)
+
+    def violated(self, activity):
+        """根据左端取值判断每一行是否被违反"""
+        return (((self.sense == LE) & (activity > self.rhs))
+                | ((self.sense == GE) & (activity < self.rhs))
+                | ((self.sense == EQ) & (activity != self.rhs)))
+
+    def violation(self, activity):
+        """根据左端取值算出每一行违反的节数（超出上限或低于下限的部分），未违反为0"""
+        excess = np.maximum(activity - self.rhs, 0)
+        shortfall = np.maximum(self.rhs - activity, 0)
+        return np.where(self.sense == LE, excess, np.where(self.sense == GE, shortfall, excess + shortfall))
+
+    def describe(self, r, activity):
+        """生成第 r 行被违反时的说明"""
+        return (f"{self.label(r)}: 实际{activity + self.offset[r]}，"
+                f"要求{SENSE_SYMBOLS[self.sense[r]]}{self.rhs[r] + self.offset[r]}")
+
+    def requirement(self, r):
+        """第 r 行的要求，如 "班级7 周一 午自习 英: 要求=0" """
+        return f"{self.label(r)}: 要求{SENSE_SYMBOLS[self.sense[r]]}{self.rhs[r] + self.offset[r]}"
+
+    def label(self, r, skip=()):
+        """第 r 行涉及的班级、天、时段、科目或老师，如 "班级7 周一 午自习 英"；skip 中的字段不列出"""
+        return ' '.join(self._field_label(field, value) for field, value in zip(KEY_FIELDS, self.keys[r])
+                        if value >= 0 and field not in skip)
+
+    def _field_label(self, field, value):
+        ctx = self._context
+        if field == 'class':
+            return ctx.classes[value]
+        if field == 'day':
+            return ctx.days[value]
+        if field == 'period':
+            return ctx.study_periods[value]
+        if field == 'subject':
+            return ctx.subjects[value]
+        return teacher_label(ctx.teacher_names[value])
+
+    def figures(self, name, actual, field=None):
+        """某条规则各行的实际节数，actual 为各行的实际取值（见 ValidationResult.actual）
+
+        按 field（如 'subject'）以外的字段分组，返回 [(分组标签, [(field 的取值, 实际节数), ...])]，
+        如 ("班级7 早自习", [("语", 2), ("数", 0), ...])；field 为 None 时每行一组、列表中只有实际节数。
+        """
+        field_pos = None if field is None else KEY_FIELDS.index(field)
+        groups = {}
+        for r in self.rows_of(name):
+            entry = int(actual[r]) if field_pos is None else (self._field_label(field, self.keys[r][field_pos]),
+                                                              int(actual[r]))
+            # 老师的名称已包含科目
+            skip = (field, 'subject') if self.keys[r][KEY_FIELDS.index('teacher')] >= 0 else (field,)
+            groups.setdefault(self.label(r, skip=skip), []).append(entry)
+        return list(groups.items())
+
+
+class _CompileContext:
+    """编译规则时用到的班级、老师、正课索引等信息"""
+
+    def __init__(self, scheduler):
+        self.classes = scheduler.classes
+        self.days = scheduler.days
+        self.study_periods = scheduler.study_periods
+        self.subjects = scheduler.subjects
+        self.teachers = scheduler.teachers
+        self.teacher_names = list(scheduler.teachers)
+        self.class_idx = scheduler.class_idx
+        self.day_idx = scheduler.day_idx
+        self.period_idx = scheduler.period_idx
+        self.subject_idx = scheduler.subject_idx
+        self.fixed_index = scheduler.fixed_index
+        self.fixed_timeline = scheduler.fixed_timeline
+        self.shape = (len(self.classes), len(self.days), len(self.study_periods), len(self.subjects))
+
+    def var(self, c, d, p, s):
+        """班级、天、时段、科目下标（可广播的数组）对应的扁平变量下标"""
+        return np.ravel_multi_index(np.broadcast_arrays(c, d, p, s), self.shape)
+
+    def day_ids(self, days):
+        """规则中列出的天的下标，本课表中没有的天忽略"""
+        return [self.day_idx[day] for day in days if day in self.day_idx]
+
+    def teachers_of(self, subject=None):
+        """(老师下标, 任教班级下标数组)，可按科目筛选"""
+        for ti, (teacher, info) in enumerate(self.teachers.items()):
+            if subject is None or info['subject'] == subject:
+                yield ti, np.array([self.class_idx[c] for c in info['classes']], dtype=np.intp)
+
+
+class _RowBuilder:
+    """按块收集约束行，块内每行的非零元个数相同"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def add(self, family, index, coefs, sense, rhs, keys, offset=0):
+        """index: 行数×每行变量数 的变量下标；coefs: 每行共用或逐行的系数；keys: 行数×5"""
+        index = np.atleast_2d(np.asarray(index, dtype=np.intp))
+        if index.size == 0:
+            return
+        n_rows, width = index.shape
+        coefs = np.broadcast_to(np.asarray(coefs, dtype=np.int16), (n_rows, width))
+        keys = np.broadcast_to(np.asarray(keys, dtype=np.intp), (n_rows, len(KEY_FIELDS)))
+        self.chunks.append((family, index, coefs, sense, np.broadcast_to(rhs, (n_rows,)),
+                            np.broadcast_to(offset, (n_rows,)), keys))
+
+    def build(self, rules, context):
+        if not self.chunks:
+            empty = np.zeros(0, dtype=np.intp)
+            return CompiledConstraints(rules, empty, np.zeros(1, dtype=np.intp), empty,
+                                       np.zeros(0, dtype=np.int16), np.zeros(0, dtype=np.int8),
+                                       np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32),
+                                       np.zeros((0, len(KEY_FIELDS)), dtype=np.intp), context)
+        lengths = np.concatenate([np.full(chunk[1].shape[0], chunk[1].shape[1]) for chunk in self.chunks])
+        indptr = np.zeros(len(lengths) + 1, dtype=np.intp)
+        np.cumsum(lengths, out=indptr[1:])
+        return CompiledConstraints(
+            rules,
+            family=np.concatenate([np.full(chunk[1].shape[0], chunk[0], dtype=np.intp) for chunk in self.chunks]),
+            indptr=indptr,
+            indices=np.concatenate([chunk[1].ravel() for chunk in self.chunks]),
+            coefs=np.concatenate([chunk[2].ravel() for chunk in self.chunks]),
+            sense=np.concatenate([np.full(chunk[1].shape[0], chunk[3], dtype=np.int8) for chunk in self.chunks]),
+            rhs=np.concatenate([chunk[4] for chunk in self.chunks]).astype(np.int32),
+            offset=np.concatenate([chunk[5] for chunk in self.chunks]).astype(np.int32),
+            keys=np.concatenate([chunk[6] for chunk in self.chunks]),
+            context=context,
+        )
+
+
+def _keys(c=-1, d=-1, p=-1, s=-1, t=-1):
+    """把各字段（可为数组）拼成 行数×5 的上下文下标"""
+    return np.stack(np.broadcast_arrays(c, d, p, s, t), axis=-1)
+
+
+def _compile_period_count(rule, ctx, rows, family):
+    """某自修时段每班各科目的节数"""
+    p = ctx.period_idx[rule['period']]
+    classes = np.arange(len(ctx.classes))
+    days = np.arange(len(ctx.days))
+    for subject, count in rule['counts'].items():
+        s = ctx.subject_idx[subject]
+        rows.add(family, ctx.var(classes[:, None], days[None, :], p, s), 1, EQ, count, _keys(c=classes, p=p, s=s))
+
+
+def _compile_day_filter(rule, ctx, rows, family, allowed):
+    """某科目在某自修时段只能（allowed=True）或不能（allowed=False）排在列出的天"""
+    p = ctx.period_idx[rule['period']]
+    s = ctx.subject_idx[rule['subject']]
+    listed = set(ctx.day_ids(rule['days']))
+    days = np.array([d for d in range(len(ctx.days)) if (d in listed) != allowed], dtype=np.intp)
+    if len(days) == 0:
+        return
+    classes, days = np.meshgrid(np.arange(len(ctx.classes)), days, indexing='ij')
+    classes, days = classes.ravel(), days.ravel()
+    rows.add(family, ctx.var(classes, days, p, s)[:, None], 1, EQ, 0, _keys(c=classes, d=days, p=p, s=s))
+
+
+def _compile_allowed_days(rule, ctx, rows, family):
+    _compile_day_filter(rule, ctx, rows, family, allowed=True)
+
+
+def _compile_forbidden(rule, ctx, rows, family):
+    _compile_day_filter(rule, ctx, rows, family, allowed=False)
+
+
+def _compile_fixed(rule, ctx, rows, family):
+    """指定班级某天某自修时段固定为某科目，班级不存在时忽略"""
+    if rule['class'] not in ctx.class_idx or rule['day'] not in ctx.day_idx:
+        return
+    c, d = ctx.class_idx[rule['class']], ctx.day_idx[rule['day']]
+    p, s = ctx.period_idx[rule['period']], ctx.subject_idx[rule['subject']]
+    rows.add(family, [[ctx.var(c, d, p, s)]], 1, EQ, 1, _keys(c, d, p, s))
+
+
+def _compile_class_daily_limit(rule, ctx, rows, family):
+    """每班每天每门科目（正课+自修课）不超过 max 节"""
+    c, d, s = np.meshgrid(np.arange(len(ctx.classes)), np.arange(len(ctx.days)), np.arange(len(ctx.subjects)),
+                          indexing='ij')
+    c, d, s = c.ravel(), d.ravel(), s.ravel()
+    fixed = ctx.fixed_index.daily_counts[c, d, s].astype(np.int32)
+    index = ctx.var(c[:, None], d[:, None], np.arange(len(ctx.study_periods))[None, :], s[:, None])
+    rows.add(family, index, 1, LE, rule['max'] - fixed, _keys(c=c, d=d, s=s), offset=fixed)
+
+
+def _compile_teacher_daily_limit(rule, ctx, rows, family):
+    """每位老师每天（任教各班正课+自修课）不超过 max 节"""
+    days = np.arange(len(ctx.days))
+    periods = np.arange(len(ctx.study_periods))
+    for ti, class_ids in ctx.teachers_of():
+        s = ctx.subject_idx[ctx.teachers[ctx.teacher_names[ti]]['subject']]
+        fixed = ctx.fixed_timeline[ti].sum(axis=1).astype(np.int32)
+        index = ctx.var(class_ids[None, :, None], days[:, None, None], periods[None, None, :], s)
+        rows.add(family, index.reshape(len(days), -1), 1, LE, rule['max'] - fixed, _keys(d=days, s=s, t=ti),
+                 offset=fixed)
+
+
+def _compile_progress_balance(rule, ctx, rows, family):
+    """同一位老师任教的相邻两个班，某科目某时段的累积节数差任何一天都不超过 max_diff"""
+    p = ctx.period_idx[rule['period']]
+    s = ctx.subject_idx[rule['subject']]
+    pairs = [(ti, a, b) for ti, class_ids in ctx.teachers_of(rule['subject'])
+             for a, b in zip(class_ids, class_ids[1:])]
+    if not pairs:
+        return
+    ti, a, b = (np.array(column, dtype=np.intp) for column in zip(*pairs))
+    for d in range(len(ctx.days)):
+        days = np.arange(d + 1)
+        index = np.concatenate([ctx.var(a[:, None], days[None, :], p, s), ctx.var(b[:, None], days[None, :], p, s)],
+                               axis=1)
+        coefs = np.concatenate([np.ones(d + 1), -np.ones(d + 1)])
+        keys = _keys(d=d, p=p, s=s, t=ti)
+        rows.add(family, index, coefs, LE, rule['max_diff'], keys)
+        rows.add(family, index, -coefs, LE, rule['max_diff'], keys)
+
+
+def _compile_teacher_day_count(rule, ctx, rows, family):
+    """每位老师（某科目）在列出的天的某自修时段合计恰好 count 节"""
+    p = ctx.period_idx[rule['period']]
+    s = ctx.subject_idx[rule['subject']]
+    days = np.array(ctx.day_ids(rule['days']), dtype=np.intp)
+    for ti, class_ids in ctx.teachers_of(rule['subject']):
+        index = ctx.var(class_ids[:, None], days[None, :], p, s).reshape(1, -1)
+        rows.add(family, index, 1, EQ, rule['count'], _keys(p=p, s=s, t=ti))
+
+
+def _compile_teacher_conflict(rule, ctx, rows, family):
+    """同一位老师同一时段只能在一个班上课"""
+    d, p = np.meshgrid(np.arange(len(ctx.days)), np.arange(len(ctx.study_periods)), indexing='ij')
+    d, p = d.ravel(), p.ravel()
+    for ti, class_ids in ctx.teachers_of():
+        if len(class_ids) < 2:
+            continue
+        s = ctx.subject_idx[ctx.teachers[ctx.teacher_names[ti]]['subject']]
+        rows.add(family, ctx.var(class_ids[None, :], d[:, None], p[:, None], s), 1, LE, 1,
+                 _keys(d=d, p=p, s=s, t=ti))
+
+
+def _compile_one_per_slot(rule, ctx, rows, family):
+    """每班每个自修时段最多安排一门课"""
+    c, d, p = np.meshgrid(np.arange(len(ctx.classes)), np.arange(len(ctx.days)), np.arange(len(ctx.study_periods)),
+                          indexing='ij')
+    c, d, p = c.ravel(), d.ravel(), p.ravel()
+    index = ctx.var(c[:, None], d[:, None], p[:, None], np.arange(len(ctx.subjects))[None, :])
+    rows.add(family, index, 1, LE, 1, _keys(c=c, d=d, p=p))
+
+
+RULE_TYPES = {
+    'period_count': _compile_period_count,
+    'allowed_days': _compile_allowed_days,
+    'forbidden': _compile_forbidden,
+    'fixed': _compile_fixed,
+    'class_daily_limit': _compile_class_daily_limit,
+    'teacher_daily_limit': _compile_teacher_daily_limit,
+    'progress_balance': _compile_progress_balance,
+    'teacher_day_count': _compile_teacher_day_count,
+    'teacher_conflict': _compile_teacher_conflict,
+    'one_per_slot': _compile_one_per_slot,
+}
+
+
+def compile_constraints(spec, scheduler):
+    """把约束规则编译成约束行，scheduler 提供班级、老师和正课索引"""
+    context = _CompileContext(scheduler)
+    rows = _RowBuilder()
+    names = set()
+    for family, rule in enumerate(spec['rules']):
+        if rule['type'] not in RULE_TYPES:
+            raise ValueError(f"未知的约束类型: {rule['type']}")
+        if rule['name'] in names:
+            raise ValueError(f"约束名称重复: {rule['name']}")
+        if 'soft_weight' in rule:
+            if rule['type'] in HARD_RULE_TYPES:
+                raise ValueError(f"{rule['name']}（{rule['type']}）不能设为软约束")
+            if not rule['soft_weight'] > 0:
+                raise ValueError(f"{rule['name']}的 soft_weight 应大于0: {rule['soft_weight']}")
+        names.add(rule['name'])
+        RULE_TYPES[rule['type']](rule, context, rows, family)
+    return rows.build(spec['rules'], context)
+
+
+def continuity_weights(spec, teachers):
+    """每位老师连续上课的惩罚权重"""
+    continuity = spec.get('continuity', {})
+    weights = continuity.get('weights', {})
+    default = continuity.get('default_weight', 1)
+    return {teacher: weights.get(info['subject'], default) for teacher, info in teachers.items()}
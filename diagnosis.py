@@ -0,0 +1,102 @@
+import os
+import tempfile
+
+import numpy as np
+from pulp import (LpProblem, LpMinimize, LpVariable, LpAffineExpression, LpConstraint, LpStatusInfeasible,
+                  LpStatusOptimal)
+
+from cbc import write_mps, run_cbc, read_solution
+
+
+class FeasibilityModel:
+    """只含约束规则的可行性模型，用于找出互相冲突的规则
+
+    约束行只建一次（目标为0，不做预处理、不加对称性约束，每一行都对应规则本身），
+    之后每次检查用参与的行组成一个新的 LpProblem，再交给 CBC 判断有没有可行解。
+    变量是新建的0-1变量，不受排课器的预处理在 scheduler.x 上固定的上下界影响。
+    """
+
+    def __init__(self, scheduler):
+        self.compiled = scheduler.compiled
+        x_flat = [LpVariable(var.name, cat='Binary') for var in scheduler.x.ravel()]
+        # 目标中每个变量系数为0：拿掉约束行后变量仍写在 MPS 的列中
+        self.objective = LpAffineExpression([(var, 0) for var in x_flat])
+        indices, coefs = self.compiled.indices.tolist(), self.compiled.coefs.tolist()
+        self.rows = {}
+        for r, rhs in enumerate(self.compiled.rhs.tolist()):
+            lo, hi = self.compiled.indptr[r], self.compiled.indptr[r + 1]
+            expr = LpAffineExpression([(x_flat[i], coef) for i, coef in zip(indices[lo:hi], coefs[lo:hi])])
+            self.rows[r] = LpConstraint(expr, int(self.compiled.sense[r]), self.compiled.row_name(r), rhs)
+        self.checks = 0
+
+    def feasible(self, rows):
+        """只保留 rows 中的约束行时是否有可行解"""
+        prob = LpProblem("StudySession_Feasibility", LpMinimize)
+        prob += self.objective
+        for r in sorted(set(rows)):
+            prob += self.rows[r]
+        self.checks += 1
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mps_path = os.path.join(tmp_dir, 'feasibility.mps')
+            sol_path = os.path.join(tmp_dir, 'feasibility.sol')
+            names = write_mps(prob, mps_path)
+            run_cbc(mps_path, sol_path)
+            status, _, _, _ = read_solution(sol_path, names)
+        if status not in (LpStatusOptimal, LpStatusInfeasible):
+            raise RuntimeError(f"可行性检查没有得到结论: {status}")
+        return status == LpStatusOptimal
+
+
+def _quick_explain(feasible, background, candidates):
+    """QuickXplain：在 background 已经可行、background + candidates 不可行时，
+    返回 candidates 中一个极小的子集，使 background + 子集不可行（去掉其中任何一个都可行）
+
+    candidates 为若干组约束行，feasible(行列表) 判断这些行是否有可行解。只需 O(k log n) 次检查，
+    k 为结果的大小、n 为候选的个数，比逐个去掉的 n 次检查少得多。
+    """
+    def rows_of(items):
+        return [r for item in items for r in item[1]]
+
+    def explain(background, delta, items):
+        if delta and not feasible(background):
+            return []
+        if len(items) == 1:
+            return items
+        half = len(items) // 2
+        first, second = items[:half], items[half:]
+        second_conflict = explain(background + rows_of(first), rows_of(first), second)
+        first_conflict = explain(background + rows_of(second_conflict), rows_of(second_conflict), first)
+        return first_conflict + second_conflict
+
+    return explain(list(background), [], list(candidates))
+
+
+def diagnose(scheduler, rows=True):
+    """找出互相冲突的规则（不可约的不可行子集）
+
+    先以规则（constraints.json 中的每一条）为单位，找出一组互相冲突的规则：同时要求时无解，
+    去掉其中任意一条就有解。rows=True 时再在这些规则的约束行中找出互相冲突的具体行
+    （哪个班、哪天、哪个时段）。软约束总能满足，只检查硬约束。
+
+    返回 {'feasible': 所有规则同时满足时是否有解, 'rules': [规则名称, ...],
+    'rows': [行的说明, ...], 'checks': 可行性检查次数}
+    """
+    compiled = scheduler.compiled
+    model = FeasibilityModel(scheduler)
+    result = {'feasible': True, 'rules': [], 'rows': [], 'checks': 0}
+    families = [(family, np.flatnonzero((compiled.family == family) & ~compiled.soft).tolist())
+                for family in range(len(compiled.rules))]
+    families = [item for item in families if item[1]]
+    if model.feasible(np.flatnonzero(~compiled.soft)):
+        result['checks'] = model.checks
+        return result
+
+    result['feasible'] = False
+    conflict = _quick_explain(model.feasible, [], families)
+    result['rules'] = [compiled.names[family] for family, _ in conflict]
+    if rows:
+        candidates = [(r, [r]) for _, family_rows in conflict for r in family_rows]
+        result['rows'] = [f"{compiled.names[compiled.family[r]]}: {compiled.requirement(r)}"
+                          for r, _ in _quick_explain(model.feasible, [], candidates)]
+    result['checks'] = model.checks
+    return result
@@ -0,0 +1,192 @@
+import math
+import random
+import time
+
+import numpy as np
+
+from constraints import LE, GE
+from timetable import EMPTY, STUDY_SLOTS
+
+# 违反1节硬约束的代价，远大于连续上课和一般软约束的权重，搜索中相当于禁止
+HARD_WEIGHT = 1000
+# 按用时控制温度时，每隔多少次移动读一次时钟
+CLOCK_INTERVAL = 64
+
+
+def _full_windows(day):
+    """一天11个时段的上课班级数中，连续3个时段都有课的窗口数"""
+    return sum(1 for i in range(len(day) - 2) if day[i] and day[i + 1] and day[i + 2])
+
+
+class LocalSearch:
+    """对已有的自修课安排做模拟退火，降低连续上课的加权次数
+
+    移动有两种：同一个班的两个自修单元格互换科目，以及同一位老师任教的两个班在同一时段互换科目。
+    代价 = 连续上课加权次数（与 objective_value 同口径）+ 软约束惩罚 + HARD_WEIGHT × 硬约束违反节数。
+    每次移动只改动两个单元格，代价按增量计算，不重新验证整个安排：
+    - 约束行：按变量列出所在的行（CSR 转置），只更新这几个变量所在行的左端取值；
+    - 连续上课：每位老师每天11个时段的上课班级数，只重算受影响的老师当天的3节窗口。
+    """
+
+    def __init__(self, scheduler, seed=0):
+        self.scheduler = scheduler
+        self.rng = random.Random(seed)
+        compiled = scheduler.compiled
+        n_classes, n_days, n_periods, n_subjects = scheduler.x.shape
+        self.shape = (n_classes, n_days, n_periods)
+        self.n_subjects = n_subjects
+
+        # 每个变量所在的约束行和系数
+        order = np.argsort(compiled.indices, kind='stable')
+        entry_row = np.repeat(np.arange(compiled.n_rows), np.diff(compiled.indptr))
+        starts = np.searchsorted(compiled.indices[order], np.arange(scheduler.x.size + 1))
+        rows, coefs = entry_row[order].tolist(), compiled.coefs[order].tolist()
+        self.columns = [list(zip(rows[a:b], coefs[a:b])) for a, b in zip(starts[:-1], starts[1:])]
+        # 每行左端的上下界（LE 行没有下界，GE 行没有上界）
+        self.upper = np.where(compiled.sense == GE, np.inf, compiled.rhs).tolist()
+        self.lower = np.where(compiled.sense == LE, -np.inf, compiled.rhs).tolist()
+        self.row_weight = np.where(compiled.soft, compiled.weights, HARD_WEIGHT).tolist()
+
+        # 班级×科目 的任课老师，没有老师为 -1
+        self.teacher_of = [[-1] * n_subjects for _ in range(n_classes)]
+        for (class_name, subject), teacher in scheduler.class_teacher.items():
+            self.teacher_of[scheduler.class_idx[class_name]][scheduler.subject_idx[subject]] = \
+                scheduler.teacher_idx[teacher]
+        self.teacher_weight = [scheduler.continuity_weights[teacher] for teacher in scheduler.teachers]
+        self.study_slots = [slot for slot, pi in sorted(STUDY_SLOTS.items(), key=lambda item: item[1])]
+
+        # 同一位老师任教的两个班，可以在同一时段互换
+        pairs = set()
+        for teacher in scheduler.teachers:
+            class_ids = scheduler.teacher_class_ids[teacher].tolist()
+            pairs.update((a, b) for i, a in enumerate(class_ids) for b in class_ids[i + 1:])
+        self.pairs = sorted(pairs)
+        self.stats = {}
+
+    def _load(self, codes):
+        """由 班级×天×自修时段 的科目编号数组建立搜索状态"""
+        self.codes = codes.tolist()
+        onehot = (codes[..., None] == np.arange(self.n_subjects)).reshape(1, -1)
+        self.activity = self.scheduler.compiled.activity(onehot)[0].tolist()
+        # 老师×天×11时段 的上课班级数（正课 + 自修课）
+        self.timeline = self.scheduler.fixed_timeline.astype(np.int64).tolist()
+        for c, d, p in np.argwhere(codes != EMPTY).tolist():
+            t = self.teacher_of[c][codes[c, d, p]]
+            if t >= 0:
+                self.timeline[t][d][self.study_slots[p]] += 1
+        self.cost = (sum(self._row_cost(r, activity) for r, activity in enumerate(self.activity))
+                     + sum(_full_windows(day) * self.teacher_weight[t]
+                           for t, days in enumerate(self.timeline) for day in days))
+
+    def _row_cost(self, r, activity):
+        """第 r 行左端取 activity 时的代价：违反的节数乘以权重"""
+        if activity > self.upper[r]:
+            return (activity - self.upper[r]) * self.row_weight[r]
+        if activity < self.lower[r]:
+            return (self.lower[r] - activity) * self.row_weight[r]
+        return 0
+
+    def _var(self, c, d, p, s):
+        return ((c * self.shape[1] + d) * self.shape[2] + p) * self.n_subjects + s
+
+    def _changes(self, assignments):
+        """[(班级, 天, 时段, 新科目), ...] 引起的 {行: 左端变化} 和 {(老师, 天, 时段): 上课班级数变化}"""
+        rows, slots = {}, {}
+        for c, d, p, s in assignments:
+            for subject, sign in ((self.codes[c][d][p], -1), (s, 1)):
+                if subject == EMPTY:
+                    continue
+                for r, coef in self.columns[self._var(c, d, p, subject)]:
+                    rows[r] = rows.get(r, 0) + sign * coef
+                t = self.teacher_of[c][subject]
+                if t >= 0:
+                    key = (t, d, self.study_slots[p])
+                    slots[key] = slots.get(key, 0) + sign
+        return rows, slots
+
+    def _delta(self, rows, slots):
+        """按 _changes 的结果算出代价的变化，不修改状态"""
+        delta = 0
+        for r, change in rows.items():
+            if change:
+                activity = self.activity[r]
+                delta += self._row_cost(r, activity + change) - self._row_cost(r, activity)
+        days = {}
+        for (t, d, slot), change in slots.items():
+            if change:
+                days.setdefault((t, d), []).append((slot, change))
+        for (t, d), changes in days.items():
+            day = self.timeline[t][d]
+            new = list(day)
+            for slot, change in changes:
+                new[slot] += change
+            delta += (_full_windows(new) - _full_windows(day)) * self.teacher_weight[t]
+        return delta
+
+    def _commit(self, assignments, rows, slots, delta):
+        """接受移动：写入单元格、约束行左端和老师时间表"""
+        for c, d, p, s in assignments:
+            self.codes[c][d][p] = s
+        for r, change in rows.items():
+            self.activity[r] += change
+        for (t, d, slot), change in slots.items():
+            self.timeline[t][d][slot] += change
+        self.cost += delta
+
+    def _propose(self):
+        """随机选一个移动，返回两个单元格 [(班级, 天, 时段), (班级, 天, 时段)]，两格科目相同时返回 None"""
+        n_classes, n_days, n_periods = self.shape
+        rng = self.rng
+        if self.pairs and rng.random() < 0.5:
+            a, b = self.pairs[rng.randrange(len(self.pairs))]
+            d, p = rng.randrange(n_days), rng.randrange(n_periods)
+            cells = [(a, d, p), (b, d, p)]
+        else:
+            c = rng.randrange(n_classes)
+            cells = [(c,) + divmod(rng.randrange(n_days * n_periods), n_periods),
+                     (c,) + divmod(rng.randrange(n_days * n_periods), n_periods)]
+        (c1, d1, p1), (c2, d2, p2) = cells
+        if self.codes[c1][d1][p1] == self.codes[c2][d2][p2]:
+            return None
+        return cells
+
+    def run(self, codes, time_limit=5.0, iterations=None, start_temperature=2.0, end_temperature=0.05):
+        """从 codes（班级×天×自修时段 的科目编号数组）出发做模拟退火，返回找到的代价最小的数组
+
+        温度从 start_temperature 按几何级数降到 end_temperature：有 iterations 时按移动次数，
+        否则按 time_limit（秒）的用时比例。代价变大 delta 的移动以 exp(-delta/温度) 的概率接受。
+        """
+        start = time.perf_counter()
+        self._load(np.asarray(codes))
+        initial = self.cost
+        best, best_cost = [[list(day) for day in class_codes] for class_codes in self.codes], self.cost
+        ratio = end_temperature / start_temperature
+        moves = accepted = 0
+        while True:
+            if iterations is not None:
+                if moves >= iterations:
+                    break
+                progress = moves / iterations
+            elif moves % CLOCK_INTERVAL == 0:
+                progress = (time.perf_counter() - start) / time_limit
+                if progress >= 1:
+                    break
+            temperature = start_temperature * ratio ** progress
+            moves += 1
+
+            cells = self._propose()
+            if cells is None:
+                continue
+            (c1, d1, p1), (c2, d2, p2) = cells
+            assignments = [(c1, d1, p1, self.codes[c2][d2][p2]), (c2, d2, p2, self.codes[c1][d1][p1])]
+            rows, slots = self._changes(assignments)
+            delta = self._delta(rows, slots)
+            if delta <= 0 or self.rng.random() < math.exp(-delta / temperature):
+                self._commit(assignments, rows, slots, delta)
+                accepted += 1
+                if self.cost < best_cost:
+                    best, best_cost = [[list(day) for day in class_codes] for class_codes in self.codes], self.cost
+
+        self.stats = {'initial_cost': initial, 'cost': best_cost, 'moves': moves, 'accepted': accepted,
+                      'seconds': time.perf_counter() - start}
+        return np.array(best, dtype=np.int8)
@@ -1,384 +1,625 @@
+import copy
 import json
+import os
+import sys
 import itertools
-from pulp import *
-import pandas as pd
+import numpy as np
+from pulp import (LpProblem, LpMinimize, LpVariable, LpAffineExpression, LpConstraint, LpConstraintGE,
+                  LpConstraintLE, lpSum, LpStatus, LpStatusOptimal, LpStatusInfeasible, LpSolutionOptimal)
+# pandas 只用来打印表格，在各 display_* 方法中才导入，只求解并写 JSON 时不必加载
+
+from timetable import (SUBJECTS, STUDY_PERIODS, STUDY_SLOTS, FIXED_SLOTS, STUDY_WINDOWS, FIXED_WINDOWS,
+                       SLOTS_PER_DAY, SLOT_TYPES, SLOT_TYPE, LESSON, FixedScheduleIndex, CompleteSchedule,
+                       load_fixed_schedule, discover_classes, discover_days, discover_teachers,
+                       class_teacher_map, teacher_label, slot_label)
+from constraints import load_constraint_spec, apply_soft_weights, compile_constraints, continuity_weights
+from backends import CbcBackend
+from model_cache import ModelCache
+from presolve import presolve
+from profiling import Profiler, model_statistics, save_profile
+from validation import ScheduleValidator
+
+DEFAULT_CONSTRAINTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'constraints.json')
+# 验证报告中列出实际节数的规则类型，值为在同一行中展开的字段（见 CompiledConstraints.figures）
+FIGURE_FIELDS = {'period_count': 'subject', 'teacher_daily_limit': 'day', 'teacher_day_count': None}
+
+def load_study_schedule(filename):
+    """读取已有的自修课安排，支持 complete_schedule.json（取 study_schedule）和只含自修课的文件"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for key in ['study_schedule', '自修课安排']:
+        if key in data:
+            return data[key]
+    return data
 
 class StudySessionScheduler:
-    def __init__(self, classes_file):
-        """初始化排课系统"""
-        with open(classes_file, 'r', encoding='utf-8') as f:
-            self.fixed_schedule = json.load(f)
-        
-        self.classes = ['班级7', '班级8']
-        self.days = ['周一', '周二', '周三', '周四', '周五']
-        self.subjects = ['语', '数', '英', '科', '社']
-        self.study_periods = ['早自习', '午自习', '晚自习']
+    def __init__(self, classes_file, constraints_file=DEFAULT_CONSTRAINTS_FILE, profile=False, soft=None):
+        """初始化排课系统
+
+        班级、上课日和老师均从 classes.json 中识别，一次可以排整个年级；
+        排课规则来自 constraints_file，建模和验证共用同一份编译结果。
+        profile=True 时记录各阶段耗时，见 profile_report。
+        soft 把规则设为软约束（见 constraints.apply_soft_weights）：{规则名称: 权重}，
+        或一个权重表示放宽所有可以放宽的规则，此时总能得到排课方案，违反情况见 violation_report。
+        """
+        self.profiler = Profiler(enabled=profile)
+        with self.profiler.phase('load_schedule'):
+            self.fixed_schedule = load_fixed_schedule(classes_file)
+            self.spec = apply_soft_weights(load_constraint_spec(constraints_file), soft)
+            
+            self.classes = discover_classes(self.fixed_schedule)
+            self.days = discover_days(self.fixed_schedule)
+            self.subjects = list(SUBJECTS)
+            self.study_periods = list(STUDY_PERIODS)
+            self.teachers = discover_teachers(self.classes, self.fixed_schedule, self.subjects)
+            self.class_teacher = class_teacher_map(self.teachers)
+            
+            # 正课占用索引：班级×天×时段 的科目编号，以及每位老师每天各时段的正课班级数
+            self.fixed_index = FixedScheduleIndex(self.fixed_schedule, self.classes, self.days)
+            self.fixed_timeline = np.array([
+                self.fixed_index.teacher_timeline(info['classes'], info['subject'])
+                for info in self.teachers.values()
+            ], dtype=np.int16).reshape(len(self.teachers), len(self.days), -1)
         
         # 创建决策变量
         self.variables = {}
         self.continuous_vars = {}  # 连续上课的指示变量
-        self._create_variables()
+        self.slack_vars = {}  # 软约束行的松弛变量，建模时创建
+        with self.profiler.phase('create_variables'):
+            self._create_variables()
+        
+        # 编译约束规则
+        with self.profiler.phase('compile_constraints'):
+            self.compiled = compile_constraints(self.spec, self)
+            self.continuity_weights = continuity_weights(self.spec, self.teachers)
+        # 预处理：固定被规则确定的变量、删去冗余行、加对称性约束，建模时使用
+        with self.profiler.phase('presolve'):
+            self.presolved = presolve(self)
+        
+        # 向量化验证引擎，首次验证时创建
+        self.validator = None
         
         # 创建优化问题
         self.prob = LpProblem("StudySession_Schedule", LpMinimize)
+        self._model_built = False
+        self.objective_value = None
+        # CBC 初始解 {变量名: 取值}
+        self.warm_start_values = {}
         
     def _create_variables(self):
-        """创建决策变量：x[班级][天][时段][科目] = 1表示安排该课程"""
-        for class_name in self.classes:
-            for day in self.days:
-                for period in self.study_periods:
-                    for subject in self.subjects:
+        """创建决策变量：x[班级][天][时段][科目] = 1表示安排该课程
+
+        变量同时保存在按名称索引的 self.variables 和按整数下标索引的
+        self.x（班级×天×时段×科目 的对象数组）中。建约束时直接对 self.x 切片，
+        切片结果可直接传给 lpSum，不需要再拼接和查找变量名。
+        """
+        self.class_idx = {class_name: i for i, class_name in enumerate(self.classes)}
+        self.day_idx = {day: i for i, day in enumerate(self.days)}
+        self.period_idx = {period: i for i, period in enumerate(self.study_periods)}
+        self.subject_idx = {subject: i for i, subject in enumerate(self.subjects)}
+        self.teacher_idx = {teacher: i for i, teacher in enumerate(self.teachers)}
+        # 每位老师任教班级的下标，可直接用于 self.x 的花式索引
+        self.teacher_class_ids = {
+            teacher: np.array([self.class_idx[c] for c in info['classes']], dtype=np.intp)
+            for teacher, info in self.teachers.items()
+        }
+        
+        self.x = np.empty((len(self.classes), len(self.days), len(self.study_periods), len(self.subjects)),
+                          dtype=object)
+        for ci, class_name in enumerate(self.classes):
+            for di, day in enumerate(self.days):
+                for pi, period in enumerate(self.study_periods):
+                    for si, subject in enumerate(self.subjects):
                         var_name = f"{class_name}_{day}_{period}_{subject}"
-                        self.variables[var_name] = LpVariable(var_name, cat='Binary')
-        
-        # 创建连续上课的指示变量
-        continuous_periods = [
-            [0, 1, 2], [1, 2, 3], [2, 3, 4], [3, 4, 5], [4, 5, 6],
-            [5, 6, 7], [6, 7, 8], [7, 8, 9], [8, 9, 10]
-        ]
-        
-        for day in self.days:
-            for subject in self.subjects:
-                for i, periods in enumerate(continuous_periods):
-                    var_name = f"continuous_{day}_{subject}_{i}"
-                    self.continuous_vars[var_name] = LpVariable(var_name, cat='Binary')
+                        self.x[ci, di, pi, si] = self.variables[var_name] = LpVariable(var_name, cat='Binary')
+        
+        # 创建连续上课的指示变量：continuous_x[老师][天][窗口]，只为含自修时段的窗口（STUDY_WINDOWS）建变量，
+        # 变量名中的数字是窗口的起始时段；只含正课的窗口是常数，见 _fixed_continuity_penalty
+        self.continuous_x = np.empty((len(self.teachers), len(self.days), len(STUDY_WINDOWS)), dtype=object)
+        for ti, teacher in enumerate(self.teachers):
+            for di, day in enumerate(self.days):
+                for i, periods in enumerate(STUDY_WINDOWS):
+                    var_name = f"continuous_{day}_{teacher}_{periods[0]}"
+                    self.continuous_x[ti, di, i] = self.continuous_vars[var_name] = LpVariable(var_name, cat='Binary')
     
     def _count_fixed_courses(self, class_name, day, subject):
         """统计某班某天某科目的正课节数"""
-        count = 0
-        day_schedule = self.fixed_schedule[class_name][day]
-        for period_info in day_schedule:
-            if period_info['course'] == subject:
-                count += 1
-        return count
+        return self.fixed_index.count(class_name, day, subject)
     
-    def _is_teacher_teaching(self, day, period_index, subject):
-        """检查某个老师在指定时段是否在上课（考虑两个班级）"""
-        total_classes = 0
+    def _is_teacher_teaching(self, day, period_index, teacher):
+        """检查某个老师在指定时段是否在上课（考虑其任教的所有班级）"""
+        di = self.day_idx[day]
         
-        for class_name in self.classes:
-            if period_index == 0:  # 早自习
-                total_classes += self.variables[f"{class_name}_{day}_早自习_{subject}"]
-            elif period_index == 5:  # 午自习
-                total_classes += self.variables[f"{class_name}_{day}_午自习_{subject}"]
-            elif period_index == 10:  # 晚自习
-                total_classes += self.variables[f"{class_name}_{day}_晚自习_{subject}"]
-            elif 1 <= period_index <= 4:  # 上午正课
-                fixed_index = period_index - 1
-                if self.fixed_schedule[class_name][day][fixed_index]['course'] == subject:
-                    total_classes += 1
-            elif 6 <= period_index <= 9:  # 下午正课
-                fixed_index = period_index - 2
-                if self.fixed_schedule[class_name][day][fixed_index]['course'] == subject:
-                    total_classes += 1
-        
-        return total_classes
+        if period_index in STUDY_SLOTS:  # 早自习/午自习/晚自习
+            si = self.subject_idx[self.teachers[teacher]['subject']]
+            return lpSum(self.x[self.teacher_class_ids[teacher], di, STUDY_SLOTS[period_index], si])
+        
+        # 正课直接查索引（同一时段课表里排了他的两个班也只算在上课）
+        return int(self.fixed_timeline[self.teacher_idx[teacher], di, period_index] > 0)
 
     def add_constraints(self):
-        """添加所有约束条件"""
-        
-        # 约束1: 早自修语文、英语各4节，社会2节，平均分配到两个班级
-        for subject, total_sessions in [('语', 4), ('英', 4), ('社', 2)]:
-            # 总数约束
-            self.prob += lpSum([
-                self.variables[f"{class_name}_{day}_早自习_{subject}"]
-                for class_name in self.classes
-                for day in self.days
-            ]) == total_sessions
-            
-            # 平均分配约束
-            for class_name in self.classes:
-                expected = total_sessions // 2
-                self.prob += lpSum([
-                    self.variables[f"{class_name}_{day}_早自习_{subject}"]
-                    for day in self.days
-                ]) == expected
-        
-        # 早自修其他科目不安排
-        for subject in ['数', '科']:
-            self.prob += lpSum([
-                self.variables[f"{class_name}_{day}_早自习_{subject}"]
-                for class_name in self.classes
-                for day in self.days
-            ]) == 0
-        
-        # 约束2: 英语午自修要求周二周四
-        for class_name in self.classes:
-            for day in self.days:
-                if day not in ['周二', '周四']:
-                    self.prob += self.variables[f"{class_name}_{day}_午自习_英"] == 0
-        
-        # 约束3: 科学周二不能接晚托，数学周四不能接晚托
-        for class_name in self.classes:
-            self.prob += self.variables[f"{class_name}_周二_晚自习_科"] == 0
-            self.prob += self.variables[f"{class_name}_周四_晚自习_数"] == 0
-        
-        # 新增约束3+: 科学周二周四不能排午自修
-        for class_name in self.classes:
-            self.prob += self.variables[f"{class_name}_周二_午自习_科"] == 0
-            self.prob += self.variables[f"{class_name}_周四_午自习_科"] == 0
-        
-        # 新增约束3++: 周五8班晚自修确定为科学
-        self.prob += self.variables[f"班级8_周五_晚自习_科"] == 1
-        
-        # 由于8班周五晚自习确定为科学，其他科目不能在此时段安排
-        for subject in ['语', '数', '英', '社']:
-            self.prob += self.variables[f"班级8_周五_晚自习_{subject}"] == 0
-    
-        
-        # 约束4: 午自修/晚自修语、数、英、科、社各2节，平均分配到两个班
-        for subject in self.subjects:
-            for period in ['午自习', '晚自习']:
-                # 总数约束
-                self.prob += lpSum([
-                    self.variables[f"{class_name}_{day}_{period}_{subject}"]
-                    for class_name in self.classes
-                    for day in self.days
-                ]) == 2
-                
-                # 平均分配约束
-                for class_name in self.classes:
-                    self.prob += lpSum([
-                        self.variables[f"{class_name}_{day}_{period}_{subject}"]
-                        for day in self.days
-                    ]) == 1
-        
-        # 约束5: 每门课程全天总节数不超过4节（每班限制）
-        for class_name in self.classes:
-            for day in self.days:
-                for subject in self.subjects:
-                    fixed_count = self._count_fixed_courses(class_name, day, subject)
-                    study_sessions = lpSum([
-                        self.variables[f"{class_name}_{day}_{period}_{subject}"]
-                        for period in self.study_periods
-                    ])
-                    self.prob += fixed_count + study_sessions <= 4
-        
-        # 约束5+: 每个老师（科目）一天只能上4节课（两个班的正课+自修课总和）
-        for day in self.days:
-            for subject in self.subjects:
-                total_fixed = sum([
-                    self._count_fixed_courses(class_name, day, subject)
-                    for class_name in self.classes
-                ])
-                
-                total_study = lpSum([
-                    self.variables[f"{class_name}_{day}_{period}_{subject}"]
-                    for class_name in self.classes
-                    for period in self.study_periods
-                ])
-                
-                self.prob += total_fixed + total_study <= 4
-        
+        """添加所有约束条件
+
+        约束来自约束规则文件（constraints.json）编译出的约束行，这里逐行转成 PuLP 约束；
+        约束都按班级或按老师（任教班级组）建立，数量随班级数线性增长。
+        预处理删去的冗余行不进入模型，保留的行去掉已固定的变量，固定为1的部分移到右端。
+        软约束行再加上松弛变量，违反的部分计入目标。
+        """
+        compiled, presolved = self.compiled, self.presolved
+        x_flat = self.x.ravel()
+        free = (presolved.fixed < 0).tolist()
+        indices, coefs = compiled.indices.tolist(), compiled.coefs.tolist()
+        for r in np.flatnonzero(presolved.keep).tolist():
+            lo, hi = compiled.indptr[r], compiled.indptr[r + 1]
+            expr = LpAffineExpression([(x_flat[i], coef) for i, coef in zip(indices[lo:hi], coefs[lo:hi]) if free[i]]
+                                      + self.slack_vars.get(r, []))
+            rhs = int(compiled.rhs[r] - presolved.row_constant[r])
+            self.prob += LpConstraint(expr, int(compiled.sense[r]), compiled.row_name(r), rhs)
+        
+        # 对称性约束：可互换的班级按第一天的自修安排排序
+        for n, (index, cut_coefs) in enumerate(presolved.cuts):
+            expr = LpAffineExpression(list(zip(x_flat[index], cut_coefs.tolist())))
+            self.prob += LpConstraint(expr, LpConstraintGE, f"sym_{n}", 0)
         
-        # 新增约束: 语文早自习进度平衡约束
-        # 确保任何时候两个班级的语文早自习累积差异不超过1
-        days_list = ['周一', '周二', '周三', '周四', '周五']
+        # 软约束: 连续上课的指示变量约束
+        for ti, teacher in enumerate(self.teachers):
+            for di, day in enumerate(self.days):
+                for constraint in self._continuity_constraints(ti, di):
+                    self.prob += constraint
+
+    def _continuity_constraints(self, ti, di):
+        """某位老师某天的连续上课约束，约束名为 cont_老师下标_天下标_窗口_ge/le
+
+        正课部分是常数项，正课调整后按同样的名称重新生成即可替换模型中的旧约束。
+        第 i 个约束对应 STUDY_WINDOWS[i] 和指示变量 continuous_x[ti, di, i]。
+        """
+        teacher, day = list(self.teachers)[ti], self.days[di]
+
+        constraints = []
+        for i, periods in enumerate(STUDY_WINDOWS):
+            # 计算这3个时段该老师的总课时
+            total_in_periods = 0
+            for period_idx in periods:
+                total_in_periods += self._is_teacher_teaching(day, period_idx, teacher)
+
+            # 如果连续3节课都上，则连续指示变量为1
+            continuous_var = self.continuous_x[ti, di, i]
+            # total_in_periods >= 3 => continuous_var = 1
+            constraint = continuous_var >= (total_in_periods - 2) / 1
+            constraint.name = f"cont_{ti}_{di}_{i}_ge"
+            constraints.append(constraint)
+            # total_in_periods <= 2 => continuous_var = 0
+            constraint = continuous_var <= total_in_periods / 3
+            constraint.name = f"cont_{ti}_{di}_{i}_le"
+            constraints.append(constraint)
+        return constraints
+
+    def _create_slack_variables(self):
+        """为软约束行创建松弛变量 {行: [(变量, 在该行中的系数), ...]}
+
+        <= 行减去超出的部分（_over），>= 行加上不足的部分（_under），等式行两者都有；
+        松弛变量按所属规则的权重计入目标，取值就是违反的节数。
+        """
+        self.slack_vars = {}
+        for r in np.flatnonzero(self.compiled.soft).tolist():
+            name = f"slack_{self.compiled.row_name(r)}"
+            sense = self.compiled.sense[r]
+            terms = []
+            if sense <= 0:
+                terms.append((LpVariable(f"{name}_over", lowBound=0), -1))
+            if sense >= 0:
+                terms.append((LpVariable(f"{name}_under", lowBound=0), 1))
+            self.slack_vars[r] = terms
+
+    def _fixed_continuity_penalty(self):
+        """只含正课的窗口中连续上课的加权次数，是与自修课安排无关的常数"""
+        teaching = self.fixed_timeline > 0
+        penalty = 0
+        for ti, teacher in enumerate(self.teachers):
+            for periods in FIXED_WINDOWS:
+                penalty += self.continuity_weights[teacher] * int(teaching[ti][:, periods].all(axis=1).sum())
+        return penalty
+
+    def _build_model(self):
+        """建立目标函数和全部约束，同一个模型只建一次"""
+        if self._model_built:
+            return
         
-        for i, day in enumerate(days_list):
-            # 计算截至当前天两个班级的累积语文早自习次数
-            class7_cumulative = lpSum([
-                self.variables[f"班级7_{d}_早自习_语"]
-                for d in days_list[:i + 1]
-            ])
+        # 设置目标函数：最小化连续上课次数，按规则文件中的权重优先保护科学老师
+        with self.profiler.phase('build_objective'):
+            objective = 0
             
-            class8_cumulative = lpSum([
-                self.variables[f"班级8_{d}_早自习_语"]
-                for d in days_list[:i + 1]
-            ])
+            for ti, teacher in enumerate(self.teachers):
+                objective += self.continuity_weights[teacher] * lpSum(self.continuous_x[ti].ravel())
             
-            # 班级7不能领先班级8超过1节
-            self.prob += class7_cumulative <= class8_cumulative + 1
+            # 软约束：违反的节数乘以规则的权重
+            self._create_slack_variables()
+            for r, terms in self.slack_vars.items():
+                objective += float(self.compiled.weights[r]) * lpSum(var for var, _ in terms)
             
-            # 班级8不能领先班级7超过1节
-            self.prob += class8_cumulative <= class7_cumulative + 1
-        
+            self.prob += objective
             
-        # 软约束: 连续上课的指示变量约束
-        continuous_periods = [
-            [0, 1, 2],  [3, 4, 5], [4, 5, 6],
-            [5, 6, 7],  [8, 9, 10]
-        ]
-        
-        for day in self.days:
-            for subject in self.subjects:
-                for i, periods in enumerate(continuous_periods):
-                    # 计算这3个时段该老师的总课时
-                    total_in_periods = 0
-                    for period_idx in periods:
-                        total_in_periods += self._is_teacher_teaching(day, period_idx, subject)
-                    
-                    # 如果连续3节课都上，则连续指示变量为1
-                    continuous_var = self.continuous_vars[f"continuous_{day}_{subject}_{i}"]
-                    # total_in_periods >= 3 => continuous_var = 1
-                    self.prob += continuous_var >= (total_in_periods - 2) / 1
-                    # total_in_periods <= 2 => continuous_var = 0
-                    self.prob += continuous_var <= total_in_periods / 3
-        
-        # # 约束6: 社会不能参加周三的晚自习
-        # for class_name in self.classes:
-        #     self.prob += self.variables[f"{class_name}_周三_晚自习_社"] == 0
-        # 新增约束6: 社会必须有一节晚自习在周三，另一节则在周二或周四
-        # 确保社会晚自习总共2节中，有1节在周三
-        self.prob += lpSum([
-            self.variables[f"{class_name}_周三_晚自习_社"]
-            for class_name in self.classes
-        ]) == 1
-        
-        # 确保社会晚自习剩余的1节在周二或周四
-        self.prob += lpSum([
-            self.variables[f"{class_name}_{day}_晚自习_社"]
-            for class_name in self.classes
-            for day in ['周二', '周四']
-        ]) == 1
-        
-        # 约束7: 两个班级同一时间段不能上同一门课
-        for day in self.days:
-            for period in self.study_periods:
-                for subject in self.subjects:
-                    self.prob += lpSum([
-                        self.variables[f"{class_name}_{day}_{period}_{subject}"]
-                        for class_name in self.classes
-                    ]) <= 1
-        
-        # 每个时段每个班级只能安排一门课
-        for class_name in self.classes:
-            for day in self.days:
-                for period in self.study_periods:
-                    self.prob += lpSum([
-                        self.variables[f"{class_name}_{day}_{period}_{subject}"]
-                        for subject in self.subjects
-                    ]) <= 1
-
-    def solve(self):
-        """求解优化问题"""
-        # 设置目标函数：最小化连续上课次数，优先保护科学老师
-        objective = 0
-        
-        continuous_periods = [
-            [0, 1, 2], [1, 2, 3], [2, 3, 4], [3, 4, 5], [4, 5, 6],
-            [5, 6, 7], [6, 7, 8], [7, 8, 9], [8, 9, 10]
-        ]
-        
-        for day in self.days:
-            for subject in self.subjects:
-                for i, periods in enumerate(continuous_periods):
-                    continuous_var = self.continuous_vars[f"continuous_{day}_{subject}_{i}"]
-                    if subject == '科':  # 科学老师优先保护，权重更高
-                        objective += 10 * continuous_var
-                    else:
-                        objective += 1 * continuous_var
-        
-        self.prob += objective
+            # 预处理确定的变量用上下界固定，CBC 读入模型时直接消去
+            for var, value in zip(self.x.ravel(), self.presolved.fixed.tolist()):
+                var.lowBound, var.upBound = (0, 1) if value < 0 else (value, value)
         
         # 添加约束
-        self.add_constraints()
+        with self.profiler.phase('add_constraints'):
+            self.add_constraints()
+        self._model_built = True
+
+    def _rebuild_problem(self, replace=(), remove=()):
+        """按名称替换（replace 为新的 LpConstraint）或去掉（remove 为名称）模型中的约束
+
+        PuLP 不支持替换或删除已加入的约束，这里用原来的目标和改过的约束重建 LpProblem；
+        求解状态照旧保留，变量的取值保存在变量上，不受影响。
+        """
+        replace = {constraint.name: constraint for constraint in replace}
+        prob = LpProblem(self.prob.name, self.prob.sense)
+        prob += self.prob.objective
+        for constraint in self.prob.constraints():
+            if constraint.name not in remove:
+                prob += replace.get(constraint.name, constraint)
+        prob.assignStatus(self.prob.status, self.prob.sol_status)
+        self.prob = prob
+
+    def set_warm_start(self, schedule):
+        """把已有的自修课安排设为 CBC 的初始解
+
+        安排中缺少的班级或天不设初始值；班级齐全时连续上课指示变量也按该安排算出，
+        这样 CBC 一开始就有完整的可行解（若该安排仍满足当前规则）。
+        """
+        self.warm_start_values = {}
+        for ci, class_name in enumerate(self.classes):
+            for di, day in enumerate(self.days):
+                day_schedule = schedule.get(class_name, {}).get(day)
+                if day_schedule is None:
+                    continue
+                for pi, period in enumerate(self.study_periods):
+                    for si, subject in enumerate(self.subjects):
+                        var = self.x[ci, di, pi, si]
+                        var.setInitialValue(1 if day_schedule.get(period) == subject else 0)
+                        self.warm_start_values[var.name] = var.varValue
+        
+        complete = all(day in schedule.get(class_name, {}) for class_name in self.classes for day in self.days)
+        if complete:
+            if self.validator is None:
+                self.validator = ScheduleValidator(self)
+            windows = self.validator.validate(schedule).details['continuous_windows']
+            windows = windows[..., [periods[0] for periods in STUDY_WINDOWS]]
+            for var, value in zip(self.continuous_x.ravel(), windows.ravel()):
+                var.setInitialValue(int(value))
+                self.warm_start_values[var.name] = var.varValue
+
+    def solve(self, cache=None, warm_start=None, backend=None, time_limit=None, gap=None, threads=None,
+              progress=None, portfolio=None, quiet=False):
+        """求解优化问题
+
+        backend 为求解后端（见 backends.py），默认用 CbcBackend 调用 CBC；
+        NativeBackend（native.py）在进程内搜索，小规模的年级不必启动 CBC 子进程。
+        传入 ModelCache 时按课表和约束规则的内容哈希查找已编译的模型（MPS 文件），
+        命中则跳过建模直接交给 CBC；未命中则建模后写入缓存。
+        warm_start 为已有的自修课安排（如上一次的 study_schedule），作为 CBC 的初始解。
+
+        time_limit（秒）、gap（相对 MIP 间隙）、threads（CBC 线程数）和 progress（进度回调，
+        参数为 {'seconds', 'incumbent', 'bound'}）用于默认的 CbcBackend，自己传入 backend 时在后端上设置。
+        portfolio=N 时改用 PortfolioBackend 同时运行 N 个设置不同的 CBC，取最先证明最优的结果（不支持 progress）。
+        到达时间上限或间隙时返回已找到的最好解，此时 prob.sol_status 为 LpSolutionIntegerFeasible；
+        一个可行解都没找到才返回 None。有软约束时 objective_value 还包括软约束的惩罚。quiet=True 时不打印求解状态。
+        """
+        if warm_start is not None:
+            self.set_warm_start(warm_start)
+        if backend is not None:
+            if any(option is not None for option in (time_limit, gap, threads, progress, portfolio)):
+                raise ValueError("传入 backend 时，time_limit、gap、threads、progress 和 portfolio 应在后端上设置")
+        elif portfolio is not None:
+            if progress is not None:
+                raise ValueError("portfolio 求解不支持 progress")
+            from backends import PortfolioBackend
+            backend = PortfolioBackend(size=portfolio, cache=cache, time_limit=time_limit, gap=gap, threads=threads)
+        else:
+            backend = CbcBackend(cache=cache, time_limit=time_limit, gap=gap, threads=threads, progress=progress)
+        
+        result = backend.solve(self)
+        # 目标值加上只含正课的窗口，与验证和老师周课时统计中的连续上课次数一致
+        self.objective_value = None if result.objective is None else result.objective + self._fixed_continuity_penalty()
         
-        # 求解
-        self.prob.solve(PULP_CBC_CMD(msg=0))
+        # 把解写回变量（缓存命中时模型没有建立，直接写到变量上）
+        with self.profiler.phase('assign_values'):
+            slack = (var for terms in self.slack_vars.values() for var, _ in terms)
+            for var in itertools.chain(self.variables.values(), self.continuous_vars.values(), slack):
+                var.varValue = result.values.get(var.name, 0.0)
+            self.prob.assignStatus(result.status, result.sol_status)
         
         if self.prob.status == LpStatusOptimal:
-            return self._extract_solution()
+            if self.prob.sol_status != LpSolutionOptimal and not quiet:
+                print(f"未证明最优（达到时间上限或间隙），使用已找到的最好解，目标值 {self.objective_value}")
+            with self.profiler.phase('extract_solution'):
+                return self._extract_solution()
         else:
-            print(f"求解状态: {LpStatus[self.prob.status]}")
+            if not quiet:
+                print(f"求解状态: {LpStatus[self.prob.status]}")
+                if self.prob.status == LpStatusInfeasible:
+                    print("可调用 diagnose_infeasibility() 找出互相冲突的规则")
             return None
-    
+
+    def update_fixed_slot(self, class_name, day, period, course, resolve=True, cache=None, backend=None):
+        """修改一节正课（period 为第1-8节）并增量重排自修课
+
+        只更新受影响的部分：正课索引和相关老师的时间表、右端常数变化的每日上限约束行，
+        以及相关老师当天的连续上课约束；模型其余部分原样保留。之后以当前解为初始解重新求解，
+        返回新的自修课安排（resolve=False 时只修改模型，返回 None）。
+        """
+        if class_name not in self.class_idx:
+            raise ValueError(f"未知班级: {class_name}")
+        if day not in self.day_idx:
+            raise ValueError(f"未知上课日: {day}")
+        if not 1 <= period <= len(FIXED_SLOTS):
+            raise ValueError(f"正课节次应为1-{len(FIXED_SLOTS)}: {period}")
+
+        # 当前解作为重新求解的初始解
+        current = self._extract_solution() if self.prob.status == LpStatusOptimal else None
+
+        old_course = self.fixed_index.set_course(class_name, day, period, course)
+        self.fixed_schedule[class_name][day][period - 1] = {'period': period, 'course': course}
+        if old_course == course:
+            return current if resolve else None
+
+        # 受影响的老师：该班原科目和新科目的任课老师
+        di = self.day_idx[day]
+        affected = [self.teacher_idx[self.class_teacher[(class_name, subject)]]
+                    for subject in (old_course, course) if (class_name, subject) in self.class_teacher]
+        teachers = list(self.teachers)
+        for ti in affected:
+            info = self.teachers[teachers[ti]]
+            self.fixed_timeline[ti] = self.fixed_index.teacher_timeline(info['classes'], info['subject'])
+
+        previous, previous_presolved = self.compiled, self.presolved
+        self.compiled = compile_constraints(self.spec, self)
+        self.presolved = presolve(self)
+        self.validator = None
+
+        if self._model_built:
+            if (np.array_equal(previous.indptr, self.compiled.indptr)
+                    and self.presolved.same_structure(previous_presolved)):
+                for r in np.flatnonzero((previous.rhs != self.compiled.rhs) & self.presolved.keep):
+                    rhs = self.compiled.rhs[r] - self.presolved.row_constant[r]
+                    self.prob.get_constraint_by_name(self.compiled.row_name(r)).changeRHS(int(rhs))
+                self._rebuild_problem(replace=[constraint for ti in affected
+                                               for constraint in self._continuity_constraints(ti, di)])
+            else:
+                # 约束行的结构或预处理结果变了（规则依赖的正课分布改变），整个模型重建
+                self.prob = LpProblem("StudySession_Schedule", LpMinimize)
+                self._model_built = False
+
+        if not resolve:
+            return None
+        return self.solve(cache=cache, warm_start=current, backend=backend)
+
+    def solve_pool(self, k, gap=0, backend=None, symmetric=False):
+        """求出最多 k 个不同的自修课安排，目标值不超过最优值 + gap（连续上课加权次数）
+
+        模型只建一次：先求最优解，再加上目标值上限，每找到一个安排就加一条排除它的约束
+        （no-good cut）后重新求解，直到凑满 k 个或没有更多满足条件的安排。
+        加上的约束在返回前去掉，不影响之后的 solve。后端需要求解 PuLP 模型（reads_model，如 CBC），
+        NativeBackend 看不到这些约束，会引发 ValueError。
+        后端带 ModelCache 时只有第一次求解使用缓存：缓存的键不包括这里加上的约束，之后的求解都重新写出模型。
+
+        预处理的对称性约束让互相对称的班级（组）互换得到的安排只保留一个，默认这些安排不会重复列出；
+        symmetric=True 时求解期间去掉对称性约束，互换班级得到的安排也作为不同的方案返回。
+
+        返回按目标值排列的列表，每项为 {'schedule', 'objective', 'continuous_count',
+        'science_continuous', 'teacher_continuous': {老师: 次数}}
+        """
+        if backend is None:
+            backend = CbcBackend()
+        if not backend.reads_model:
+            raise ValueError(f"{type(backend).__name__} 不求解 PuLP 模型，不能用于 solve_pool")
+        if self.validator is None:
+            self.validator = ScheduleValidator(self)
+
+        self._build_model()
+        pool = []
+        added = []
+        symmetry = []
+        if symmetric:
+            symmetry = [constraint for constraint in self.prob.constraints() if constraint.name.startswith('sym_')]
+            self._rebuild_problem(remove={constraint.name for constraint in symmetry})
+        try:
+            schedule = self.solve(backend=backend)
+            while schedule is not None:
+                result = self.validator.validate(schedule)
+                pool.append({
+                    'schedule': schedule,
+                    'objective': self.objective_value,
+                    'continuous_count': result.continuous_count,
+                    'science_continuous': result.science_continuous,
+                    'teacher_continuous': dict(zip(self.teachers, result.details['teacher_continuous'].tolist())),
+                })
+                if len(pool) >= k:
+                    break
+
+                if len(pool) == 1:
+                    name = "pool_gap"
+                    # 模型的目标不含只有正课的窗口，上限要扣掉这部分常数
+                    limit = self.objective_value - self._fixed_continuity_penalty() + gap
+                    self.prob += LpConstraint(self.prob.objective.copy(), LpConstraintLE, name, limit)
+                    added.append(name)
+
+                # 排除刚找到的安排：至少有一个变量取值不同
+                chosen = [var for var in self.x.ravel() if var.varValue > 0.5]
+                others = [var for var in self.x.ravel() if var.varValue <= 0.5]
+                name = f"pool_cut_{len(pool)}"
+                self.prob += LpConstraint(lpSum(others) - lpSum(chosen), LpConstraintGE, name, 1 - len(chosen))
+                added.append(name)
+
+                if getattr(backend, 'cache', None) is not None:
+                    backend = copy.copy(backend)
+                    backend.cache = None
+                schedule = self.solve(backend=backend)
+        finally:
+            self._rebuild_problem(remove=set(added))
+            for constraint in symmetry:
+                self.prob += constraint
+        return pool
+
+    def improve_schedule(self, schedule, time_limit=5.0, iterations=None, seed=0, quiet=False):
+        """用局部搜索（模拟退火，见 local_search.LocalSearch）改进已有的自修课安排
+
+        schedule 可以是 solve 的结果，也可以是手工排的草稿；大的年级 CBC 迟迟不能证明最优时，
+        可以先限时求解再用局部搜索在几秒内继续改进。返回代价最小的安排（不会比输入差），
+        搜索统计保存在 local_search_stats 中，quiet=True 时不打印。
+        """
+        if self.validator is None:
+            self.validator = ScheduleValidator(self)
+        from local_search import LocalSearch
+        search = LocalSearch(self, seed=seed)
+        with self.profiler.phase('local_search'):
+            codes = search.run(self.validator.encode(schedule), time_limit=time_limit, iterations=iterations)
+        self.local_search_stats = stats = search.stats
+        if not quiet:
+            print(f"局部搜索: 代价 {stats['initial_cost']} → {stats['cost']}"
+                  f"（{stats['moves']} 次移动，接受 {stats['accepted']} 次，用时 {stats['seconds']:.2f} 秒）")
+        return self.validator.decode(codes)
+
+    def diagnose_infeasibility(self, rows=True):
+        """无解时找出互相冲突的规则，以及这些规则中互相冲突的具体约束行（rows=True），见 diagnosis.diagnose"""
+        from diagnosis import diagnose
+        return diagnose(self, rows=rows)
+
+    def display_diagnosis(self, diagnosis):
+        """显示 diagnose_infeasibility 的结果"""
+        print("\n无解诊断:")
+        print("=" * 60)
+        if diagnosis['feasible']:
+            print("✅ 所有规则可以同时满足")
+            return
+        print("❌ 以下规则互相冲突（去掉其中任意一条即可排出课表）:")
+        for name in diagnosis['rules']:
+            print(f"   - {name}")
+        if diagnosis['rows']:
+            print("冲突的具体要求:")
+            for row in diagnosis['rows']:
+                print(f"   - {row}")
+        print(f"（共做了 {diagnosis['checks']} 次可行性检查）")
+
+    def violation_report(self, schedule):
+        """按规则汇总排课方案违反约束的情况（软约束模式下求解结果的代价）
+
+        返回违反的规则列表，每项为 {'rule', 'soft', 'weight', 'amount': 违反的节数,
+        'penalty': 计入目标的惩罚, 'messages': [说明, ...]}；硬约束的 weight 和 penalty 为 None。
+        """
+        if self.validator is None:
+            self.validator = ScheduleValidator(self)
+        result = self.validator.validate(schedule)
+        report = []
+        for family, name in enumerate(self.compiled.names):
+            weight = self.compiled.rules[family].get('soft_weight')
+            if name in result.soft_violations:
+                amount = result.soft_amounts[name]
+                report.append({'rule': name, 'soft': True, 'weight': weight, 'amount': amount,
+                               'penalty': amount * weight, 'messages': result.soft_violations[name]})
+            elif name in result.violations:
+                report.append({'rule': name, 'soft': False, 'weight': None, 'amount': len(result.violations[name]),
+                               'penalty': None, 'messages': result.violations[name]})
+        return report
+
+    def display_violation_report(self, report):
+        """显示 violation_report 的结果"""
+        import pandas as pd
+        print("\n规则违反情况:")
+        print("=" * 60)
+        if not report:
+            print("✅ 所有规则均满足")
+            return
+        rows = [{'规则': item['rule'], '类型': '软约束' if item['soft'] else '硬约束',
+                 '权重': item['weight'] if item['soft'] else '-', '违反节数': item['amount'],
+                 '惩罚': item['penalty'] if item['soft'] else '-'} for item in report]
+        print(pd.DataFrame(rows).to_string(index=False))
+        for item in report:
+            print(f"{item['rule']}:")
+            for message in item['messages']:
+                print(f"   - {message}")
+        penalty = sum(item['penalty'] for item in report if item['soft'])
+        print(f"软约束惩罚合计: {penalty}")
+
+    def profile_report(self):
+        """性能剖析结果：各阶段耗时（秒）和次数，以及按约束规则统计的模型规模"""
+        return {
+            'phases': {name: {'seconds': round(record['seconds'], 6), 'calls': record['calls']}
+                       for name, record in self.profiler.phases.items()},
+            'total_seconds': round(sum(record['seconds'] for record in self.profiler.phases.values()), 6),
+            'model': model_statistics(self),
+            'objective': self.objective_value,
+            'status': LpStatus[self.prob.status],
+        }
+
+    def display_solution_pool(self, pool):
+        """显示 solve_pool 找到的多个安排的连续上课统计"""
+        import pandas as pd
+        print(f"\n共找到 {len(pool)} 个排课方案:")
+        print("=" * 60)
+        rows = []
+        for i, solution in enumerate(pool, 1):
+            row = {'方案': i, '目标值': solution['objective'], '连续上课': solution['continuous_count'],
+                   '科学老师连续': solution['science_continuous']}
+            for teacher, count in solution['teacher_continuous'].items():
+                row[teacher_label(teacher)] = count
+            rows.append(row)
+        print(pd.DataFrame(rows).to_string(index=False))
+
     def _extract_solution(self):
         """提取求解结果"""
         schedule = {}
         
-        for class_name in self.classes:
+        # 一次性取出所有变量的取值，按 班级×天×时段×科目 排列
+        values = np.vectorize(lambda var: var.varValue or 0, otypes=[float])(self.x)
+        chosen = values.argmax(axis=3)
+        assigned = values.max(axis=3) > 0.5
+        
+        for ci, class_name in enumerate(self.classes):
             schedule[class_name] = {}
-            for day in self.days:
+            for di, day in enumerate(self.days):
                 schedule[class_name][day] = {
                     '早自习': None,
                     '午自习': None,
                     '晚自习': None
                 }
                 
-                for period in self.study_periods:
-                    for subject in self.subjects:
-                        var_name = f"{class_name}_{day}_{period}_{subject}"
-                        if self.variables[var_name].varValue == 1:
-                            schedule[class_name][day][period] = subject
+                for pi, period in enumerate(self.study_periods):
+                    if assigned[ci, di, pi]:
+                        schedule[class_name][day][period] = self.subjects[chosen[ci, di, pi]]
         
         return schedule
     
     def generate_complete_schedule(self, study_schedule):
-        """生成完整课表（包含正课和自修课）"""
-        complete_schedule = {}
-        
-        for class_name in self.classes:
-            complete_schedule[class_name] = {}
-            
-            for day in self.days:
-                complete_schedule[class_name][day] = []
-                
-                # 1. 早自习（第0节）
-                early_study = study_schedule[class_name][day]['早自习']
-                complete_schedule[class_name][day].append({
-                    "period": 0,
-                    "course": early_study if early_study else "",
-                    "type": "早自习"
-                })
-                
-                # 2. 正课第1-4节
-                for i in range(4):
-                    period_info = self.fixed_schedule[class_name][day][i]
-                    complete_schedule[class_name][day].append({
-                        "period": i + 1,
-                        "course": period_info['course'],
-                        "type": "正课"
-                    })
-                
-                # 3. 午自习（第5节）
-                noon_study = study_schedule[class_name][day]['午自习']
-                complete_schedule[class_name][day].append({
-                    "period": 5,
-                    "course": noon_study if noon_study else "",
-                    "type": "午自习"
-                })
-                
-                # 4. 正课第5-8节（原来的第5-8节变成第6-9节）
-                for i in range(4, 8):
-                    period_info = self.fixed_schedule[class_name][day][i]
-                    complete_schedule[class_name][day].append({
-                        "period": i + 2,
-                        "course": period_info['course'],
-                        "type": "正课"
-                    })
-                
-                # 5. 晚自习（第10节）
-                evening_study = study_schedule[class_name][day]['晚自习']
-                complete_schedule[class_name][day].append({
-                    "period": 10,
-                    "course": evening_study if evening_study else "",
-                    "type": "晚自习"
-                })
-        
-        return complete_schedule
+        """生成完整课表（包含正课和自修课），返回 CompleteSchedule，保存时再转换成 JSON 格式"""
+        with self.profiler.phase('generate_complete_schedule'):
+            return self._generate_complete_schedule(study_schedule)
+
+    def _generate_complete_schedule(self, study_schedule):
+        if self.validator is None:
+            self.validator = ScheduleValidator(self)
+        return CompleteSchedule.from_codes(self.fixed_index, self.validator.encode(study_schedule))
     
     def display_complete_schedule(self, complete_schedule):
         """显示完整课表"""
+        import pandas as pd
         print("\n完整课表（包含正课和自修课）:")
         print("=" * 80)
         
-        for class_name in self.classes:
+        for ci, class_name in enumerate(self.classes):
             print(f"\n{class_name}:")
             print("-" * 60)
             
             # 创建完整课表数据
             data = []
-            for day in self.days:
+            for di, day in enumerate(self.days):
                 day_courses = []
-                for period_info in complete_schedule[class_name][day]:
-                    course = period_info['course']
-                    course_type = period_info['type']
-                    if course_type in ['早自习', '午自习', '晚自习']:
-                        if course:
-                            day_courses.append(f"{course}({course_type})")
-                        else:
-                            day_courses.append(f"({course_type})")
+                for slot in range(SLOTS_PER_DAY):
+                    course = complete_schedule.course(ci, di, slot)
+                    if SLOT_TYPE[slot] != LESSON:
+                        day_courses.append(f"{course}({slot_label(slot)})")
                     else:
                         day_courses.append(course)
                 
@@ -392,308 +633,66 @@ class StudySessionScheduler:
             print(df.to_string(index=False))
     
     def validate_constraints(self, schedule):
-        """验证排课结果是否符合所有约束条件"""
+        """验证排课结果是否符合所有约束条件
+
+        检查由向量化的 ScheduleValidator 按约束规则文件完成，这里只负责打印验证报告；
+        连续上课统计读完整课表的 TeacherTimetable，与老师课表和周课时统计一致。
+        """
+        with self.profiler.phase('validate'):
+            if self.validator is None:
+                self.validator = ScheduleValidator(self)
+            result = self.validator.validate(schedule)
+        
         print("\n约束验证结果:")
         print("=" * 60)
         
-        violations = []
-        
-        # 验证约束1: 早自修语文、英语各4节，社会2节，平均分配
-        print("1. 验证早自修安排:")
-        for subject, expected_total in [('语', 4), ('英', 4), ('社', 2)]:
-            total_count = 0
-            class_counts = {}
-            
-            for class_name in self.classes:
-                class_count = 0
-                for day in self.days:
-                    if schedule[class_name][day]['早自习'] == subject:
-                        class_count += 1
-                        total_count += 1
-                class_counts[class_name] = class_count
-            
-            expected_per_class = expected_total // 2
-            print(f"   {subject}文: 总计{total_count}节(要求{expected_total}节), 班级7: {class_counts['班级7']}节, 班级8: {class_counts['班级8']}节(各要求{expected_per_class}节)")
-            
-            if total_count != expected_total:
-                violations.append(f"早自修{subject}文总节数不符合要求")
-            if class_counts['班级7'] != expected_per_class or class_counts['班级8'] != expected_per_class:
-                violations.append(f"早自修{subject}文班级分配不均匀")
-        
-        # 验证早自修不安排数学和科学
-        for subject in ['数', '科']:
-            for class_name in self.classes:
-                for day in self.days:
-                    if schedule[class_name][day]['早自习'] == subject:
-                        violations.append(f"早自修不应安排{subject}学")
-        
-        
-        # 新增验证: 语文早自习进度平衡
-        print("1++. 验证语文早自习进度平衡:")
-        days_list = ['周一', '周二', '周三', '周四', '周五']
-        
-        # 收集每个班级的语文早自习安排
-        class7_chinese = []
-        class8_chinese = []
-        
-        for day in days_list:
-            if schedule['班级7'][day]['早自习'] == '语':
-                class7_chinese.append(day)
-            if schedule['班级8'][day]['早自习'] == '语':
-                class8_chinese.append(day)
-        
-        print(f"   班级7语文早自习: {', '.join(class7_chinese) if class7_chinese else '无'}")
-        print(f"   班级8语文早自习: {', '.join(class8_chinese) if class8_chinese else '无'}")
-        
-        # 检查进度平衡
-        balance_violations = []
-        for i, day in enumerate(days_list):
-            class7_count_till_day = len([d for d in class7_chinese if days_list.index(d) <= i])
-            class8_count_till_day = len([d for d in class8_chinese if days_list.index(d) <= i])
-            
-            # 任何一天结束时，两个班级的累积差异不应超过1
-            diff = abs(class7_count_till_day - class8_count_till_day)
-            if diff > 1:
-                balance_violations.append(f"截至{day}: 班级7有{class7_count_till_day}次，班级8有{class8_count_till_day}次，差异{diff}超过1")
-        
-        if balance_violations:
-            print("   发现进度平衡问题:")
-            for violation in balance_violations:
-                print(f"   - {violation}")
-            violations.extend([f"语文早自习进度不平衡: {v}" for v in balance_violations])
-        else:
-            print("   语文早自习进度平衡检查通过")
-        
-        # 验证约束2: 英语午自修要求周二周四
-        print("2. 验证英语午自修时间:")
-        english_evening = []
-        for class_name in self.classes:
-            for day in self.days:
-                if schedule[class_name][day]['午自习'] == '英':
-                    english_evening.append(f"{class_name}{day}")
-                    if day not in ['周二', '周四']:
-                        violations.append(f"英语午自修安排在非周二周四: {class_name}{day}")
-        print(f"   英语午自修安排: {', '.join(english_evening)}")
-        
-        # 验证约束3: 科学周二不能接晚托，数学周四不能接晚托
-        print("3. 验证特殊晚托限制:")
-        for class_name in self.classes:
-            if schedule[class_name]['周二']['晚自习'] == '科':
-                violations.append(f"科学不能在周二晚托: {class_name}")
-            if schedule[class_name]['周四']['晚自习'] == '数':
-                violations.append(f"数学不能在周四晚托: {class_name}")
-        print("   科学周二晚托和数学周四晚托检查通过")
-        
-        # 新增验证约束3+: 科学周二周四不能排午自修
-        print("3+. 验证科学午自修限制:")
-        science_noon_violations = []
-        for class_name in self.classes:
-            if schedule[class_name]['周二']['午自习'] == '科':
-                science_noon_violations.append(f"科学不能在周二午自修: {class_name}")
-                violations.append(f"科学不能在周二午自修: {class_name}")
-            if schedule[class_name]['周四']['午自习'] == '科':
-                science_noon_violations.append(f"科学不能在周四午自修: {class_name}")
-                violations.append(f"科学不能在周四午自修: {class_name}")
-        
-        if science_noon_violations:
-            for violation in science_noon_violations:
-                print(f"   违反: {violation}")
-        else:
-            print("   科学周二周四午自修限制检查通过")
-        
-        # 新增验证约束3++: 周五8班晚自修确定为科学
-        print("3++. 验证班级8周五晚自修固定安排:")
-        if schedule['班级8']['周五']['晚自习'] != '科':
-            violations.append(f"班级8周五晚自修应该是科学，实际是: {schedule['班级8']['周五']['晚自习']}")
-            print(f"   违反: 班级8周五晚自修应该是科学，实际是: {schedule['班级8']['周五']['晚自习']}")
-        else:
-            print("   班级8周五晚自修科学安排检查通过")
-
-        # 验证约束4: 午自修/晚自修各科目各2节，平均分配
-        print("4. 验证午自修和晚自修分配:")
-        for period in ['午自习', '晚自习']:
-            for subject in self.subjects:
-                total_count = 0
-                class_counts = {}
-                
-                for class_name in self.classes:
-                    class_count = 0
-                    for day in self.days:
-                        if schedule[class_name][day][period] == subject:
-                            class_count += 1
-                            total_count += 1
-                    class_counts[class_name] = class_count
-                
-                print(f"   {period}{subject}: 总计{total_count}节(要求2节), 班级7: {class_counts['班级7']}节, 班级8: {class_counts['班级8']}节(各要求1节)")
-                
-                if total_count != 2:
-                    violations.append(f"{period}{subject}总节数不符合要求")
-                if class_counts['班级7'] != 1 or class_counts['班级8'] != 1:
-                    violations.append(f"{period}{subject}班级分配不均匀")
-        
-        # 验证约束5: 每门课程全天总节数不超过4节（每班限制）
-        print("5. 验证每班每日总节数限制:")
-        for class_name in self.classes:
-            for day in self.days:
-                day_subjects = {}
-                
-                # 统计正课
-                for period_info in self.fixed_schedule[class_name][day]:
-                    subject = period_info['course']
-                    day_subjects[subject] = day_subjects.get(subject, 0) + 1
-                
-                # 统计自修课
-                for period in self.study_periods:
-                    subject = schedule[class_name][day][period]
-                    if subject:
-                        day_subjects[subject] = day_subjects.get(subject, 0) + 1
-                
-                for subject, count in day_subjects.items():
-                    if count > 4:
-                        violations.append(f"{class_name}{day}{subject}科目总节数超过4节: {count}节")
-        print("   每班每日总节数检查通过")
-        
-        # 验证约束5+: 每个老师一天只能上4节课
-        print("5+. 验证老师每日课时限制:")
-        for day in self.days:
-            for subject in self.subjects:
-                # 统计该老师当天的总课时
-                total_courses = 0
-                
-                # 统计两个班的正课
-                for class_name in self.classes:
-                    total_courses += self._count_fixed_courses(class_name, day, subject)
-                
-                # 统计两个班的自修课
-                for class_name in self.classes:
-                    for period in self.study_periods:
-                        if schedule[class_name][day][period] == subject:
-                            total_courses += 1
-                
-                print(f"   {day}{subject}老师: {total_courses}节课(限制4节)")
-                if total_courses > 4:
-                    violations.append(f"{day}{subject}老师课时超过4节: {total_courses}节")
-        
-        # 验证软约束: 老师连续上课情况统计
-        print("5++. 统计老师连续课时情况:")
-        continuous_count = 0
-        science_continuous = 0
-        
-        for day in self.days:
-            for subject in self.subjects:
-                # 构建该老师一天的课程时间表
-                teacher_schedule = [0] * 11  # 0-10节课
-                
-                # 填入课程
-                for class_name in self.classes:
-                    # 早自习
-                    if schedule[class_name][day]['早自习'] == subject:
-                        teacher_schedule[0] = 1
-                    # 上午正课 1-4节
-                    for i in range(4):
-                        if self.fixed_schedule[class_name][day][i]['course'] == subject:
-                            teacher_schedule[i + 1] = 1
-                    # 午自习
-                    if schedule[class_name][day]['午自习'] == subject:
-                        teacher_schedule[5] = 1
-                    # 下午正课 6-9节
-                    for i in range(4, 8):
-                        if self.fixed_schedule[class_name][day][i]['course'] == subject:
-                            teacher_schedule[i + 2] = 1
-                    # 晚自习
-                    if schedule[class_name][day]['晚自习'] == subject:
-                        teacher_schedule[10] = 1
-                
-                # 检查连续3节课
-                for i in range(9):  # 0-8开始的连续3节
-                    if sum(teacher_schedule[i:i+3]) >= 3:
-                        continuous_count += 1
-                        if subject == '科':
-                            science_continuous += 1
-                        period_names = []
-                        for j in range(i, i+3):
-                            if j == 0:
-                                period_names.append("早自习")
-                            elif j == 5:
-                                period_names.append("午自习")
-                            elif j == 10:
-                                period_names.append("晚自习")
-                            else:
-                                period_names.append(f"第{j}节")
-                        print(f"   {day}{subject}老师连续上课: {' -> '.join(period_names)}")
-        
-        print(f"   总连续上课次数: {continuous_count}, 科学老师连续上课次数: {science_continuous}")
-        
-        # # 验证约束6: 社会不能参加周三的晚自习
-        # print("6. 验证社会周三晚自习限制:")
-        # for class_name in self.classes:
-        #     if schedule[class_name]['周三']['晚自习'] == '社':
-        #         violations.append(f"社会不能在周三晚自习: {class_name}")
-        # print("   社会周三晚自习限制检查通过")
-        # 新增验证约束6: 社会必须有一节晚自习在周三，另一节则在周二或周四
-        print("6. 验证社会晚自习时间安排:")
-        social_evening = []
-        wednesday_count = 0
-        tuesday_thursday_count = 0
-        other_days_count = 0
-        
-        for class_name in self.classes:
-            for day in self.days:
-                if schedule[class_name][day]['晚自习'] == '社':
-                    social_evening.append(f"{class_name}{day}")
-                    if day == '周三':
-                        wednesday_count += 1
-                    elif day in ['周二', '周四']:
-                        tuesday_thursday_count += 1
+        # 逐条规则报告
+        for i, (name, rule) in enumerate(zip(self.compiled.names, self.compiled.rules), 1):
+            print(f"{i}. 验证{name}:")
+            if rule['type'] in FIGURE_FIELDS:
+                field = FIGURE_FIELDS[rule['type']]
+                for group, entries in self.compiled.figures(name, result.actual, field):
+                    if field is None:
+                        print(f"   {group}: {entries[0]}节")
                     else:
-                        other_days_count += 1
-                        violations.append(f"社会晚自习不应安排在{day}: {class_name}")
-        
-        print(f"   社会晚自习安排: {', '.join(social_evening)}")
-        print(f"   周三安排: {wednesday_count}节, 周二周四安排: {tuesday_thursday_count}节, 其他天: {other_days_count}节")
-        
-        if wednesday_count != 1:
-            violations.append(f"社会晚自习在周三应该有1节，实际有{wednesday_count}节")
-        if tuesday_thursday_count != 1:
-            violations.append(f"社会晚自习在周二周四应该有1节，实际有{tuesday_thursday_count}节")
-        
-        if wednesday_count == 1 and tuesday_thursday_count == 1 and other_days_count == 0:
-            print("   社会晚自习时间安排检查通过")
-        
-        # 验证约束7: 两个班级同一时间段不能上同一门课
-        print("7. 验证班级间冲突:")
-        conflicts = []
-        for day in self.days:
-            for period in self.study_periods:
-                subjects_in_period = []
-                for class_name in self.classes:
-                    subject = schedule[class_name][day][period]
-                    if subject:
-                        if subject in subjects_in_period:
-                            conflicts.append(f"{day}{period}: 两个班级都安排了{subject}")
-                            violations.append(f"{day}{period}: 班级冲突")
-                        subjects_in_period.append(subject)
-        
-        if conflicts:
-            for conflict in conflicts:
-                print(f"   冲突: {conflict}")
-        else:
-            print("   班级间冲突检查通过")
+                        print(f"   {group}: {'，'.join(f'{value}{count}节' for value, count in entries)}")
+            if result.violations.get(name):
+                for violation in result.violations[name]:
+                    print(f"   违反: {violation}")
+            elif result.soft_violations.get(name):
+                for violation in result.soft_violations[name]:
+                    print(f"   违反（软约束）: {violation}")
+            else:
+                print("   检查通过")
+        
+        # 软约束: 老师连续上课情况统计，按完整课表的老师索引（与老师课表、周课时统计相同）
+        print("统计老师连续课时情况:")
+        teachers = list(self.teachers)
+        windows = self._generate_complete_schedule(schedule).teacher_timetable(self.teachers).continuous_windows()
+        for di, ti, start in np.argwhere(windows.transpose(1, 0, 2)):
+            period_names = [slot_label(slot) for slot in range(start, start + 3)]
+            print(f"   {self.days[di]}{teacher_label(teachers[ti])}连续上课: {' -> '.join(period_names)}")
+        science = [self.teachers[teacher]['subject'] == '科' for teacher in teachers]
+        print(f"   总连续上课次数: {windows.sum()}, 科学老师连续上课次数: {windows[science].sum()}")
         
         # 输出验证结果
         print("\n" + "=" * 60)
-        if violations:
+        if not result.valid:
             print("❌ 发现约束违反:")
-            for violation in violations:
-                print(f"   - {violation}")
+            for name, violations in result.violations.items():
+                for violation in violations:
+                    print(f"   - {name}: {violation}")
             return False
         else:
             print("✅ 所有硬约束条件均满足！排课方案有效。")
-            print(f"📊 软约束优化结果: 总连续上课{continuous_count}次，科学老师连续上课{science_continuous}次")
+            if result.soft_violations:
+                print(f"⚠️ 软约束违反 {sum(result.soft_amounts.values())} 节，惩罚 {result.soft_penalty}")
+            print(f"📊 软约束优化结果: 总连续上课{result.continuous_count}次，科学老师连续上课{result.science_continuous}次")
             return True
     
     def display_schedule(self, schedule):
         """显示自修课排课结果"""
+        import pandas as pd
         if schedule is None:
             print("无法找到满足所有约束的排课方案")
             return
@@ -717,36 +716,36 @@ class StudySessionScheduler:
             df = pd.DataFrame(data, columns=['日期', '早自习', '午自习', '晚自习'])
             print(df.to_string(index=False))
     
-    def save_schedule(self, schedule, complete_schedule, filename):
-        """保存排课结果到JSON文件"""
+    def save_schedule(self, schedule, complete_schedule, filename, quiet=False):
+        """保存排课结果到JSON文件，quiet=True 时不打印提示"""
         if schedule and complete_schedule:
             output_data = {
                 "study_schedule": schedule,
-                "complete_schedule": complete_schedule
+                "complete_schedule": complete_schedule.to_dict()
             }
             with open(filename, 'w', encoding='utf-8') as f:
                 json.dump(output_data, f, ensure_ascii=False, indent=2)
-            print(f"\n排课结果已保存到 {filename}")
+            if not quiet:
+                print(f"\n排课结果已保存到 {filename}")
 
     def display_teacher_schedule(self, complete_schedule):
         """显示面向老师的课表"""
+        import pandas as pd
         print("\n老师课表（以老师为中心）:")
         print("=" * 80)
+        timetable = complete_schedule.teacher_timetable(self.teachers)
         
-        # 为每个老师（科目）构建课表
-        for subject in self.subjects:
-            print(f"\n{subject}学老师:")
+        # 为每个老师构建课表
+        for ti, teacher in enumerate(self.teachers):
+            print(f"\n{teacher_label(teacher)}:")
             print("-" * 60)
             
             # 创建老师课表数据
             data = []
-            for day in self.days:
-                day_courses = []
-                
-                # 检查每个时段
-                for period_idx in range(11):  # 0-10节课
-                    period_info = self._get_teacher_period_info(complete_schedule, subject, day, period_idx)
-                    day_courses.append(period_info)
+            for di, day in enumerate(self.days):
+                # 每个时段（0-10节课）上课的班级取自倒排索引
+                day_courses = [self._teacher_period_info(classes, slot)
+                               for slot, classes in enumerate(timetable.classes[ti][di])]
                 
                 row = [day] + day_courses
                 data.append(row)
@@ -756,63 +755,25 @@ class StudySessionScheduler:
             df = pd.DataFrame(data, columns=columns)
             print(df.to_string(index=False))
 
-    def _get_teacher_period_info(self, complete_schedule, subject, day, period_idx):
-        """获取老师在指定时段的课程信息"""
-        teaching_classes = []
-        
-        for class_name in self.classes:
-            if period_idx < len(complete_schedule[class_name][day]):
-                period_info = complete_schedule[class_name][day][period_idx]
-                if period_info['course'] == subject:
-                    # 根据课程类型添加标识
-                    if period_info['type'] == '正课':
-                        teaching_classes.append(class_name)
-                    else:
-                        teaching_classes.append(f"{class_name}({period_info['type']})")
-        
-        if teaching_classes:
-            return ' + '.join(teaching_classes)
-        else:
-            return ""
+    def _teacher_period_info(self, classes, slot):
+        """老师在某时段上课的班级，自修课标出类型，如 "班级7 + 班级8(午自习)" """
+        if SLOT_TYPE[slot] == LESSON:
+            return ' + '.join(classes)
+        return ' + '.join(f"{class_name}({slot_label(slot)})" for class_name in classes)
 
     def display_teacher_weekly_summary(self, complete_schedule):
         """显示老师周课时统计"""
+        import pandas as pd
         print("\n老师周课时统计:")
         print("=" * 60)
+        timetable = complete_schedule.teacher_timetable(self.teachers)
         
-        # 创建统计表格
+        # 每天的课时和连续3节次数都由倒排索引一次算出
+        daily_hours = timetable.daily_hours.tolist()
+        continuous_counts = timetable.continuous_counts().tolist()
         summary_data = []
-        
-        for subject in self.subjects:
-            # 统计每天的课时
-            daily_hours = {}
-            weekly_total = 0
-            continuous_count = 0
-            
-            for day in self.days:
-                daily_count = 0
-                teacher_schedule = [0] * 11  # 0-10节课
-                
-                # 统计当天课时并构建时间表
-                for class_name in self.classes:
-                    for period_info in complete_schedule[class_name][day]:
-                        if period_info['course'] == subject:
-                            daily_count += 1
-                            teacher_schedule[period_info['period']] = 1
-                
-                daily_hours[day] = daily_count
-                weekly_total += daily_count
-                
-                # 检查连续3节课
-                for i in range(9):  # 0-8开始的连续3节
-                    if sum(teacher_schedule[i:i+3]) >= 3:
-                        continuous_count += 1
-            
-            # 构建行数据
-            row = [f"{subject}学老师"]
-            for day in self.days:
-                row.append(daily_hours[day])
-            row.extend([weekly_total, continuous_count])
+        for ti, teacher in enumerate(self.teachers):
+            row = [teacher_label(teacher)] + daily_hours[ti] + [sum(daily_hours[ti]), continuous_counts[ti]]
             summary_data.append(row)
         
         columns = ['老师'] + self.days + ['周总计', '连续3节次数']
@@ -823,32 +784,21 @@ class StudySessionScheduler:
         """显示老师详细课程安排"""
         print("\n老师详细课程安排:")
         print("=" * 80)
+        timetable = complete_schedule.teacher_timetable(self.teachers)
         
-        for subject in self.subjects:
-            print(f"\n{subject}学老师的课程详情:")
+        for ti, (teacher, info) in enumerate(self.teachers.items()):
+            position = {class_name: k for k, class_name in enumerate(info['classes'])}
+            print(f"\n{teacher_label(teacher)}的课程详情:")
             print("-" * 50)
             
             total_classes = 0
-            for day in self.days:
-                day_classes = []
-                
-                for class_name in self.classes:
-                    for period_info in complete_schedule[class_name][day]:
-                        if period_info['course'] == subject:
-                            period_type = period_info['type']
-                            period_num = period_info['period']
-                            
-                            if period_num == 0:
-                                time_desc = "早自习"
-                            elif period_num == 5:
-                                time_desc = "午自习"
-                            elif period_num == 10:
-                                time_desc = "晚自习"
-                            else:
-                                time_desc = f"第{period_num}节"
-                            
-                            day_classes.append(f"{time_desc}({class_name}-{period_type})")
-                            total_classes += 1
+            for di, day in enumerate(self.days):
+                # 索引按时段排列，详情按班级、再按时段列出
+                lessons = sorted((position[class_name], slot, class_name)
+                                 for slot, classes in enumerate(timetable.classes[ti][di]) for class_name in classes)
+                day_classes = [f"{slot_label(slot)}({class_name}-{SLOT_TYPES[SLOT_TYPE[slot]]})"
+                               for _, slot, class_name in lessons]
+                total_classes += len(day_classes)
                 
                 if day_classes:
                     print(f"  {day}: {', '.join(day_classes)}")
@@ -858,15 +808,38 @@ class StudySessionScheduler:
 
 # 使用示例
 if __name__ == "__main__":
-    scheduler = StudySessionScheduler('classes.json')
-    study_schedule = scheduler.solve()
+    import argparse
+    parser = argparse.ArgumentParser(description="安排 classes.json 中整个年级各班的自修课")
+    parser.add_argument('--profile', action='store_true', help="记录各阶段耗时和模型规模，写入 solve_profile.json")
+    parser.add_argument('--soft', type=float, metavar='WEIGHT',
+                        help="把可以放宽的规则都设为软约束（每违反1节惩罚 WEIGHT），无解时也给出排课方案")
+    parser.add_argument('--headless', action='store_true',
+                        help="不打印课表和验证报告，只把结果写入 JSON 文件（供脚本批量调用，无解时退出码为1）")
+    parser.add_argument('-o', '--output', default='complete_schedule.json', help="结果文件")
+    parser.add_argument('--improve', type=float, metavar='SECONDS', help="求解后再用局部搜索改进 SECONDS 秒")
+    args = parser.parse_args()
+
+    scheduler = StudySessionScheduler('classes.json', profile=args.profile, soft=args.soft)
+    # 以上一次的排课结果作为初始解
+    previous = load_study_schedule(args.output) if os.path.exists(args.output) else None
+    if not args.headless:
+        print(scheduler.presolved.report())
+    study_schedule = scheduler.solve(cache=ModelCache(), warm_start=previous, quiet=args.headless)
+    if study_schedule and args.improve:
+        study_schedule = scheduler.improve_schedule(study_schedule, time_limit=args.improve, quiet=args.headless)
     
-    if study_schedule:
+    if study_schedule and args.headless:
+        # 不导入 pandas，不打印表格
+        complete_schedule = scheduler.generate_complete_schedule(study_schedule)
+        scheduler.save_schedule(study_schedule, complete_schedule, args.output, quiet=True)
+    elif study_schedule:
         # 显示自修课排课结果
         scheduler.display_schedule(study_schedule)
         
         # 验证约束条件
         scheduler.validate_constraints(study_schedule)
+        if scheduler.compiled.soft.any():
+            scheduler.display_violation_report(scheduler.violation_report(study_schedule))
         
         # 生成并显示完整课表
         complete_schedule = scheduler.generate_complete_schedule(study_schedule)
@@ -883,6 +856,16 @@ if __name__ == "__main__":
         
         
         # 保存结果
-        scheduler.save_schedule(study_schedule, complete_schedule, 'complete_schedule.json')
-    else:
-        print("无法生成满足约束的排课方案")
\ No newline at end of file
+        scheduler.save_schedule(study_schedule, complete_schedule, args.output)
+    elif not args.headless:
+        print("无法生成满足约束的排课方案")
+        scheduler.display_diagnosis(scheduler.diagnose_infeasibility())
+
+    if args.profile:
+        # 性能剖析结果与 complete_schedule.json 放在一起
+        profile_file = os.path.join(os.path.dirname(args.output), 'solve_profile.json')
+        save_profile(scheduler.profile_report(), profile_file)
+        if not args.headless:
+            print(f"\n性能剖析结果已保存到 {profile_file}")
+    if study_schedule is None and args.headless:
+        sys.exit(1)
\ No newline at end of file
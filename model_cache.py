@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+
+# 模型的建法改变时递增，旧的缓存随之失效
+MODEL_VERSION = 3
+
+
+class ModelCache:
+    """编译好的模型（MPS 文件）的磁盘缓存
+
+    以正课课表和约束规则内容的哈希为键，每个条目包含 <键>.mps 和记录变量名映射的 <键>.json。
+    命中时直接把 MPS 交给 CBC，不再建模；总大小超过 max_bytes 时按最近使用时间淘汰最旧的条目。
+    """
+
+    def __init__(self, directory='.model_cache', max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(fixed_schedule, spec):
+        """课表和约束规则的内容哈希"""
+        content = json.dumps({'version': MODEL_VERSION, 'classes': fixed_schedule, 'constraints': spec},
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.mps', base + '.json'
+
+    def lookup(self, key):
+        """返回 (MPS 路径, 元数据)，未命中返回 None；命中时刷新使用时间"""
+        mps_path, meta_path = self._paths(key)
+        if not (os.path.exists(mps_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        os.utime(mps_path)
+        os.utime(meta_path)
+        return mps_path, meta
+
+    def store(self, key, write_model, meta=None):
+        """保存一个条目：write_model(路径) 负责写出 MPS 并返回变量名映射"""
+        mps_path, meta_path = self._paths(key)
+        tmp_mps = mps_path + f'.{os.getpid()}.tmp'
+        names = write_model(tmp_mps)
+        meta = dict(meta or {}, names=names)
+        tmp_meta = meta_path + f'.{os.getpid()}.tmp'
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        # 先写临时文件再改名，并发的进程不会读到写了一半的条目
+        os.replace(tmp_mps, mps_path)
+        os.replace(tmp_meta, meta_path)
+        self._evict(keep=key)
+        return mps_path, meta
+
+    def _evict(self, keep=None):
+        """按最近使用时间淘汰条目，直到总大小不超过 max_bytes（刚写入的 keep 条目除外）"""
+        entries = {}
+        for filename in os.listdir(self.directory):
+            key, ext = os.path.splitext(filename)
+            if ext not in ('.mps', '.json'):
+                continue
+            stat = os.stat(os.path.join(self.directory, filename))
+            size, used = entries.get(key, (0, 0))
+            entries[key] = (size + stat.st_size, max(used, stat.st_mtime))
+
+        total = sum(size for size, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
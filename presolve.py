@@ -0,0 +1,275 @@
+from collections import Counter
+
+import numpy as np
+
+from constraints import LE, EQ, GE
+
+# 约束行没有上界（GE 行）或下界（LE 行）时用的界
+_UNBOUNDED = 1 << 30
+
+
+class Presolved:
+    """预处理结果
+
+    - fixed[变量]: 被约束行确定的变量取值，-1 表示未确定
+    - keep[行]: 需要进入模型的约束行，其余行在固定变量后一定满足
+    - row_constant[行]: 每行中已固定为1的变量贡献的常数，建模时移到右端
+    - cuts: 对称性约束 [(变量下标数组, 系数数组), ...]，每条为 sum(系数 * x) >= 0
+    - stats: 预处理前后的模型规模
+    """
+
+    def __init__(self, fixed, keep, row_constant, cuts, stats):
+        self.fixed = fixed
+        self.keep = keep
+        self.row_constant = row_constant
+        self.cuts = cuts
+        self.stats = stats
+
+    def same_structure(self, other):
+        """固定的变量、保留的行和对称性约束都相同时，模型只需修改右端常数"""
+        return (other is not None
+                and np.array_equal(self.fixed, other.fixed)
+                and np.array_equal(self.keep, other.keep)
+                and len(self.cuts) == len(other.cuts)
+                and all(np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1])
+                        for a, b in zip(self.cuts, other.cuts)))
+
+    def report(self):
+        """预处理前后模型规模的说明"""
+        stats = self.stats
+        return (f"模型规模（预处理前 → 后）: 约束 {stats['rows_before']} → {stats['rows_after']}，"
+                f"变量 {stats['vars_before']} → {stats['vars_after']}，"
+                f"规则行非零元 {stats['nonzeros_before']} → {stats['nonzeros_after']}；"
+                f"固定 {stats['fixed_vars']} 个变量，删去 {stats['removed_rows']} 行，"
+                f"对称性约束 {stats['symmetry_cuts']} 条"
+                + (f"，软约束 {stats['soft_rows']} 行" if stats.get('soft_rows') else ""))
+
+
+def independent_groups(scheduler):
+    """按约束行和任课老师把班级分成互不相关的组，返回 [(行下标数组, 单元格布尔数组), ...]"""
+    compiled = scheduler.compiled
+    n_classes, n_days, n_periods, n_subjects = scheduler.x.shape
+    entry_class = compiled.indices // (n_days * n_periods * n_subjects)
+    entry_row = np.repeat(np.arange(compiled.n_rows), np.diff(compiled.indptr))
+    teacher_classes = [scheduler.teacher_class_ids[teacher] for teacher in scheduler.teachers]
+
+    # 标签传播：同一行或同一老师的班级取最小的标签，直到不再变化
+    labels = np.arange(n_classes)
+    while True:
+        new = labels.copy()
+        if compiled.n_rows:
+            row_min = np.minimum.reduceat(labels[entry_class], compiled.indptr[:-1])
+            np.minimum.at(new, entry_class, row_min[entry_row])
+        for class_ids in teacher_classes:
+            new[class_ids] = new[class_ids].min()
+        if (new == labels).all():
+            break
+        labels = new
+
+    row_label = labels[entry_class[compiled.indptr[:-1]]] if compiled.n_rows else np.zeros(0, dtype=np.intp)
+    cell_label = np.repeat(labels, n_days * n_periods)
+    return [(np.flatnonzero(row_label == label), cell_label == label) for label in np.flatnonzero(np.bincount(labels))]
+
+
+def presolve(scheduler):
+    """在交给求解器之前化简模型
+
+    1. 固定变量：反复检查每一行，某行只有一种取法能满足时（如"英语午自修只在周二周四"
+       把其余天的变量固定为0，"周五8班晚自修为科学"把该变量固定为1，进而同一格的其他科目为0），
+       把行中的未定变量固定下来，直到没有新的变量被固定。
+    2. 删去冗余行：固定变量后无论其余变量怎么取都满足的行不再进入模型。
+    3. 对称性约束：两个班（或两组班级连同其老师）互换后约束行、正课时间表和权重都不变时，
+       互换后的安排是同样好的另一个解；要求排在前面的班第一天的自修安排按科目编号不大于后面的班，
+       每组对称的解只保留一个。
+
+    固定和删行只用到约束行本身，与 CBC 的解完全等价；发现矛盾时不做固定，交给求解器报告无解。
+    软约束行允许违反，不参与固定变量，也总是保留（建模时加上松弛变量）。
+    """
+    compiled = scheduler.compiled
+    n_vars = scheduler.x.size
+    fixed = np.full(n_vars, -1, dtype=np.int8)
+    keep = np.ones(compiled.n_rows, dtype=bool)
+    row_constant = np.zeros(compiled.n_rows, dtype=np.int64)
+
+    if compiled.n_rows:
+        result = _fix_variables(compiled, n_vars)
+        if result is not None:
+            fixed, keep, row_constant = result
+    cuts = _symmetry_cuts(scheduler)
+
+    n_continuity = scheduler.continuous_x.size
+    # 软约束行的松弛变量：等式行两个（超出和不足），不等式行一个
+    n_slack = int(compiled.soft.sum() + (compiled.soft & (compiled.sense == EQ)).sum())
+    sizes = np.diff(compiled.indptr)
+    free_entries = fixed[compiled.indices] < 0
+    stats = {
+        'rows_before': int(compiled.n_rows + 2 * n_continuity),
+        'rows_after': int(keep.sum() + 2 * n_continuity + len(cuts)),
+        'vars_before': int(n_vars + n_continuity + n_slack),
+        'vars_after': int((fixed < 0).sum() + n_continuity + n_slack),
+        'nonzeros_before': int(sizes.sum()),
+        'nonzeros_after': int(free_entries[np.repeat(keep, sizes)].sum() + sum(len(index) for index, _ in cuts)),
+        'fixed_vars': int((fixed >= 0).sum()),
+        'removed_rows': int((~keep).sum()),
+        'symmetry_cuts': len(cuts),
+        'soft_rows': int(compiled.soft.sum()),
+    }
+    return Presolved(fixed, keep, row_constant, cuts, stats)
+
+
+def _fix_variables(compiled, n_vars):
+    """约束行上的界传播，返回 (fixed, keep, row_constant)，发现矛盾时返回 None"""
+    coefs = compiled.coefs.astype(np.int64)
+    starts = compiled.indptr[:-1]
+    entry_row = np.repeat(np.arange(compiled.n_rows), np.diff(compiled.indptr))
+    # 软约束行不限制左端
+    upper = np.where((compiled.sense == GE) | compiled.soft, _UNBOUNDED, compiled.rhs).astype(np.int64)
+    lower = np.where((compiled.sense == LE) | compiled.soft, -_UNBOUNDED, compiled.rhs).astype(np.int64)
+    fixed = np.full(n_vars, -1, dtype=np.int8)
+
+    while True:
+        values = fixed[compiled.indices]
+        free = values < 0
+        constant = np.add.reduceat(np.where(values == 1, coefs, 0), starts)
+        lo = constant + np.add.reduceat(np.where(free, np.minimum(coefs, 0), 0), starts)
+        hi = constant + np.add.reduceat(np.where(free, np.maximum(coefs, 0), 0), starts)
+        if (lo > upper).any() or (hi < lower).any():
+            return None
+
+        # 左端下界已达上界：未定变量都取使左端最小的值；上界已达下界时取使左端最大的值
+        at_upper = free & (lo == upper)[entry_row]
+        at_lower = free & (hi == lower)[entry_row]
+        if not (at_upper.any() or at_lower.any()):
+            break
+        index = np.concatenate([compiled.indices[at_upper], compiled.indices[at_lower]])
+        value = np.concatenate([coefs[at_upper] < 0, coefs[at_lower] > 0]).astype(np.int8)
+        # 同一变量被多行固定时取值必须一致
+        order = np.argsort(index, kind='stable')
+        index, value = index[order], value[order]
+        same = index[1:] == index[:-1]
+        if (value[1:][same] != value[:-1][same]).any():
+            return None
+        fixed[index] = value
+
+    redundant = ((compiled.sense == LE) & (hi <= upper)
+                 | (compiled.sense == GE) & (lo >= lower)
+                 | (lo == hi) & (lo == compiled.rhs))
+    return fixed, ~redundant | compiled.soft, constant
+
+
+def _symmetry_cuts(scheduler):
+    """找出可以互换的班级和班级组，返回对称性约束"""
+    compiled = scheduler.compiled
+    n_classes = scheduler.x.shape[0]
+    per_class = scheduler.x[0].size
+    groups = independent_groups(scheduler)
+    cuts = []
+
+    grouped_classes = []
+    for rows, cells in groups:
+        class_ids = np.flatnonzero(cells.reshape(n_classes, -1)[:, 0])
+        grouped_classes.append(class_ids)
+
+    # 组内：任课老师完全相同、互换后约束行不变的班级
+    internal = set()
+    for (rows, _), class_ids in zip(groups, grouped_classes):
+        signature = Counter(_canonical_rows(compiled, rows))
+        by_teachers = {}
+        for c in class_ids:
+            key = tuple(scheduler.class_teacher.get((scheduler.classes[c], s)) for s in scheduler.subjects)
+            by_teachers.setdefault(key, []).append(c)
+        for candidates in by_teachers.values():
+            for chain in _equivalence_chains(candidates, lambda a, b: _swap_rows_match(
+                    compiled, rows, signature, _class_swap(n_classes, per_class, [a], [b]))):
+                if len(chain) > 1:
+                    internal.update(chain)
+                    cuts.extend(_chain_cuts(scheduler, chain))
+
+    # 组间：各组班级按顺序一一对应，连同任课老师一起互换后约束行和目标都不变
+    swappable = [g for g, class_ids in enumerate(grouped_classes) if not internal.intersection(class_ids)]
+    signatures = {g: Counter(_canonical_rows(compiled, groups[g][0])) for g in swappable}
+
+    def groups_match(a, b):
+        if len(grouped_classes[a]) != len(grouped_classes[b]) or not _teachers_match(scheduler, grouped_classes[a],
+                                                                                      grouped_classes[b]):
+            return False
+        var_map = _class_swap(n_classes, per_class, grouped_classes[a], grouped_classes[b])
+        mapped = Counter(_canonical_rows(compiled, groups[a][0], var_map))
+        return mapped == signatures[b]
+
+    for chain in _equivalence_chains(swappable, groups_match):
+        if len(chain) > 1:
+            cuts.extend(_chain_cuts(scheduler, [grouped_classes[g][0] for g in chain]))
+    return cuts
+
+
+def _canonical_rows(compiled, rows, var_map=None):
+    """约束行的规范形式 (sense, rhs, 软约束权重, ((变量, 系数), ...))，var_map 给出时先替换变量"""
+    result = []
+    for r in rows:
+        lo, hi = compiled.indptr[r], compiled.indptr[r + 1]
+        index = compiled.indices[lo:hi]
+        if var_map is not None:
+            index = var_map[index]
+        terms = tuple(sorted(zip(index.tolist(), compiled.coefs[lo:hi].tolist())))
+        result.append((int(compiled.sense[r]), int(compiled.rhs[r]), float(compiled.weights[r]), terms))
+    return result
+
+
+def _class_swap(n_classes, per_class, first, second):
+    """把 first 中的班级与 second 中对应位置的班级互换的变量映射"""
+    var_map = np.arange(n_classes * per_class).reshape(n_classes, per_class)
+    first, second = np.asarray(first), np.asarray(second)
+    var_map[np.concatenate([first, second])] = var_map[np.concatenate([second, first])]
+    return var_map.ravel()
+
+
+def _swap_rows_match(compiled, rows, signature, var_map):
+    return Counter(_canonical_rows(compiled, rows, var_map)) == signature
+
+
+def _teachers_match(scheduler, first, second):
+    """两组班级互换时任课老师一一对应，且对应老师的正课时间表和连续上课权重相同"""
+    teachers = {}
+    for a, b in zip(first, second):
+        for subject in scheduler.subjects:
+            ta = scheduler.class_teacher.get((scheduler.classes[a], subject))
+            tb = scheduler.class_teacher.get((scheduler.classes[b], subject))
+            if (ta is None) != (tb is None):
+                return False
+            if ta is not None and teachers.setdefault(ta, tb) != tb:
+                return False
+    if len(set(teachers.values())) != len(teachers):
+        return False
+    for ta, tb in teachers.items():
+        if scheduler.continuity_weights[ta] != scheduler.continuity_weights[tb]:
+            return False
+        if not np.array_equal(scheduler.fixed_timeline[scheduler.teacher_idx[ta]],
+                              scheduler.fixed_timeline[scheduler.teacher_idx[tb]]):
+            return False
+    return True
+
+
+def _equivalence_chains(items, match):
+    """按 match 把 items 分成若干等价类（与每类的第一个比较），保持原顺序"""
+    chains = []
+    for item in items:
+        for chain in chains:
+            if match(chain[0], item):
+                chain.append(item)
+                break
+        else:
+            chains.append([item])
+    return chains
+
+
+def _chain_cuts(scheduler, class_ids):
+    """相邻两个班第一天的自修安排按科目编号（空为0）字典序不减"""
+    _, _, n_periods, n_subjects = scheduler.x.shape
+    weights = (n_subjects + 1) ** np.arange(n_periods - 1, -1, -1)
+    coefs = (weights[:, None] * np.arange(1, n_subjects + 1)[None, :]).ravel()
+    index = np.arange(scheduler.x.size).reshape(scheduler.x.shape)[:, 0].reshape(scheduler.x.shape[0], -1)
+    cuts = []
+    for a, b in zip(class_ids, class_ids[1:]):
+        cuts.append((np.concatenate([index[b], index[a]]), np.concatenate([coefs, -coefs])))
+    return cuts
@@ -0,0 +1,83 @@
+import json
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class Profiler:
+    """按阶段记录耗时
+
+    phase(名称) 是一个 with 块，同名阶段多次进入时累计耗时和次数（如 solve_pool 中的多次求解）。
+    enabled=False 时什么也不记录，排课器默认如此。
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = self.phases.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            record['seconds'] += time.perf_counter() - start
+            record['calls'] += 1
+
+
+def model_statistics(scheduler):
+    """模型规模：总的变量数、约束数，以及按约束规则（族）统计的行数、非零元和涉及的变量数"""
+    compiled, presolved = scheduler.compiled, scheduler.presolved
+    sizes = np.diff(compiled.indptr)
+    families = []
+    for family, rule in enumerate(compiled.rules):
+        rows = np.flatnonzero(compiled.family == family)
+        entries = np.concatenate([compiled.indices[compiled.indptr[r]:compiled.indptr[r + 1]] for r in rows]) \
+            if len(rows) else np.zeros(0, dtype=np.intp)
+        families.append({
+            'name': rule['name'],
+            'type': rule['type'],
+            'soft_weight': rule.get('soft_weight'),
+            'rows': int(len(rows)),
+            'nonzeros': int(sizes[rows].sum()),
+            'columns': int(len(np.unique(entries))),
+            'rows_after_presolve': int(presolved.keep[rows].sum()),
+        })
+
+    n_continuity = scheduler.continuous_x.size
+    # 每个窗口两行：ge 行含指示变量和窗口中的自修变量，le 行相同
+    continuity_nonzeros = sum(len(constraint) for ti in range(len(scheduler.teachers))
+                              for di in range(len(scheduler.days))
+                              for constraint in scheduler._continuity_constraints(ti, di))
+    families.append({
+        'name': '连续上课',
+        'type': 'continuity',
+        'rows': 2 * n_continuity,
+        'nonzeros': continuity_nonzeros,
+        'columns': n_continuity,
+        'rows_after_presolve': 2 * n_continuity,
+    })
+
+    return {
+        'classes': len(scheduler.classes),
+        'days': len(scheduler.days),
+        'teachers': len(scheduler.teachers),
+        'variables': int(scheduler.x.size + n_continuity),
+        'schedule_variables': int(scheduler.x.size),
+        'continuity_variables': int(n_continuity),
+        'constraints': int(compiled.n_rows + 2 * n_continuity),
+        'nonzeros': int(sizes.sum() + continuity_nonzeros),
+        'families': families,
+        'presolve': dict(presolved.stats),
+    }
+
+
+def save_profile(profile, filename):
+    """把性能剖析结果写成 JSON 文件"""
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
@@ -1,5 +1,14 @@
+import argparse
+import csv
+import glob
 import json
-import pandas as pd
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from timetable import SUBJECTS, STUDY_PERIODS, EMPTY, FixedScheduleIndex, discover_teachers, teacher_label
 
 def create_sample_input():
     """创建示例输入文件"""
@@ -32,103 +41,166 @@ def create_sample_input():
     print("- 空白时段请填写空字符串 \"\"")
 
 def load_study_input(input_file):
-    """加载自修课输入"""
+    """加载自修课输入（study_input.json 格式，也接受 main.py 输出的 complete_schedule.json）"""
     with open(input_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
+    if '自修课安排' not in data and 'study_schedule' in data:
+        return data['study_schedule']
     return data['自修课安排']
 
-def count_weekly_hours_simple(study_schedule, fixed_schedule=None):
-    """简化版周课时统计（如果没有正课数据，只统计自修课）"""
-    classes = ['班级7', '班级8']
-    days = ['周一', '周二', '周三', '周四', '周五']
-    subjects = ['语', '数', '英', '科', '社']
-    
-    # 初始化统计数据
-    teacher_stats = {}
-    for subject in subjects:
-        teacher_stats[subject] = {
-            'daily_hours': {day: 0 for day in days},
-            'weekly_total': 0,
-            'study_hours': 0,  # 自修课课时
-            'course_details': {day: [] for day in days}
-        }
-    
-    # 统计自修课
-    for day in days:
-        for subject in subjects:
-            daily_count = 0
-            day_details = []
-            
-            for class_name in classes:
-                study_periods = ['早自习', '午自习', '晚自习']
-                
-                for period in study_periods:
-                    if study_schedule.get(class_name, {}).get(day, {}).get(period) == subject:
-                        daily_count += 1
-                        day_details.append(f"{period}({class_name})")
-            
-            # 如果有正课数据，也统计正课
-            if fixed_schedule:
-                for class_name in classes:
-                    for i, period_info in enumerate(fixed_schedule[class_name][day]):
-                        if period_info['course'] == subject:
-                            daily_count += 1
-                            period_num = i + 1 if i < 4 else i + 2
-                            day_details.append(f"第{period_num}节({class_name}-正课)")
-            
-            teacher_stats[subject]['daily_hours'][day] = daily_count
-            teacher_stats[subject]['weekly_total'] += daily_count
-            teacher_stats[subject]['course_details'][day] = day_details
-            
-            # 统计自修课时数
-            if not fixed_schedule:  # 如果没有正课数据，所有课时都是自修课
-                teacher_stats[subject]['study_hours'] += daily_count
-    
-    return teacher_stats
+def _schedule_days(study_schedule):
+    """以第一个班级的自修课安排为准返回上课日"""
+    for class_schedule in study_schedule.values():
+        return list(class_schedule.keys())
+    return []
+
+class WeeklyHours:
+    """count_weekly_hours_simple 的统计结果
+
+    课时数按 老师×天 保存在数组中：daily 为每天的总课时（自修课 + 正课），study 为其中的自修课节数。
+    每节课的说明（如 "早自习(班级7)"、"第3节(班级7-正课)"）只在 course_details 被调用时生成，
+    只要统计数字时不必为每节课拼接字符串。
+    """
+
+    def __init__(self, teachers, days, classes, study_codes, fixed_index, daily, study):
+        self.teachers = teachers
+        self.teacher_names = list(teachers)
+        self.days = days
+        self.classes = classes
+        self.daily = daily
+        self.study = study
+        self._study_codes = study_codes
+        self._fixed_index = fixed_index
+        self._details = {}
+
+    @property
+    def weekly_total(self):
+        """每位老师的周总课时"""
+        return self.daily.sum(axis=1)
+
+    def daily_hours(self, teacher):
+        """{天: 课时}"""
+        return dict(zip(self.days, self.daily[self.teacher_names.index(teacher)].tolist()))
+
+    def course_details(self, teacher):
+        """{天: [课程说明, ...]}，先列自修课再列正课，第一次调用时生成"""
+        if teacher not in self._details:
+            subject = SUBJECTS.index(self.teachers[teacher]['subject'])
+            class_idx = {class_name: ci for ci, class_name in enumerate(self.classes)}
+            classes = [(class_idx[class_name], class_name) for class_name in self.teachers[teacher]['classes']
+                       if class_name in class_idx]
+            details = {}
+            for di, day in enumerate(self.days):
+                day_details = [f"{period}({class_name})" for ci, class_name in classes
+                               for pi, period in enumerate(STUDY_PERIODS) if self._study_codes[ci, di, pi] == subject]
+                if self._fixed_index is not None:
+                    course_id = self._fixed_index.course_id[SUBJECTS[subject]]
+                    day_details += [f"第{slot}节({class_name}-正课)" for ci, class_name in classes
+                                    for slot in np.flatnonzero(self._fixed_index.grid[ci, di] == course_id)]
+                details[day] = day_details
+            self._details[teacher] = details
+        return self._details[teacher]
+
+    def to_dict(self):
+        """转换成 {老师: {'daily_hours', 'weekly_total', 'study_hours', 'course_details'}}，用于保存结果
+
+        与原来的格式相同：有正课数据时 study_hours 为0，否则所有课时都是自修课。
+        """
+        stats = {}
+        for ti, teacher in enumerate(self.teacher_names):
+            weekly_total = int(self.daily[ti].sum())
+            stats[teacher] = {
+                'daily_hours': self.daily_hours(teacher),
+                'weekly_total': weekly_total,
+                'study_hours': 0 if self._fixed_index is not None else weekly_total,
+                'course_details': self.course_details(teacher),
+            }
+        return stats
+
+
+def count_weekly_hours_simple(study_schedule, fixed_schedule=None, teachers=None):
+    """简化版周课时统计（如果没有正课数据，只统计自修课）
+
+    班级取自自修课安排，按老师统计；未给出 teachers 时从正课数据中识别。
+    自修课安排和正课课表各扫描一遍，所有老师的课时一次累加到 老师×天 的数组中，返回 WeeklyHours。
+    """
+    classes = list(study_schedule.keys())
+    days = _schedule_days(study_schedule)
+    if teachers is None:
+        teachers = discover_teachers(classes, fixed_schedule)
+    class_idx = {class_name: ci for ci, class_name in enumerate(classes)}
+    subject_idx = {subject: si for si, subject in enumerate(SUBJECTS)}
+
+    # teacher_of[班级, 科目]: 任课老师下标，没有为 -1；多出的一列对应 EMPTY（下标 -1）
+    teacher_of = np.full((len(classes), len(SUBJECTS) + 1), -1, dtype=np.intp)
+    for ti, info in enumerate(teachers.values()):
+        for class_name in info['classes']:
+            if class_name in class_idx:
+                teacher_of[class_idx[class_name], subject_idx[info['subject']]] = ti
+
+    # 自修课：班级×天×自修时段 的科目下标
+    study_codes = np.full((len(classes), len(days), len(STUDY_PERIODS)), EMPTY, dtype=np.intp)
+    for ci, class_name in enumerate(classes):
+        class_schedule = study_schedule[class_name]
+        for di, day in enumerate(days):
+            day_schedule = class_schedule.get(day, {})
+            for pi, period in enumerate(STUDY_PERIODS):
+                study_codes[ci, di, pi] = subject_idx.get(day_schedule.get(period), EMPTY)
+    study = _count_by_teacher(teacher_of, study_codes, len(teachers))
+
+    # 正课只建一次索引，11个时段上 SUBJECTS 的课按老师一次累加
+    fixed_index = FixedScheduleIndex(fixed_schedule, classes, days) if fixed_schedule else None
+    daily = study.copy()
+    if fixed_index is not None:
+        grid = np.where(fixed_index.grid < len(SUBJECTS), fixed_index.grid, EMPTY).astype(np.intp)
+        daily += _count_by_teacher(teacher_of, grid, len(teachers))
+
+    return WeeklyHours(teachers, days, classes, study_codes, fixed_index, daily, study)
+
+
+def _count_by_teacher(teacher_of, codes, n_teachers):
+    """codes 为 班级×天×时段 的科目下标（EMPTY 为空），返回 老师×天 的节数"""
+    n_classes, n_days, _ = codes.shape
+    teacher = teacher_of[np.arange(n_classes)[:, None, None], codes]
+    counts = np.zeros((n_teachers + 1, n_days), dtype=np.int64)
+    np.add.at(counts, (teacher.ravel(), np.broadcast_to(np.arange(n_days)[None, :, None], codes.shape).ravel()), 1)
+    # 下标 -1 落在最后一行（没有老师的课），丢掉
+    return counts[:-1]
 
 def display_simple_summary(teacher_stats):
     """显示简化的周课时统计"""
+    import pandas as pd
     print("\n📊 老师周课时统计:")
     print("=" * 60)
     
-    days = ['周一', '周二', '周三', '周四', '周五']
-    subjects = ['语', '数', '英', '科', '社']
+    days = teacher_stats.days
     
     # 创建统计表格
     summary_data = []
-    for subject in subjects:
-        stats = teacher_stats[subject]
-        row = [f"{subject}学老师"]
-        
-        # 添加每日课时
-        for day in days:
-            row.append(stats['daily_hours'][day])
-        
-        # 添加周总计
-        row.append(stats['weekly_total'])
-        summary_data.append(row)
+    for teacher, daily, weekly_total in zip(teacher_stats.teacher_names, teacher_stats.daily.tolist(),
+                                            teacher_stats.weekly_total.tolist()):
+        # 每日课时和周总计
+        summary_data.append([teacher_label(teacher)] + daily + [weekly_total])
     
     columns = ['老师'] + days + ['周总计']
     df = pd.DataFrame(summary_data, columns=columns)
     print(df.to_string(index=False))
 
 def display_study_details(teacher_stats):
-    """显示自修课详情"""
+    """显示自修课详情（此时才生成每节课的说明）"""
     print("\n📋 自修课详细安排:")
     print("=" * 60)
     
-    days = ['周一', '周二', '周三', '周四', '周五']
-    subjects = ['语', '数', '英', '科', '社']
-    
-    for subject in subjects:
-        stats = teacher_stats[subject]
-        print(f"\n{subject}学老师的自修课安排:")
+    for teacher in teacher_stats.teacher_names:
+        course_details = teacher_stats.course_details(teacher)
+        days = list(course_details.keys())
+        print(f"\n{teacher_label(teacher)}的自修课安排:")
         print("-" * 40)
         
         has_classes = False
         for day in days:
-            if stats['course_details'][day]:
-                study_classes = [detail for detail in stats['course_details'][day] 
+            if course_details[day]:
+                study_classes = [detail for detail in course_details[day] 
                                if '自习' in detail]
                 if study_classes:
                     print(f"  {day}: {', '.join(study_classes)}")
@@ -137,56 +209,174 @@ def display_study_details(teacher_stats):
         if not has_classes:
             print(f"  无自修课安排")
         
-        study_total = sum(1 for day in days for detail in stats['course_details'][day] 
+        study_total = sum(1 for day in days for detail in course_details[day] 
                          if '自习' in detail)
         print(f"  自修课总计: {study_total}节")
 
-def validate_study_schedule(study_schedule):
-    """验证自修课安排是否合理"""
+def validate_study_schedule(study_schedule, teachers=None):
+    """验证自修课安排是否合理并打印结果，返回发现的问题列表"""
     print("\n🔍 自修课安排验证:")
     print("=" * 50)
     
-    classes = ['班级7', '班级8']
-    days = ['周一', '周二', '周三', '周四', '周五']
-    subjects = ['语', '数', '英', '科', '社']
+    violations = check_study_schedule(study_schedule, teachers)
+    if violations:
+        print("❌ 发现问题:")
+        for violation in violations:
+            print(f"   - {violation}")
+    else:
+        print("✅ 自修课安排验证通过!")
+    return violations
+
+def check_study_schedule(study_schedule, teachers=None):
+    """检查自修课安排，返回发现的问题列表
+
+    冲突和均匀分配都按老师（同一位老师任教的班级组）检查。
+    """
+    classes = list(study_schedule.keys())
+    days = _schedule_days(study_schedule)
+    if teachers is None:
+        teachers = discover_teachers(classes)
     violations = []
     
-    # 检查每个时段是否有冲突
+    # 检查每个时段同一位老师是否同时出现在多个班级
     for day in days:
-        for period in ['早自习', '午自习', '晚自习']:
-            period_subjects = []
-            for class_name in classes:
-                subject = study_schedule.get(class_name, {}).get(day, {}).get(period)
-                if subject:
-                    if subject in period_subjects:
-                        violations.append(f"{day}{period}: 两个班级都安排了{subject}")
-                    period_subjects.append(subject)
+        for period in STUDY_PERIODS:
+            for teacher, info in teachers.items():
+                teaching = [class_name for class_name in info['classes']
+                            if study_schedule.get(class_name, {}).get(day, {}).get(period) == info['subject']]
+                if len(teaching) > 1:
+                    violations.append(f"{day}{period}: {'、'.join(teaching)}都安排了{info['subject']}")
     
     # 检查科目分配是否均匀
-    for subject in subjects:
+    for teacher, info in teachers.items():
         for period in ['午自习', '晚自习']:
             count = 0
-            for class_name in classes:
+            for class_name in info['classes']:
                 for day in days:
-                    if study_schedule.get(class_name, {}).get(day, {}).get(period) == subject:
+                    if study_schedule.get(class_name, {}).get(day, {}).get(period) == info['subject']:
                         count += 1
-            if count != 0 and count != 2:  # 要么不安排，要么两个班各1节
-                violations.append(f"{period}{subject}: 分配不均匀({count}节)")
-    
-    if violations:
-        print("❌ 发现问题:")
-        for violation in violations:
-            print(f"   - {violation}")
-    else:
-        print("✅ 自修课安排验证通过!")
+            if count != 0 and count != len(info['classes']):  # 要么不安排，要么任教各班各1节
+                violations.append(f"{period}{teacher_label(teacher)}: 分配不均匀({count}节)")
+    return violations
+
+# 批量统计时工作进程共用的正课课表，由 _init_worker 载入
+_worker_fixed_schedule = None
+# CSV 报告中按这个顺序列出各天，草稿中没有的天留空
+WEEK_DAYS = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+
+def _init_worker(classes_file):
+    global _worker_fixed_schedule
+    if classes_file:
+        with open(classes_file, 'r', encoding='utf-8') as f:
+            _worker_fixed_schedule = json.load(f)
+
+
+def process_study_input(input_file):
+    """检查并统计一个自修课草稿，返回一条报告（在工作进程中运行）
+
+    报告为 {'file', 'valid', 'violations': [...], 'teachers': {老师: {'daily_hours', 'weekly_total'}},
+    'seconds', 'error'}，不含课程说明。
+    """
+    record = {'file': input_file, 'valid': None, 'violations': [], 'teachers': {}, 'seconds': None, 'error': None}
+    start = time.perf_counter()
+    try:
+        study_schedule = load_study_input(input_file)
+        fixed_schedule = _worker_fixed_schedule
+        teachers = discover_teachers(list(study_schedule.keys()), fixed_schedule)
+        record['violations'] = check_study_schedule(study_schedule, teachers)
+        record['valid'] = not record['violations']
+        stats = count_weekly_hours_simple(study_schedule, fixed_schedule, teachers)
+        for teacher, weekly_total in zip(stats.teacher_names, stats.weekly_total.tolist()):
+            record['teachers'][teacher] = {'daily_hours': stats.daily_hours(teacher), 'weekly_total': weekly_total}
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['seconds'] = round(time.perf_counter() - start, 4)
+    return record
+
+
+class _ReportWriter:
+    """逐条写出批量统计的报告：.csv 每位老师一行，其余为 JSON Lines 每个文件一行"""
+
+    def __init__(self, f, fmt):
+        self.f = f
+        self.csv = None
+        if fmt == 'csv':
+            self.csv = csv.writer(f)
+            self.csv.writerow(['文件', '老师'] + WEEK_DAYS + ['周总计', '有效', '问题数', '错误'])
+
+    def write(self, record):
+        if self.csv is None:
+            self.f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            common = [record['valid'], len(record['violations']), record['error'] or '']
+            if not record['teachers']:
+                self.csv.writerow([record['file'], ''] + [''] * len(WEEK_DAYS) + [''] + common)
+            for teacher, stats in record['teachers'].items():
+                daily = [stats['daily_hours'].get(day, '') for day in WEEK_DAYS]
+                self.csv.writerow([record['file'], teacher_label(teacher)] + daily + [stats['weekly_total']] + common)
+        # 每条都刷新，中途停止时已完成的部分也在文件里
+        self.f.flush()
+
+
+def run_batch(directory, output_file, classes_file=None, workers=None):
+    """统计目录下所有自修课草稿（*.json），报告逐条写入 output_file
+
+    每个草稿在进程池的一个工作进程中检查和统计，先完成的先写出；同时提交的任务不超过进程数的两倍，
+    结果写出后即丢弃，草稿再多内存也不会增长。output_file 以 .csv 结尾时写 CSV，否则写 JSON Lines。
+    classes_file 为正课课表，给出时统计中包括正课。返回 (文件数, 有问题或出错的文件数)。
+    """
+    files = sorted(glob.glob(os.path.join(directory, '*.json')))
+    if not files:
+        print(f"{directory} 下没有自修课草稿")
+        return 0, 0
+
+    workers = workers or os.cpu_count() or 1
+    fmt = 'csv' if output_file.lower().endswith('.csv') else 'jsonl'
+    print(f"共 {len(files)} 个草稿，开始统计...")
+    done = problems = 0
+    pending = set()
+    # CSV 加 BOM，Excel 直接打开不乱码
+    with open(output_file, 'w', encoding='utf-8-sig' if fmt == 'csv' else 'utf-8', newline='') as f, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(classes_file,)) as pool:
+        writer = _ReportWriter(f, fmt)
+        remaining = iter(files)
+        while True:
+            for input_file in remaining:
+                pending.add(pool.submit(process_study_input, input_file))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record = future.result()
+                writer.write(record)
+                done += 1
+                if record['error'] or not record['valid']:
+                    problems += 1
+                    reason = record['error'] or f"{len(record['violations'])} 个问题"
+                    print(f"❌ {os.path.basename(record['file'])}: {reason}")
+
+    print(f"\n完成 {done} 个草稿，其中 {problems} 个有问题，报告已保存到 {output_file}")
+    return done, problems
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="自修课课时统计")
+    parser.add_argument('--batch', metavar='DIR', help="批量统计目录下所有自修课草稿（*.json），不处理 study_input.json")
+    parser.add_argument('-o', '--output', default='study_hours_report.jsonl', help="批量报告文件，.csv 或 .jsonl")
+    parser.add_argument('-c', '--classes', default='classes.json', help="正课课表，不存在时只统计自修课")
+    parser.add_argument('-j', '--workers', type=int, help="并行的进程数，默认为CPU核数")
+    args = parser.parse_args()
+    if args.batch:
+        run_batch(args.batch, args.output, args.classes if os.path.exists(args.classes) else None, args.workers)
+        return
+
     print("🎯 自修课课时统计工具")
     print("=" * 50)
     
     # 检查是否存在示例文件，如果不存在则创建
-    import os
     if not os.path.exists('study_input.json'):
         print("📁 未找到输入文件，正在创建示例...")
         create_sample_input()
@@ -206,11 +396,14 @@ def main():
         else:
             print("📝 仅显示自修课统计（未找到正课数据）")
         
+        # 识别老师及其任教班级
+        teachers = discover_teachers(list(study_schedule.keys()), fixed_schedule)
+        
         # 验证自修课安排
-        validate_study_schedule(study_schedule)
+        validate_study_schedule(study_schedule, teachers)
         
         # 统计课时
-        teacher_stats = count_weekly_hours_simple(study_schedule, fixed_schedule)
+        teacher_stats = count_weekly_hours_simple(study_schedule, fixed_schedule, teachers)
         
         # 显示结果
         display_simple_summary(teacher_stats)
@@ -219,7 +412,7 @@ def main():
         # 保存结果
         output_data = {
             "自修课安排": study_schedule,
-            "课时统计": teacher_stats
+            "课时统计": teacher_stats.to_dict()
         }
         
         with open('study_hours_result.json', 'w', encoding='utf-8') as f:
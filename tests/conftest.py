@@ -0,0 +1,32 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def classes_file():
+    """仓库自带的正课课表"""
+    return os.path.join(ROOT, 'classes.json')
+
+
+@pytest.fixture
+def fixed_schedule(classes_file):
+    """仓库自带的正课课表（字典），修改后用 write_classes 写成新的课表文件"""
+    with open(classes_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def write_classes(tmp_path):
+    """把正课课表（字典）写到临时目录，返回文件路径"""
+    def write(fixed_schedule, name='classes.json'):
+        path = tmp_path / name
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(fixed_schedule, f, ensure_ascii=False)
+        return str(path)
+    return write
@@ -0,0 +1,45 @@
+import pytest
+
+from backends import BACKENDS, CbcBackend
+from benchmark import generate_timetable
+from main import StudySessionScheduler
+from validation import ScheduleValidator
+
+
+@pytest.fixture(params=[None, 8], ids=['bundled', 'grade8'])
+def timetable_file(request, classes_file, write_classes):
+    """自带的课表和8个班的合成课表"""
+    if request.param is None:
+        return classes_file
+    return write_classes(generate_timetable(request.param))
+
+
+def test_native_matches_cbc(timetable_file):
+    cbc = StudySessionScheduler(timetable_file)
+    cbc.solve()
+    native = StudySessionScheduler(timetable_file)
+    schedule = native.solve(backend=BACKENDS['native']())
+
+    assert native.objective_value == cbc.objective_value
+    assert native.prob.status == cbc.prob.status
+    result = ScheduleValidator(native).validate(schedule)
+    assert result.valid
+    assert result.penalty == native.objective_value
+
+
+def test_native_reports_infeasible(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.update_fixed_slot('班级8', '周二', 3, '数', resolve=False)
+    assert scheduler.solve(backend=BACKENDS['native']()) is None
+
+
+def test_native_rejects_soft_rules(classes_file):
+    scheduler = StudySessionScheduler(classes_file, soft=10)
+    with pytest.raises(ValueError):
+        scheduler.solve(backend=BACKENDS['native']())
+
+
+def test_backend_registry():
+    assert sorted(BACKENDS) == ['cbc', 'native', 'portfolio']
+    assert isinstance(BACKENDS['cbc'](), CbcBackend)
+    assert BACKENDS['native'](time_limit=5).time_limit == 5
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from batch import solve_batch
+from main import StudySessionScheduler
+from validation import ScheduleValidator
+
+
+@pytest.mark.parametrize('backend', ['cbc', 'native'])
+def test_solve_batch(fixed_schedule, write_classes, tmp_path, backend):
+    write_classes(fixed_schedule, 'a_bundled.json')
+    infeasible = json.loads(json.dumps(fixed_schedule))
+    infeasible['班级8']['周二'][2]['course'] = '数'
+    write_classes(infeasible, 'b_infeasible.json')
+    (tmp_path / 'c_broken.json').write_text('{', encoding='utf-8')
+    output_dir = tmp_path / 'out'
+
+    summaries = solve_batch(str(tmp_path), str(output_dir), backend=backend, workers=2)
+
+    assert [summary['grade'] for summary in summaries] == ['a_bundled', 'b_infeasible', 'c_broken']
+    solved, infeasible_summary, broken = summaries
+    assert solved['status'] == 'Optimal' and solved['optimal'] and solved['valid']
+    assert solved['objective'] == 2 and solved['continuous_count'] == 2
+    assert infeasible_summary['status'] == 'Infeasible' and infeasible_summary['output_file'] is None
+    assert broken['error'].startswith('JSONDecodeError')
+
+    with open(solved['output_file'], 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    scheduler = StudySessionScheduler(str(tmp_path / 'a_bundled.json'))
+    assert ScheduleValidator(scheduler).validate(result['study_schedule']).valid
+    assert set(result['complete_schedule']) == set(scheduler.classes)
+    with open(output_dir / 'summary.json', 'r', encoding='utf-8') as f:
+        assert json.load(f) == summaries
+
+    # 输出的完整课表和汇总在下一次批量求解时不会被当成课表
+    again = solve_batch(str(output_dir), workers=1, backend=backend)
+    assert again == []
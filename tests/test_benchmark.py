@@ -0,0 +1,42 @@
+import pytest
+
+from benchmark import generate_timetable, DAILY_HOURS
+from main import StudySessionScheduler
+from native import NativeBackend
+from validation import ScheduleValidator
+
+
+@pytest.mark.parametrize('n_classes', [2, 6, 10])
+def test_generated_optimum_nonzero(write_classes, n_classes):
+    timetable = generate_timetable(n_classes)
+    for class_name, week in timetable.items():
+        for d, lessons in enumerate(week.values()):
+            courses = [item['course'] for item in lessons]
+            assert {subject: courses.count(subject) for subject in DAILY_HOURS[d]} == DAILY_HOURS[d]
+
+    scheduler = StudySessionScheduler(write_classes(timetable))
+    schedule = scheduler.solve()
+    assert schedule is not None and ScheduleValidator(scheduler).validate(schedule).valid
+    # 连续上课来自自修安排，不是只含正课的窗口
+    assert scheduler.objective_value > 0 and scheduler._fixed_continuity_penalty() == 0
+
+    native = StudySessionScheduler(write_classes(timetable))
+    native.solve(backend=NativeBackend())
+    assert native.objective_value == scheduler.objective_value
+
+
+def test_clustered_days(write_classes):
+    timetable = generate_timetable(2, clustered_days=0)
+    first, second = (timetable[name] for name in ('班级1', '班级2'))
+    for day in first:
+        courses = [item['course'] for item in first[day]]
+        assert [item['course'] for item in second[day]] == courses[4:] + courses[:4]
+
+    timetable = generate_timetable(2, clustered_days=2)
+    first, second = (timetable[name] for name in ('班级1', '班级2'))
+    shifted = [day for day in first
+               if [item['course'] for item in second[day]][1:] == [item['course'] for item in first[day]][:-1]]
+    assert len(shifted) == 2
+
+    with pytest.raises(ValueError):
+        generate_timetable(2, clustered_days=6)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from main import StudySessionScheduler
+from timetable import CompleteSchedule, EMPTY, SLOTS_PER_DAY, slot_label
+from validation import ScheduleValidator
+
+
+def reference_complete_schedule(scheduler, study_schedule):
+    """最初 generate_complete_schedule 的字典格式：早自习、第1-4节、午自习、第6-9节、晚自习"""
+    complete = {}
+    for class_name in scheduler.classes:
+        complete[class_name] = {}
+        for day in scheduler.days:
+            fixed = scheduler.fixed_schedule[class_name][day]
+            study = study_schedule[class_name][day]
+            lessons = [{"period": 0, "course": study['早自习'] or "", "type": "早自习"}]
+            lessons += [{"period": i + 1, "course": fixed[i]['course'], "type": "正课"} for i in range(4)]
+            lessons.append({"period": 5, "course": study['午自习'] or "", "type": "午自习"})
+            lessons += [{"period": i + 2, "course": fixed[i]['course'], "type": "正课"} for i in range(4, 8)]
+            lessons.append({"period": 10, "course": study['晚自习'] or "", "type": "晚自习"})
+            complete[class_name][day] = lessons
+    return complete
+
+
+@pytest.fixture
+def scheduler(classes_file):
+    return StudySessionScheduler(classes_file)
+
+
+def study_schedules(scheduler):
+    """最优解和几个随机安排（含未安排的时段）"""
+    validator = ScheduleValidator(scheduler)
+    rng = np.random.RandomState(0)
+    schedules = [scheduler.solve()]
+    for _ in range(3):
+        codes = rng.randint(EMPTY, len(scheduler.subjects), size=scheduler.x.shape[:3]).astype(np.int8)
+        schedules.append(validator.decode(codes))
+    return schedules
+
+
+def test_to_dict_matches_reference(scheduler):
+    for schedule in study_schedules(scheduler):
+        complete = scheduler.generate_complete_schedule(schedule)
+        assert isinstance(complete, CompleteSchedule)
+        assert complete.grid.dtype == np.int8
+        assert complete.grid.shape == (len(scheduler.classes), len(scheduler.days), SLOTS_PER_DAY)
+        assert complete.to_dict() == reference_complete_schedule(scheduler, schedule)
+
+
+def test_course_lookup(scheduler):
+    schedule = study_schedules(scheduler)[-1]
+    complete = scheduler.generate_complete_schedule(schedule)
+    reference = reference_complete_schedule(scheduler, schedule)
+    for ci, class_name in enumerate(scheduler.classes):
+        for di, day in enumerate(scheduler.days):
+            for slot, lesson in enumerate(reference[class_name][day]):
+                assert complete.course(ci, di, slot) == lesson['course']
+                expected = lesson['type'] if lesson['type'] != '正课' else f"第{slot}节"
+                assert slot_label(slot) == expected
+
+
+@pytest.fixture(params=['bundled', 'generated'])
+def grade(request, classes_file, write_classes):
+    if request.param == 'bundled':
+        return StudySessionScheduler(classes_file)
+    from benchmark import generate_timetable
+    return StudySessionScheduler(write_classes(generate_timetable(6)))
+
+
+def test_teacher_timetable_matches_brute_force(grade):
+    teachers = grade.teachers
+    schedules = study_schedules(grade)
+    for schedule in schedules:
+        complete = grade.generate_complete_schedule(schedule)
+        timetable = complete.teacher_timetable(teachers)
+        assert complete.teacher_timetable(teachers) is timetable
+
+        for ti, (teacher, info) in enumerate(teachers.items()):
+            for di in range(len(grade.days)):
+                busy = []
+                for slot in range(SLOTS_PER_DAY):
+                    classes = [class_name for class_name in info['classes']
+                               if complete.course(grade.classes.index(class_name), di, slot) == info['subject']]
+                    assert timetable.classes[ti][di][slot] == classes
+                    assert timetable.counts[ti, di, slot] == len(classes)
+                    busy.append(bool(classes))
+                assert timetable.daily_hours[ti, di] == sum(timetable.counts[ti, di])
+                windows = [all(busy[start:start + 3]) for start in range(SLOTS_PER_DAY - 2)]
+                assert timetable.continuous_windows()[ti, di].tolist() == windows
+
+    # 最优解的连续上课次数与验证器一致
+    timetable = grade.generate_complete_schedule(schedules[0]).teacher_timetable(teachers)
+    expected = ScheduleValidator(grade).validate(schedules[0]).details['teacher_continuous']
+    assert timetable.continuous_counts().tolist() == expected.tolist()
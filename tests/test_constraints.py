@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+
+from main import StudySessionScheduler
+from validation import ScheduleValidator
+
+
+def reference_violations(scheduler, schedule):
+    """按 constraints.json 的规则逐条直接检查排课方案（字典），返回被违反的规则名称
+
+    不经过约束行编译，与最初 main.py 中手写的检查相同，用来核对编译出的约束行。
+    """
+    classes, days, periods = scheduler.classes, scheduler.days, scheduler.study_periods
+
+    def study(c, d, p, s):
+        return int(schedule[c][d][p] == s)
+
+    def fixed(c, d, s):
+        return sum(item['course'] == s for item in scheduler.fixed_schedule[c][d])
+
+    def teachers_of(subject):
+        return [info for info in scheduler.teachers.values() if info['subject'] == subject]
+
+    violated = set()
+    for rule in scheduler.spec['rules']:
+        kind = rule['type']
+        if kind == 'period_count':
+            bad = any(sum(study(c, d, rule['period'], s) for d in days) != n
+                      for c in classes for s, n in rule['counts'].items())
+        elif kind == 'allowed_days':
+            bad = any(study(c, d, rule['period'], rule['subject'])
+                      for c in classes for d in days if d not in rule['days'])
+        elif kind == 'forbidden':
+            bad = any(study(c, d, rule['period'], rule['subject'])
+                      for c in classes for d in rule['days'] if d in days)
+        elif kind == 'fixed':
+            bad = not study(rule['class'], rule['day'], rule['period'], rule['subject'])
+        elif kind == 'class_daily_limit':
+            bad = any(fixed(c, d, s) + sum(study(c, d, p, s) for p in periods) > rule['max']
+                      for c in classes for d in days for s in scheduler.subjects)
+        elif kind == 'teacher_daily_limit':
+            bad = any(sum(fixed(c, d, info['subject']) + sum(study(c, d, p, info['subject']) for p in periods)
+                          for c in info['classes']) > rule['max']
+                      for info in scheduler.teachers.values() for d in days)
+        elif kind == 'progress_balance':
+            bad = False
+            for info in teachers_of(rule['subject']):
+                for a, b in zip(info['classes'], info['classes'][1:]):
+                    diff = np.cumsum([study(a, d, rule['period'], rule['subject'])
+                                      - study(b, d, rule['period'], rule['subject']) for d in days])
+                    bad = bad or bool((np.abs(diff) > rule['max_diff']).any())
+        elif kind == 'teacher_day_count':
+            bad = any(sum(study(c, d, rule['period'], rule['subject']) for c in info['classes'] for d in rule['days'])
+                      != rule['count'] for info in teachers_of(rule['subject']))
+        elif kind == 'teacher_conflict':
+            bad = any(sum(study(c, d, p, info['subject']) for c in info['classes']) > 1
+                      for info in scheduler.teachers.values() for d in days for p in periods)
+        elif kind == 'one_per_slot':
+            bad = False  # 字典中每格只有一门课
+        else:
+            raise AssertionError(f"未覆盖的规则类型: {kind}")
+        if bad:
+            violated.add(rule['name'])
+    return violated
+
+
+def test_compiled_rows_match_reference_rules(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    schedule = scheduler.solve()
+    validator = ScheduleValidator(scheduler)
+    assert reference_violations(scheduler, schedule) == set()
+
+    # 最优解的每一格逐一改成其他科目或空：编译的约束行与直接检查判断出的违反规则相同
+    for class_name in scheduler.classes:
+        for day in scheduler.days:
+            for period in scheduler.study_periods:
+                for subject in scheduler.subjects + [None]:
+                    changed = json.loads(json.dumps(schedule))
+                    changed[class_name][day][period] = subject
+                    result = validator.validate(changed)
+                    compiled = {name for name, messages in result.violations.items() if messages}
+                    assert compiled == reference_violations(scheduler, changed), (class_name, day, period, subject)
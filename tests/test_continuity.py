@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+import pytest
+
+from benchmark import generate_timetable
+from main import StudySessionScheduler
+from timetable import STUDY_WINDOWS, FIXED_WINDOWS
+from validation import ScheduleValidator
+
+
+@pytest.fixture(params=['bundled', 'generated'])
+def scheduler(request, classes_file, tmp_path):
+    if request.param == 'bundled':
+        return StudySessionScheduler(classes_file)
+    path = tmp_path / 'classes.json'
+    path.write_text(json.dumps(generate_timetable(4), ensure_ascii=False), encoding='utf-8')
+    return StudySessionScheduler(str(path))
+
+
+def test_indicators_match_windows(scheduler):
+    schedule = scheduler.solve()
+    assert schedule is not None
+
+    validator = ScheduleValidator(scheduler)
+    result = validator.validate(schedule)
+    windows = result.details['continuous_windows']
+    values = np.vectorize(lambda var: round(var.varValue))(scheduler.continuous_x)
+    # 每个指示变量等于它自己的窗口是否连续上课
+    assert (values == windows[..., [window[0] for window in STUDY_WINDOWS]]).all()
+    # 目标值 = 指示变量的加权和 + 只含正课的窗口，与验证器的惩罚一致
+    assert scheduler.objective_value == result.penalty
+    fixed = windows[..., [window[0] for window in FIXED_WINDOWS]].sum(axis=(1, 2))
+    assert scheduler._fixed_continuity_penalty() == fixed @ validator.teacher_weight
+
+
+def test_no_free_indicators(scheduler):
+    scheduler._build_model()
+    linked = {}
+    for constraint in scheduler.prob.constraints():
+        if constraint.name.startswith('cont_'):
+            for var in constraint.keys():
+                linked.setdefault(var.name, set()).add(constraint.name[-2:])
+    # 每个指示变量都有上下两条约束，没有不受约束的变量
+    assert scheduler.continuous_x.shape[-1] == len(STUDY_WINDOWS)
+    for var in scheduler.continuous_x.ravel():
+        assert linked[var.name] == {'ge', 'le'}
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from diagnosis import FeasibilityModel
+from main import StudySessionScheduler
+
+
+def assert_minimal_conflict(classes_file, rules):
+    """在新建的排课器上检查：这些规则一起不可行，去掉任意一条都可行"""
+    scheduler = StudySessionScheduler(classes_file)
+    compiled = scheduler.compiled
+    model = FeasibilityModel(scheduler)
+
+    def rows_of(names):
+        return np.flatnonzero(np.isin(np.array(compiled.names)[compiled.family], names) & ~compiled.soft)
+
+    assert not model.feasible(rows_of(rules))
+    for name in rules:
+        assert model.feasible(rows_of([rule for rule in rules if rule != name])), name
+
+
+@pytest.mark.parametrize('class_name, day, period, subject', [
+    ('班级8', '周二', 3, '数'),
+    ('班级8', '周二', 3, '英'),
+    ('班级7', '周一', 4, '语'),
+])
+def test_diagnosis_after_solve(fixed_schedule, write_classes, class_name, day, period, subject):
+    # 预处理仍能固定一部分变量，无解要到求解时才发现
+    fixed_schedule[class_name][day][period - 1]['course'] = subject
+    classes_file = write_classes(fixed_schedule)
+    scheduler = StudySessionScheduler(classes_file)
+    assert scheduler.solve() is None
+    assert (scheduler.presolved.fixed >= 0).any()
+
+    diagnosis = scheduler.diagnose_infeasibility()
+    assert not diagnosis['feasible'] and diagnosis['rows']
+    assert_minimal_conflict(classes_file, diagnosis['rules'])
+    # 与不先求解时的诊断相同：求解时固定的上下界不影响诊断
+    fresh = StudySessionScheduler(classes_file).diagnose_infeasibility()
+    assert fresh['rules'] == diagnosis['rules'] and fresh['rows'] == diagnosis['rows']
+
+
+def test_feasible_spec(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.solve()
+    assert scheduler.diagnose_infeasibility()['feasible']
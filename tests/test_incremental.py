@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from main import StudySessionScheduler
+from validation import ScheduleValidator
+
+
+def course_names(fixed_index):
+    """正课索引的 班级×天×时段 课程名称（课程编号随出现顺序变化，只能按名称比较）"""
+    return np.array(fixed_index.courses + [''])[fixed_index.grid]
+
+
+def constraint_terms(scheduler):
+    return {constraint.name: (constraint.sense, float(constraint.constant),
+                              sorted((var.name, coef) for var, coef in constraint.items()))
+            for constraint in scheduler.prob.constraints()}
+
+
+@pytest.mark.parametrize('class_name, day, period, course', [
+    ('班级7', '周三', 6, '科'),
+    ('班级7', '周二', 1, '数'),
+    ('班级8', '周三', 5, '英'),
+])
+def test_update_fixed_slot_matches_rebuild(classes_file, fixed_schedule, write_classes,
+                                           class_name, day, period, course):
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.solve()
+    schedule = scheduler.update_fixed_slot(class_name, day, period, course)
+
+    fixed_schedule[class_name][day][period - 1]['course'] = course
+    fresh = StudySessionScheduler(write_classes(fixed_schedule))
+    fresh.solve()
+
+    assert (course_names(scheduler.fixed_index) == course_names(fresh.fixed_index)).all()
+    assert (scheduler.fixed_timeline == fresh.fixed_timeline).all()
+    assert (scheduler.compiled.rhs == fresh.compiled.rhs).all()
+    # 增量修改后的模型与按新课表重新建立的模型逐条相同
+    assert constraint_terms(scheduler) == constraint_terms(fresh)
+    assert scheduler.objective_value == fresh.objective_value
+    assert ScheduleValidator(fresh).validate(schedule).valid
+
+
+def test_update_to_infeasible_matches_rebuild(classes_file, fixed_schedule, write_classes):
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.solve()
+    # 班级8周二第3节改成数学后无解
+    assert scheduler.update_fixed_slot('班级8', '周二', 3, '数', cache=None) is None
+
+    fixed_schedule['班级8']['周二'][2]['course'] = '数'
+    fresh = StudySessionScheduler(write_classes(fixed_schedule))
+    assert fresh.solve() is None
+    assert constraint_terms(scheduler) == constraint_terms(fresh)
+
+
+def test_update_without_resolve(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.solve()
+    original = scheduler.fixed_schedule['班级7']['周二'][0]['course']
+    assert scheduler.update_fixed_slot('班级7', '周二', 1, '数', resolve=False) is None
+    assert scheduler.fixed_schedule['班级7']['周二'][0]['course'] == '数'
+    # 改回原来的课程后重新求解，得到原课表的最优值
+    schedule = scheduler.update_fixed_slot('班级7', '周二', 1, original)
+    assert scheduler.objective_value == 2
+    assert ScheduleValidator(scheduler).validate(schedule).valid
+
+
+def test_update_fixed_slot_errors(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    with pytest.raises(ValueError):
+        scheduler.update_fixed_slot('班级9', '周三', 6, '科')
+    with pytest.raises(ValueError):
+        scheduler.update_fixed_slot('班级7', '周日', 6, '科')
+    with pytest.raises(ValueError):
+        scheduler.update_fixed_slot('班级7', '周三', 9, '科')
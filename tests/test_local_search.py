@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from benchmark import generate_timetable
+from local_search import LocalSearch, HARD_WEIGHT
+from main import StudySessionScheduler
+from timetable import EMPTY
+from validation import ScheduleValidator
+
+
+@pytest.fixture(params=['bundled', 'generated'])
+def scheduler(request, classes_file, write_classes):
+    if request.param == 'bundled':
+        return StudySessionScheduler(classes_file, soft={'语文早自习进度平衡': 3})
+    return StudySessionScheduler(write_classes(generate_timetable(6)))
+
+
+def full_cost(scheduler, codes):
+    """不用增量，按验证器重新算出的代价"""
+    validator = ScheduleValidator(scheduler)
+    compiled = scheduler.compiled
+    onehot = (codes[..., None] == np.arange(len(scheduler.subjects))).reshape(1, -1)
+    amounts = compiled.violation(compiled.activity(onehot))[0]
+    weights = np.where(compiled.soft, compiled.weights, HARD_WEIGHT)
+    return validator.validate(codes).penalty + amounts @ weights
+
+
+def random_codes(scheduler, rng):
+    shape = scheduler.x.shape[:3]
+    return rng.randint(len(scheduler.subjects), size=shape).astype(np.int8)
+
+
+def test_delta_matches_full_cost(scheduler):
+    rng = np.random.RandomState(0)
+    search = LocalSearch(scheduler, seed=0)
+    search._load(random_codes(scheduler, rng))
+    assert search.cost == pytest.approx(full_cost(scheduler, np.array(search.codes)))
+
+    for _ in range(300):
+        cells = search._propose()
+        if cells is None:
+            continue
+        (c1, d1, p1), (c2, d2, p2) = cells
+        assignments = [(c1, d1, p1, search.codes[c2][d2][p2]), (c2, d2, p2, search.codes[c1][d1][p1])]
+        rows, slots = search._changes(assignments)
+        delta = search._delta(rows, slots)
+        before = search.cost
+        search._commit(assignments, rows, slots, delta)
+        codes = np.array(search.codes, dtype=np.int8)
+        assert search.cost == pytest.approx(full_cost(scheduler, codes))
+        assert search.cost - before == pytest.approx(delta)
+
+
+def test_cost_of_optimum_is_objective(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    schedule = scheduler.solve()
+    search = LocalSearch(scheduler)
+    search._load(ScheduleValidator(scheduler).encode(schedule))
+    assert search.cost == scheduler.objective_value
+
+
+def test_improve_never_worse(scheduler):
+    rng = np.random.RandomState(1)
+    validator = ScheduleValidator(scheduler)
+    for seed in range(3):
+        codes = random_codes(scheduler, rng)
+        codes[rng.rand(*codes.shape) < 0.1] = EMPTY
+        draft = validator.decode(codes)
+        improved = scheduler.improve_schedule(draft, iterations=2000, seed=seed, quiet=True)
+        stats = scheduler.local_search_stats
+        assert stats['cost'] <= stats['initial_cost']
+        assert full_cost(scheduler, validator.encode(improved)) == pytest.approx(stats['cost'])
+
+
+def test_improve_keeps_optimum(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    schedule = scheduler.solve()
+    improved = scheduler.improve_schedule(schedule, iterations=2000, quiet=True)
+    assert scheduler.local_search_stats['cost'] == scheduler.objective_value
+    assert ScheduleValidator(scheduler).validate(improved).valid
+
+    # 同一个种子得到同样的结果
+    again = scheduler.improve_schedule(schedule, iterations=2000, quiet=True)
+    assert again == improved
@@ -0,0 +1,85 @@
+import os
+
+from main import StudySessionScheduler
+from model_cache import ModelCache
+from validation import ScheduleValidator
+
+
+def write_entry(cache, key, size):
+    def write_model(path):
+        with open(path, 'w') as f:
+            f.write('x' * size)
+        return {}
+    return cache.store(key, write_model)
+
+
+def set_used(cache, key, when):
+    for path in cache._paths(key):
+        os.utime(path, (when, when))
+
+
+def test_cache_hit_skips_build(classes_file, tmp_path):
+    cache = ModelCache(str(tmp_path / 'cache'))
+    cold = StudySessionScheduler(classes_file)
+    cold.solve(cache=cache)
+    hit = StudySessionScheduler(classes_file)
+    schedule = hit.solve(cache=cache)
+
+    assert not hit._model_built
+    assert hit.objective_value == cold.objective_value
+    assert ScheduleValidator(hit).validate(schedule).valid
+    assert len(list((tmp_path / 'cache').glob('*.mps'))) == 1
+
+
+def test_key_depends_on_timetable_and_rules(fixed_schedule):
+    spec = {'rules': [{'name': '规则', 'type': 'one_per_slot'}]}
+    key = ModelCache.key(fixed_schedule, spec)
+    assert key == ModelCache.key(dict(fixed_schedule), dict(spec))
+    assert key != ModelCache.key(fixed_schedule, {'rules': []})
+    changed = dict(fixed_schedule, 班级7=dict(fixed_schedule['班级7'], 周一=fixed_schedule['班级7']['周二']))
+    assert key != ModelCache.key(changed, spec)
+
+
+def test_lru_eviction(tmp_path):
+    cache = ModelCache(str(tmp_path / 'cache'), max_bytes=2500)
+    write_entry(cache, 'a', 1000)
+    write_entry(cache, 'b', 1000)
+    set_used(cache, 'a', 1000)
+    set_used(cache, 'b', 2000)
+    # 查找 a 刷新其使用时间，b 成为最久未用的条目
+    assert cache.lookup('a') is not None
+    write_entry(cache, 'c', 1000)
+
+    assert cache.lookup('b') is None
+    assert cache.lookup('a') is not None
+    assert cache.lookup('c') is not None
+
+
+def test_new_entry_kept_when_over_limit(tmp_path):
+    cache = ModelCache(str(tmp_path / 'cache'), max_bytes=500)
+    write_entry(cache, 'a', 1000)
+    write_entry(cache, 'b', 1000)
+    assert cache.lookup('a') is None
+    assert cache.lookup('b') is not None
+
+
+def test_cache_after_update_fixed_slot(classes_file, fixed_schedule, write_classes, tmp_path):
+    cache = ModelCache(str(tmp_path / 'cache'))
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.solve(cache=cache)
+    schedule = scheduler.update_fixed_slot('班级7', '周三', 6, '科', cache=cache)
+    # 修改后的课表是另一个键，不会用到修改前的模型
+    assert len(list((tmp_path / 'cache').glob('*.mps'))) == 2
+
+    fixed_schedule['班级7']['周三'][5]['course'] = '科'
+    modified_file = write_classes(fixed_schedule)
+    uncached = StudySessionScheduler(modified_file)
+    uncached.solve()
+    hit = StudySessionScheduler(modified_file)
+    hit_schedule = hit.solve(cache=cache)
+
+    assert len(list((tmp_path / 'cache').glob('*.mps'))) == 2
+    assert scheduler.objective_value == uncached.objective_value == hit.objective_value
+    validator = ScheduleValidator(uncached)
+    assert validator.validate(schedule).valid
+    assert validator.validate(hit_schedule).valid
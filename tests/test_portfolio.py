@@ -0,0 +1,76 @@
+import subprocess
+import sys
+
+import pytest
+from pulp import LpSolutionOptimal, LpSolutionIntegerFeasible, LpStatusInfeasible
+
+import backends
+from backends import CbcBackend, PortfolioBackend, PORTFOLIO_CONFIGS
+from main import StudySessionScheduler
+from validation import ScheduleValidator
+
+
+def test_configs_distinct():
+    configs = PortfolioBackend(size=len(PORTFOLIO_CONFIGS) + 2).configs()
+    assert configs[:len(PORTFOLIO_CONFIGS)] == PORTFOLIO_CONFIGS
+    assert len(set(configs)) == len(configs)
+    assert 1 <= PortfolioBackend().size <= len(PORTFOLIO_CONFIGS)
+
+
+def test_portfolio_matches_cbc(classes_file):
+    reference = StudySessionScheduler(classes_file)
+    reference.solve()
+
+    scheduler = StudySessionScheduler(classes_file)
+    backend = PortfolioBackend(size=3, threads=1)
+    schedule = scheduler.solve(backend=backend)
+    assert scheduler.objective_value == reference.objective_value
+    assert scheduler.prob.sol_status == LpSolutionOptimal
+    assert backend.winner in backend.configs()
+    assert ScheduleValidator(scheduler).validate(schedule).valid
+
+    scheduler = StudySessionScheduler(classes_file)
+    assert scheduler.solve(portfolio=2) is not None
+    assert scheduler.objective_value == reference.objective_value
+
+
+def test_portfolio_infeasible(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.update_fixed_slot('班级8', '周二', 3, '数', resolve=False)
+    assert scheduler.solve(portfolio=2) is None
+    assert scheduler.prob.status == LpStatusInfeasible
+
+
+def test_portfolio_rejects_progress(classes_file):
+    with pytest.raises(ValueError, match='progress'):
+        StudySessionScheduler(classes_file).solve(portfolio=2, progress=print)
+
+
+def test_best_unproven_member(classes_file, monkeypatch):
+    # 各成员都到了时间上限：取目标值最好的可行解，失败的成员不影响结果
+    headers = ["Stopped on time - objective value 5.00000000", None,
+               "Stopped on time - objective value 3.00000000", "Stopped on time - objective value 4.00000000"]
+    started = []
+
+    def fake_start(mps_path, sol_path, options=(), mip_start=None):
+        header = headers[len(started)]
+        started.append(options)
+        if header is None:
+            return subprocess.Popen([sys.executable, '-c', 'raise SystemExit(1)'])
+        with open(sol_path, 'w') as f:
+            f.write(f"{header}\n")
+        return subprocess.Popen([sys.executable, '-c', 'pass'])
+
+    monkeypatch.setattr(backends, 'start_cbc', fake_start)
+    backend = PortfolioBackend(size=4, time_limit=5)
+    result = backend.solve(StudySessionScheduler(classes_file))
+    assert result.objective == 3.0 and result.sol_status == LpSolutionIntegerFeasible
+    assert backend.winner == backend.configs()[2]
+    assert all('sec 5' in options for options in started)
+
+
+def test_threads_option(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    assert scheduler.solve(threads=2) is not None
+    assert scheduler.objective_value == 2
+    assert 'threads 2' in CbcBackend(threads=2)._cbc_options()[0]
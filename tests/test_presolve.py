@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+import pytest
+
+import main
+from benchmark import generate_timetable
+from main import StudySessionScheduler
+from presolve import Presolved
+from validation import ScheduleValidator
+
+
+def no_presolve(scheduler, presolve=main.presolve):
+    """不固定变量、不删行、不加对称性约束的预处理结果"""
+    real = presolve(scheduler)
+    return Presolved(np.full_like(real.fixed, -1), np.ones_like(real.keep), np.zeros_like(real.row_constant),
+                     [], real.stats)
+
+
+@pytest.fixture(params=['bundled', 'generated'])
+def timetable_file(request, classes_file, tmp_path):
+    if request.param == 'bundled':
+        return classes_file
+    # 生成的六个班中有可互换的班级组，预处理会加对称性约束
+    path = tmp_path / 'classes.json'
+    path.write_text(json.dumps(generate_timetable(6), ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+def test_presolve_keeps_optimum(timetable_file, monkeypatch):
+    presolved = StudySessionScheduler(timetable_file)
+    presolved.solve()
+
+    with monkeypatch.context() as m:
+        m.setattr(main, 'presolve', no_presolve)
+        plain = StudySessionScheduler(timetable_file)
+        schedule = plain.solve()
+
+    assert plain.objective_value == presolved.objective_value
+    # 预处理固定的变量在不做预处理求出的解中取同样的值
+    fixed = presolved.presolved.fixed
+    assert (fixed >= 0).any()
+    codes = ScheduleValidator(plain).encode(schedule)
+    onehot = (codes[..., None] == np.arange(len(plain.subjects))).ravel()
+    assert (onehot[fixed >= 0] == fixed[fixed >= 0]).all()
@@ -0,0 +1,61 @@
+import json
+import shutil
+import subprocess
+import sys
+
+import main
+from main import StudySessionScheduler
+from profiling import Profiler
+
+
+def test_profiler_accumulates():
+    profiler = Profiler()
+    for _ in range(3):
+        with profiler.phase('cbc'):
+            pass
+    assert profiler.phases['cbc']['calls'] == 3 and profiler.phases['cbc']['seconds'] >= 0
+
+    disabled = Profiler(enabled=False)
+    with disabled.phase('cbc'):
+        pass
+    assert disabled.phases == {}
+
+
+def test_default_scheduler_not_profiled(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.solve()
+    assert scheduler.profiler.phases == {}
+
+
+def test_profile_report(classes_file):
+    scheduler = StudySessionScheduler(classes_file, profile=True)
+    scheduler.solve()
+    report = scheduler.profile_report()
+
+    for phase in ('load_schedule', 'compile_constraints', 'presolve', 'add_constraints', 'write_mps', 'cbc',
+                  'read_solution', 'extract_solution'):
+        assert report['phases'][phase]['calls'] == 1, phase
+    assert report['objective'] == scheduler.objective_value and report['status'] == 'Optimal'
+
+    model = report['model']
+    families = model['families']
+    assert [family['name'] for family in families[:-1]] == [rule['name'] for rule in scheduler.compiled.rules]
+    assert sum(family['rows'] for family in families) == model['constraints']
+    assert sum(family['nonzeros'] for family in families) == model['nonzeros']
+    assert model['variables'] == model['schedule_variables'] + model['continuity_variables']
+    # 模型中的约束 = 预处理保留的行 + 对称性约束
+    kept = sum(family['rows_after_presolve'] for family in families)
+    assert kept + len(scheduler.presolved.cuts) == len(scheduler.prob.constraints())
+
+
+def test_cli_writes_profile_next_to_output(classes_file, tmp_path):
+    shutil.copy(classes_file, tmp_path / 'classes.json')
+    (tmp_path / 'out').mkdir()
+    subprocess.run([sys.executable, main.__file__, '--profile', '--headless', '-o', 'out/x.json'],
+                   cwd=tmp_path, check=True, capture_output=True)
+
+    assert (tmp_path / 'out' / 'x.json').exists()
+    with open(tmp_path / 'out' / 'solve_profile.json', encoding='utf-8') as f:
+        profile = json.load(f)
+    assert profile['status'] == 'Optimal' and 'cbc' in profile['phases']
+    assert not (tmp_path / 'solve_profile.json').exists()
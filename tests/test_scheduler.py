@@ -0,0 +1,31 @@
+from main import StudySessionScheduler
+from validation import ScheduleValidator
+
+
+def test_solve_bundled_classes(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    schedule = scheduler.solve()
+
+    assert schedule is not None
+    assert scheduler.objective_value == 2
+    result = ScheduleValidator(scheduler).validate(schedule)
+    assert result.valid
+    assert result.continuous_count == 2
+
+
+def test_discover_whole_grade(fixed_schedule, write_classes):
+    # 四个班：班级5、6 与班级7、8 的正课相同，按文件顺序两个班一组共用老师
+    grade = {'班级5': fixed_schedule['班级7'], '班级6': fixed_schedule['班级8'],
+             '班级7': fixed_schedule['班级7'], '班级8': fixed_schedule['班级8']}
+    scheduler = StudySessionScheduler(write_classes(grade))
+
+    assert scheduler.classes == ['班级5', '班级6', '班级7', '班级8']
+    assert scheduler.teachers['语1'] == {'subject': '语', 'classes': ['班级5', '班级6']}
+    assert scheduler.teachers['语2'] == {'subject': '语', 'classes': ['班级7', '班级8']}
+    assert len(scheduler.teachers) == 2 * len(scheduler.subjects)
+
+    schedule = scheduler.solve()
+    assert schedule is not None and set(schedule) == set(grade)
+    # 两组互不相关，最优值是两个班时的两倍
+    assert scheduler.objective_value == 4
+    assert ScheduleValidator(scheduler).validate(schedule).valid
@@ -0,0 +1,71 @@
+import pytest
+
+from constraints import apply_soft_weights, load_constraint_spec, HARD_RULE_TYPES
+from main import StudySessionScheduler, DEFAULT_CONSTRAINTS_FILE
+from validation import ScheduleValidator
+
+
+def test_apply_soft_weights():
+    spec = load_constraint_spec(DEFAULT_CONSTRAINTS_FILE)
+    assert apply_soft_weights(spec, None) is spec
+
+    named = apply_soft_weights(spec, {'科学周二不能接晚托': 5})
+    weights = {rule['name']: rule.get('soft_weight') for rule in named['rules']}
+    assert weights['科学周二不能接晚托'] == 5
+    assert sum(weight is not None for weight in weights.values()) == 1
+    # 原来的规则不变
+    assert all('soft_weight' not in rule for rule in spec['rules'])
+    with pytest.raises(ValueError, match='未知的约束规则'):
+        apply_soft_weights(spec, {'不存在的规则': 1})
+
+    relaxed = apply_soft_weights(named, 100)
+    for rule in relaxed['rules']:
+        if rule['type'] in HARD_RULE_TYPES:
+            assert 'soft_weight' not in rule
+        else:
+            assert rule['soft_weight'] == (5 if rule['name'] == '科学周二不能接晚托' else 100)
+
+
+def test_soft_mode_on_feasible_timetable(classes_file):
+    scheduler = StudySessionScheduler(classes_file, soft=100)
+    assert scheduler.compiled.soft.any()
+    # 软约束行不参与固定变量，也都保留
+    assert scheduler.presolved.keep[scheduler.compiled.soft].all()
+
+    schedule = scheduler.solve()
+    assert scheduler.objective_value == 2
+    assert scheduler.violation_report(schedule) == []
+
+
+def test_soft_mode_on_infeasible_timetable(fixed_schedule, write_classes):
+    fixed_schedule['班级8']['周二'][2]['course'] = '数'
+    classes_file = write_classes(fixed_schedule)
+    assert StudySessionScheduler(classes_file).solve() is None
+
+    scheduler = StudySessionScheduler(classes_file, soft=100)
+    schedule = scheduler.solve()
+    assert schedule is not None
+
+    result = ScheduleValidator(scheduler).validate(schedule)
+    # 硬约束仍然满足，违反的都是软约束
+    assert not result.violations and result.soft_violations
+    report = scheduler.violation_report(schedule)
+    assert report and all(item['soft'] for item in report)
+    penalty = sum(item['penalty'] for item in report)
+    assert penalty == result.soft_penalty
+    assert scheduler.objective_value == pytest.approx(result.penalty + penalty)
+    # 松弛变量的取值就是违反的节数
+    slack = sum(var.varValue * scheduler.compiled.weights[r]
+                for r, terms in scheduler.slack_vars.items() for var, _ in terms)
+    assert slack == pytest.approx(penalty)
+    # 诊断只看硬约束，放宽后没有冲突
+    assert scheduler.diagnose_infeasibility()['feasible']
+
+
+def test_cheap_soft_rule_traded_for_continuity(classes_file):
+    # 违反一节的惩罚小于一次连续上课时，最优值不会比全是硬约束时大
+    scheduler = StudySessionScheduler(classes_file, soft={'早自修语文英语各2节社会1节': 0.5})
+    schedule = scheduler.solve()
+    result = ScheduleValidator(scheduler).validate(schedule)
+    assert scheduler.objective_value <= 2
+    assert scheduler.objective_value == pytest.approx(result.penalty + result.soft_penalty)
@@ -0,0 +1,58 @@
+import pytest
+
+from backends import CbcBackend
+from main import StudySessionScheduler
+from model_cache import ModelCache
+
+
+def test_pool_schedules_distinct_with_cache(classes_file, tmp_path):
+    scheduler = StudySessionScheduler(classes_file)
+    cache = ModelCache(str(tmp_path / 'cache'))
+    pool = scheduler.solve_pool(4, gap=1, backend=CbcBackend(cache=cache))
+
+    assert len(pool) == 4
+    schedules = [item['schedule'] for item in pool]
+    assert all(a != b for i, a in enumerate(schedules) for b in schedules[i + 1:])
+    # 缓存中只有未加排除约束的模型
+    assert len([name for name in (tmp_path / 'cache').iterdir() if name.suffix == '.mps']) == 1
+
+
+def test_pool_with_cache_matches_uncached(classes_file, tmp_path):
+    cached = StudySessionScheduler(classes_file).solve_pool(
+        3, gap=1, backend=CbcBackend(cache=ModelCache(str(tmp_path / 'cache'))))
+    uncached = StudySessionScheduler(classes_file).solve_pool(3, gap=1)
+    assert [item['objective'] for item in cached] == [item['objective'] for item in uncached]
+
+
+def test_pool_rejects_native_backend(classes_file):
+    from native import NativeBackend
+
+    scheduler = StudySessionScheduler(classes_file)
+    with pytest.raises(ValueError, match='solve_pool'):
+        scheduler.solve_pool(3, backend=NativeBackend())
+
+
+def test_pool_symmetric_alternatives(fixed_schedule, write_classes):
+    # 班级5、6 与班级7、8 两组可以互换，预处理加了一条对称性约束
+    grade = {'班级5': fixed_schedule['班级7'], '班级6': fixed_schedule['班级8'],
+             '班级7': fixed_schedule['班级7'], '班级8': fixed_schedule['班级8']}
+    scheduler = StudySessionScheduler(write_classes(grade))
+
+    def satisfies_cut(pool):
+        cut = scheduler.prob.get_constraint_by_name('sym_0')
+        satisfied = []
+        for item in pool:
+            scheduler.set_warm_start(item['schedule'])
+            satisfied.append(cut.valid())
+        return satisfied
+
+    pool = scheduler.solve_pool(6, gap=0)
+    assert len(pool) == 6 and all(satisfies_cut(pool))
+
+    pool = scheduler.solve_pool(6, gap=0, symmetric=True)
+    assert len(pool) == 6 and not all(satisfies_cut(pool))
+    schedules = [item['schedule'] for item in pool]
+    assert all(a != b for i, a in enumerate(schedules) for b in schedules[i + 1:])
+    # 对称性约束在返回前加回模型，排除约束都已去掉
+    names = [constraint.name for constraint in scheduler.prob.constraints()]
+    assert 'sym_0' in names and not any(name.startswith('pool_') for name in names)
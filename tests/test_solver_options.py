@@ -0,0 +1,85 @@
+import pytest
+from pulp import (LpStatusOptimal, LpStatusNotSolved, LpSolutionOptimal, LpSolutionIntegerFeasible,
+                  LpSolutionNoSolutionFound)
+
+from backends import CbcBackend, TIMEOUT_GRACE
+from cbc import parse_progress, read_solution
+from main import StudySessionScheduler
+from native import NativeBackend
+from validation import ScheduleValidator
+
+
+@pytest.mark.parametrize('line, expected', [
+    ("Cbc0012I Integer solution of 4 found by DiveCoefficient after 0 iterations and 0 nodes (0.01 seconds)",
+     {'incumbent': 4.0}),
+    ("Cbc0010I After 100 nodes, 5 on tree, 4 best solution, best possible 2.5 (0.50 seconds)",
+     {'incumbent': 4.0, 'bound': 2.5}),
+    ("Cbc0010I After 0 nodes, 1 on tree, 1e+50 best solution, best possible 2 (0.01 seconds)", {'bound': 2.0}),
+    ("Cbc0013I At root node, 0 cuts changed objective from 1.5 to 2 in 1 passes", {'bound': 2.0}),
+    ("Continuous objective value is 1.5 - 0.00 seconds", {'bound': 1.5}),
+    ("Cbc0001I Search completed - best objective 2, took 10 iterations and 0 nodes (0.02 seconds)",
+     {'incumbent': 2.0}),
+    ("Cbc0038I Full problem 75 rows 123 columns, reduced to 0 rows 0 columns", {}),
+])
+def test_parse_progress(line, expected):
+    assert parse_progress(line) == expected
+
+
+@pytest.mark.parametrize('header, fractional, expected', [
+    ("Optimal - objective value 2.00000000", False, (LpStatusOptimal, LpSolutionOptimal, 2.0)),
+    ("Stopped on time - objective value 3.00000000", False, (LpStatusOptimal, LpSolutionIntegerFeasible, 3.0)),
+    # 没有整数解就停下时解文件中是线性松弛的取值和目标值
+    ("Stopped on time - objective value 1.50000000", True, (LpStatusNotSolved, LpSolutionNoSolutionFound, None)),
+])
+def test_read_solution_status(tmp_path, header, fractional, expected):
+    path = tmp_path / 'model.sol'
+    path.write_text(f"{header}\n      0 x_a  1  0\n      1 x_b  {0.5 if fractional else 0}  0\n")
+    status, sol_status, objective, values = read_solution(str(path), {'x_a': 'a', 'x_b': 'b'})
+    assert (status, sol_status, objective) == expected
+    assert values['a'] == 1.0
+
+
+def test_cbc_options():
+    backend = CbcBackend(options=('presolve off',), time_limit=5, gap=0.1, threads=2)
+    assert backend._cbc_options() == (['presolve off', 'sec 5', 'ratio 0.1', 'threads 2'], 5 + TIMEOUT_GRACE)
+    assert CbcBackend()._cbc_options() == ([], None)
+
+
+def test_options_with_backend_rejected(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    with pytest.raises(ValueError, match='time_limit'):
+        scheduler.solve(backend=CbcBackend(), time_limit=5)
+
+
+def test_progress_matches_objective(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    updates = []
+    schedule = scheduler.solve(time_limit=30, gap=0, progress=updates.append)
+
+    assert schedule is not None and scheduler.prob.sol_status == LpSolutionOptimal
+    assert updates and set(updates[0]) == {'seconds', 'incumbent', 'bound'}
+    seconds = [info['seconds'] for info in updates]
+    assert seconds == sorted(seconds)
+    # 进度中的目标值和 objective_value 一样包括只含正课的窗口
+    assert updates[-1]['incumbent'] == scheduler.objective_value
+    assert all(info['bound'] is None or info['bound'] <= scheduler.objective_value for info in updates)
+
+
+def test_gap_within_bound(classes_file):
+    optimum = StudySessionScheduler(classes_file)
+    optimum.solve()
+    for backend in (CbcBackend(gap=0.5), NativeBackend(gap=0.5)):
+        scheduler = StudySessionScheduler(classes_file)
+        schedule = scheduler.solve(backend=backend)
+        assert ScheduleValidator(scheduler).validate(schedule).valid
+        # 最好解与下界相差不超过 0.5×最好解，即不超过最优值的两倍
+        assert optimum.objective_value <= scheduler.objective_value <= 2 * optimum.objective_value
+
+
+def test_native_time_limit(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    schedule = scheduler.solve(backend=NativeBackend(time_limit=30))
+    # 时限内搜索完成时与不限时相同，证明了最优
+    assert scheduler.prob.sol_status == LpSolutionOptimal
+    assert scheduler.objective_value == 2
+    assert ScheduleValidator(scheduler).validate(schedule).valid
@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from main import StudySessionScheduler
+from study_hours import run_batch, count_weekly_hours_simple, check_study_schedule
+from timetable import discover_teachers, teacher_label
+from validation import ScheduleValidator
+
+
+def baseline_weekly_hours(study_schedule, fixed_schedule=None):
+    """最初的 count_weekly_hours_simple（逐格扫描、立即拼接说明），只适用于自带的两个班"""
+    classes = ['班级7', '班级8']
+    days = ['周一', '周二', '周三', '周四', '周五']
+    subjects = ['语', '数', '英', '科', '社']
+
+    teacher_stats = {}
+    for subject in subjects:
+        teacher_stats[subject] = {
+            'daily_hours': {day: 0 for day in days},
+            'weekly_total': 0,
+            'study_hours': 0,
+            'course_details': {day: [] for day in days}
+        }
+
+    for day in days:
+        for subject in subjects:
+            daily_count = 0
+            day_details = []
+
+            for class_name in classes:
+                for period in ['早自习', '午自习', '晚自习']:
+                    if study_schedule.get(class_name, {}).get(day, {}).get(period) == subject:
+                        daily_count += 1
+                        day_details.append(f"{period}({class_name})")
+
+            if fixed_schedule:
+                for class_name in classes:
+                    for i, period_info in enumerate(fixed_schedule[class_name][day]):
+                        if period_info['course'] == subject:
+                            daily_count += 1
+                            period_num = i + 1 if i < 4 else i + 2
+                            day_details.append(f"第{period_num}节({class_name}-正课)")
+
+            teacher_stats[subject]['daily_hours'][day] = daily_count
+            teacher_stats[subject]['weekly_total'] += daily_count
+            teacher_stats[subject]['course_details'][day] = day_details
+
+            if not fixed_schedule:
+                teacher_stats[subject]['study_hours'] += daily_count
+
+    return teacher_stats
+
+
+def test_matches_baseline(classes_file, fixed_schedule):
+    scheduler = StudySessionScheduler(classes_file)
+    validator = ScheduleValidator(scheduler)
+    rng = np.random.RandomState(0)
+    schedules = [scheduler.solve()]
+    for _ in range(5):
+        # 随机安排，含未安排（None）的时段
+        codes = rng.randint(-1, len(scheduler.subjects), size=scheduler.x.shape[:3]).astype(np.int8)
+        schedules.append(validator.decode(codes))
+
+    for schedule in schedules:
+        for fixed in (fixed_schedule, None):
+            expected = baseline_weekly_hours(schedule, fixed)
+            hours = count_weekly_hours_simple(schedule, fixed)
+            # 说明按需生成，逐位老师取出与一次生成全部相同
+            for teacher in hours.teacher_names:
+                assert hours.course_details(teacher) == expected[teacher]['course_details']
+                assert hours.daily_hours(teacher) == expected[teacher]['daily_hours']
+            assert hours.to_dict() == expected
+
+
+def write_draft(path, study_schedule):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'自修课安排': study_schedule}, f, ensure_ascii=False)
+
+
+def make_drafts(directory, classes_file):
+    """一个有效的草稿、一个有冲突的草稿和一个不是 JSON 的文件"""
+    schedule = StudySessionScheduler(classes_file).solve()
+    write_draft(directory / 'a_valid.json', schedule)
+    conflict = json.loads(json.dumps(schedule))
+    conflict['班级8']['周一']['早自习'] = conflict['班级7']['周一']['早自习']
+    write_draft(directory / 'b_conflict.json', conflict)
+    (directory / 'c_broken.json').write_text('{', encoding='utf-8')
+    return schedule, conflict
+
+
+def test_batch_jsonl_report(classes_file, tmp_path):
+    drafts = tmp_path / 'drafts'
+    drafts.mkdir()
+    schedule, conflict = make_drafts(drafts, classes_file)
+    output = str(tmp_path / 'report.jsonl')
+
+    assert run_batch(str(drafts), output, classes_file, workers=2) == (3, 2)
+    with open(output, 'r', encoding='utf-8') as f:
+        records = {os.path.basename(record['file']): record for record in map(json.loads, f)}
+    assert sorted(records) == ['a_valid.json', 'b_conflict.json', 'c_broken.json']
+
+    with open(classes_file, 'r', encoding='utf-8') as f:
+        fixed_schedule = json.load(f)
+    teachers = discover_teachers(list(schedule), fixed_schedule)
+    for name, draft in [('a_valid.json', schedule), ('b_conflict.json', conflict)]:
+        record = records[name]
+        assert record['error'] is None
+        assert record['violations'] == check_study_schedule(draft, teachers)
+        stats = count_weekly_hours_simple(draft, fixed_schedule, teachers)
+        assert record['teachers'] == {
+            teacher: {'daily_hours': stats.daily_hours(teacher), 'weekly_total': total}
+            for teacher, total in zip(stats.teacher_names, stats.weekly_total.tolist())}
+    assert records['a_valid.json']['valid'] is True
+    assert records['b_conflict.json']['valid'] is False
+    assert records['b_conflict.json']['violations']
+    assert records['c_broken.json']['error'].startswith('JSONDecodeError')
+
+
+def test_batch_csv_report(classes_file, tmp_path):
+    drafts = tmp_path / 'drafts'
+    drafts.mkdir()
+    schedule, _ = make_drafts(drafts, classes_file)
+    output = str(tmp_path / 'report.csv')
+
+    run_batch(str(drafts), output, classes_file, workers=1)
+    with open(output, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+
+    with open(classes_file, 'r', encoding='utf-8') as f:
+        stats = count_weekly_hours_simple(schedule, json.load(f))
+    valid_rows = [row for row in rows if row['文件'].endswith('a_valid.json')]
+    assert [row['老师'] for row in valid_rows] == [teacher_label(teacher) for teacher in stats.teacher_names]
+    for row, total in zip(valid_rows, stats.weekly_total.tolist()):
+        assert int(row['周总计']) == total
+        assert row['有效'] == 'True'
+    broken = [row for row in rows if row['文件'].endswith('c_broken.json')]
+    assert len(broken) == 1 and broken[0]['老师'] == '' and broken[0]['错误']
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from main import StudySessionScheduler
+from timetable import EMPTY
+from validation import ScheduleValidator
+
+
+@pytest.fixture
+def scheduler(classes_file):
+    return StudySessionScheduler(classes_file, soft={'语文早自习进度平衡': 3})
+
+
+def test_score_matches_validate(scheduler):
+    validator = ScheduleValidator(scheduler)
+    optimum = validator.encode(scheduler.solve())
+    rng = np.random.RandomState(0)
+    # 最优解、随机改动几格的方案和完全随机的方案
+    codes = [optimum]
+    for n_changes in [1, 2, 4, 8]:
+        for _ in range(10):
+            changed = optimum.copy()
+            cells = rng.choice(changed.size, n_changes, replace=False)
+            changed.flat[cells] = rng.randint(EMPTY, len(scheduler.subjects), n_changes)
+            codes.append(changed)
+    codes += list(rng.randint(EMPTY, len(scheduler.subjects), (10,) + optimum.shape).astype(np.int8))
+    scores = validator.score(np.stack(codes))
+
+    for i, schedule_codes in enumerate(codes):
+        result = validator.validate(validator.decode(schedule_codes))
+        assert scores.hard_violations[i] == len(result.messages)
+        assert scores.valid[i] == result.valid
+        assert scores.continuous_count[i] == result.continuous_count
+        assert scores.science_continuous[i] == result.science_continuous
+        assert scores.penalty[i] == result.penalty
+        assert scores.soft_penalty[i] == result.soft_penalty
+    assert scores.valid[0] and not scores.valid.all()
+
+
+def test_class_subject_without_teacher(classes_file):
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.teachers['语']['classes'] = ['班级7']
+    with pytest.raises(ValueError, match='班级8的语没有任课老师'):
+        ScheduleValidator(scheduler)
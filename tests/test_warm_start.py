@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+
+from backends import CbcBackend
+from main import StudySessionScheduler, load_study_schedule
+from validation import ScheduleValidator
+
+
+def test_load_study_schedule_formats(classes_file, tmp_path):
+    schedule = StudySessionScheduler(classes_file).solve()
+    for name, data in [('complete.json', {'study_schedule': schedule, 'complete_schedule': {}}),
+                       ('input.json', {'自修课安排': schedule})]:
+        path = tmp_path / name
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+        assert load_study_schedule(str(path)) == schedule
+
+
+def test_warm_start_values(classes_file, tmp_path):
+    schedule = StudySessionScheduler(classes_file).solve()
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.set_warm_start(schedule)
+
+    for ci, class_name in enumerate(scheduler.classes):
+        for di, day in enumerate(scheduler.days):
+            for pi, period in enumerate(scheduler.study_periods):
+                for si, subject in enumerate(scheduler.subjects):
+                    expected = 1 if schedule[class_name][day][period] == subject else 0
+                    assert scheduler.warm_start_values[scheduler.x[ci, di, pi, si].name] == expected
+    # 连续上课指示变量按该安排算出：初始解的目标值就是最优值
+    weights = np.array([scheduler.continuity_weights[t] for t in scheduler.teachers])
+    continuity = np.vectorize(lambda var: scheduler.warm_start_values[var.name])(scheduler.continuous_x)
+    assert (continuity.sum(axis=(1, 2)) @ weights) + scheduler._fixed_continuity_penalty() == 2
+
+    # 初始解文件包含每个设置了初始值的变量
+    mps_path, names, mst_path = CbcBackend()._write_model(scheduler, str(tmp_path))
+    with open(mst_path) as f:
+        lines = f.readlines()[1:]
+    written = {names[line.split()[1]]: float(line.split()[2]) for line in lines}
+    assert written == scheduler.warm_start_values
+
+
+def test_partial_warm_start(classes_file):
+    schedule = StudySessionScheduler(classes_file).solve()
+    scheduler = StudySessionScheduler(classes_file)
+    scheduler.set_warm_start({'班级7': schedule['班级7']})
+
+    assert len(scheduler.warm_start_values) == scheduler.x[0].size
+    assert all(var.name in scheduler.warm_start_values for var in scheduler.x[0].ravel())
+
+
+def test_solve_from_warm_start(classes_file):
+    previous = StudySessionScheduler(classes_file).solve()
+    scheduler = StudySessionScheduler(classes_file)
+    schedule = scheduler.solve(warm_start=previous)
+
+    assert scheduler.objective_value == 2
+    assert ScheduleValidator(scheduler).validate(schedule).valid
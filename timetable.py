@@ -0,0 +1,276 @@
+import json
+import numpy as np
+
+# 参与自修课排课的科目（每门科目对应一位或多位老师）
+SUBJECTS = ['语', '数', '英', '科', '社']
+STUDY_PERIODS = ['早自习', '午自习', '晚自习']
+# 一天11个时段中自修课所在的位置 -> 自修时段下标（0早自习 1-4上午正课 5午自习 6-9下午正课 10晚自习）
+STUDY_SLOTS = {0: 0, 5: 1, 10: 2}
+# 每天的第1-8节正课在11个时段中的位置
+FIXED_SLOTS = [1, 2, 3, 4, 6, 7, 8, 9]
+SLOTS_PER_DAY = 11
+# 连续上课窗口：一天中相邻的3个时段。含自修时段的窗口要建变量，只含正课的窗口由正课课表决定
+CONTINUOUS_WINDOWS = [list(range(start, start + 3)) for start in range(SLOTS_PER_DAY - 2)]
+STUDY_WINDOWS = [window for window in CONTINUOUS_WINDOWS if any(slot in STUDY_SLOTS for slot in window)]
+FIXED_WINDOWS = [window for window in CONTINUOUS_WINDOWS if window not in STUDY_WINDOWS]
+# 索引中表示"无正课"的科目编号
+EMPTY = -1
+# 完整课表中时段的类型：SLOT_TYPE[时段] 为 SLOT_TYPES 中的下标
+SLOT_TYPES = ['早自习', '正课', '午自习', '晚自习']
+EARLY_STUDY, LESSON, NOON_STUDY, EVENING_STUDY = range(len(SLOT_TYPES))
+SLOT_TYPE = [EARLY_STUDY] + [LESSON] * 4 + [NOON_STUDY] + [LESSON] * 4 + [EVENING_STUDY]
+
+
+def load_fixed_schedule(classes_file):
+    """加载正课课表（classes.json）"""
+    with open(classes_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def discover_classes(fixed_schedule):
+    """按文件中的顺序返回所有班级"""
+    return list(fixed_schedule.keys())
+
+
+def discover_days(fixed_schedule):
+    """以第一个班级的课表为准返回上课日，并检查各班是否一致"""
+    classes = discover_classes(fixed_schedule)
+    if not classes:
+        raise ValueError("课表中没有任何班级")
+    days = list(fixed_schedule[classes[0]].keys())
+    for class_name in classes[1:]:
+        if list(fixed_schedule[class_name].keys()) != days:
+            raise ValueError(f"{class_name}的上课日与{classes[0]}不一致")
+    return days
+
+
+def discover_teachers(class_names, fixed_schedule=None, subjects=SUBJECTS):
+    """从课表中识别老师及其任教班级
+
+    classes.json 中的正课可以带可选的 "teacher" 字段，指明该班该科目的任课老师；
+    未指明的班级按文件顺序两两配对，共用一位老师（与原来七、八两个班共用老师一致）。
+    全年级只有一组时老师编号就是科目名，否则为 "科目+序号"，如 "语1"、"语2"。
+
+    返回 {老师: {'subject': 科目, 'classes': [班级, ...]}}
+    """
+    teachers = {}
+    for subject in subjects:
+        explicit = {}
+        unassigned = []
+        for class_name in class_names:
+            teacher = None
+            if fixed_schedule:
+                for day_schedule in fixed_schedule[class_name].values():
+                    for period_info in day_schedule:
+                        if period_info['course'] == subject and period_info.get('teacher'):
+                            if teacher and teacher != period_info['teacher']:
+                                raise ValueError(f"{class_name}的{subject}课指定了多位老师: {teacher}, {period_info['teacher']}")
+                            teacher = period_info['teacher']
+            if teacher:
+                explicit.setdefault(teacher, []).append(class_name)
+            else:
+                unassigned.append(class_name)
+
+        for teacher, classes in explicit.items():
+            if teacher in teachers:
+                raise ValueError(f"老师{teacher}同时任教多门科目")
+            teachers[teacher] = {'subject': subject, 'classes': classes}
+
+        groups = [unassigned[i:i + 2] for i in range(0, len(unassigned), 2)]
+        for k, classes in enumerate(groups):
+            teacher = subject if len(groups) == 1 and not explicit else f"{subject}{k + 1}"
+            if teacher in teachers:
+                raise ValueError(f"老师编号冲突: {teacher}")
+            teachers[teacher] = {'subject': subject, 'classes': classes}
+
+    return teachers
+
+
+def class_teacher_map(teachers):
+    """返回 {(班级, 科目): 老师}"""
+    mapping = {}
+    for teacher, info in teachers.items():
+        for class_name in info['classes']:
+            mapping[(class_name, info['subject'])] = teacher
+    return mapping
+
+
+def teacher_label(teacher):
+    """老师的显示名称，如 "语学老师"、"语1老师" """
+    if teacher in SUBJECTS:
+        return f"{teacher}学老师"
+    return f"{teacher}老师"
+
+
+class FixedScheduleIndex:
+    """正课占用索引
+
+    加载时把 classes.json 一次性转换为 NumPy 数组，之后的建模、验证、老师视图和
+    课时统计都直接读数组，不再反复遍历课表列表：
+    - grid[班级, 天, 时段]: 11个时段上的正课科目编号，自修时段为 EMPTY
+    - daily_counts[班级, 天, 科目]: 每班每天各科目的正课节数
+    科目编号与 courses 对应，前几位固定为 SUBJECTS，其余课程（体育、美术等）按出现顺序排在后面。
+    """
+
+    def __init__(self, fixed_schedule, classes=None, days=None):
+        self.classes = list(classes) if classes is not None else discover_classes(fixed_schedule)
+        self.days = list(days) if days is not None else discover_days(fixed_schedule)
+        self.class_idx = {class_name: i for i, class_name in enumerate(self.classes)}
+        self.day_idx = {day: i for i, day in enumerate(self.days)}
+
+        self.courses = list(SUBJECTS)
+        for class_name in self.classes:
+            for day in self.days:
+                for period_info in fixed_schedule[class_name][day]:
+                    if period_info['course'] not in self.courses:
+                        self.courses.append(period_info['course'])
+        self.course_id = {course: i for i, course in enumerate(self.courses)}
+
+        self.grid = np.full((len(self.classes), len(self.days), SLOTS_PER_DAY), EMPTY, dtype=np.int16)
+        for ci, class_name in enumerate(self.classes):
+            for di, day in enumerate(self.days):
+                for i, period_info in enumerate(fixed_schedule[class_name][day]):
+                    self.grid[ci, di, FIXED_SLOTS[i]] = self.course_id[period_info['course']]
+        self._count()
+
+    def _count(self):
+        """根据 grid 重新计算每日各科目节数"""
+        occupied = self.grid[..., None] == np.arange(len(self.courses), dtype=np.int16)
+        self.daily_counts = occupied.sum(axis=2, dtype=np.int16)
+
+    def set_course(self, class_name, day, period, course):
+        """修改某班某天第 period 节（1-8）正课，返回原来的课程名称"""
+        ci, di = self.class_idx[class_name], self.day_idx[day]
+        slot = FIXED_SLOTS[period - 1]
+        old = self.courses[self.grid[ci, di, slot]]
+        if course not in self.course_id:
+            self.course_id[course] = len(self.courses)
+            self.courses.append(course)
+        self.grid[ci, di, slot] = self.course_id[course]
+        self._count()
+        return old
+
+    def count(self, class_name, day, course):
+        """某班某天某课程的正课节数"""
+        course_id = self.course_id.get(course)
+        if course_id is None:
+            return 0
+        return int(self.daily_counts[self.class_idx[class_name], self.day_idx[day], course_id])
+
+    def course_at(self, class_name, day, slot):
+        """某班某天某时段的正课名称，自修时段返回空字符串"""
+        course_id = self.grid[self.class_idx[class_name], self.day_idx[day], slot]
+        return self.courses[course_id] if course_id != EMPTY else ""
+
+    def teacher_timeline(self, class_names, subject):
+        """若干班级（同一位老师任教）某科目每天各时段的正课班级数，形状为 天×时段"""
+        class_ids = [self.class_idx[class_name] for class_name in class_names]
+        return (self.grid[class_ids] == self.course_id[subject]).sum(axis=0, dtype=np.int16)
+
+
+def slot_label(slot):
+    """11个时段的显示名称：自修时段为 "早自习" 等，其余为 "第N节"（N 为时段编号）"""
+    if SLOT_TYPE[slot] == LESSON:
+        return f"第{slot}节"
+    return SLOT_TYPES[SLOT_TYPE[slot]]
+
+
+class CompleteSchedule:
+    """完整课表（正课 + 自修课）
+
+    grid[班级, 天, 时段] 为11个时段的课程编号（int8），编号与 courses 对应（前几位为 SUBJECTS），
+    没有安排的自修时段为 EMPTY；各时段的类型见 SLOT_TYPE。显示和统计都直接读数组，
+    只在保存结果时由 to_dict 转换成 JSON 的格式。
+    """
+
+    def __init__(self, classes, days, courses, grid):
+        self.classes = list(classes)
+        self.days = list(days)
+        self.courses = list(courses)
+        self.course_id = {course: i for i, course in enumerate(self.courses)}
+        self.grid = grid
+        self._teacher_timetables = {}
+
+    @classmethod
+    def from_codes(cls, fixed_index, codes):
+        """由正课索引和 班级×天×自修时段 的科目编号数组（见 ScheduleValidator.encode）生成"""
+        if len(fixed_index.courses) > np.iinfo(np.int8).max:
+            raise ValueError(f"课程种类过多: {len(fixed_index.courses)}")
+        grid = fixed_index.grid.astype(np.int8)
+        grid[:, :, list(STUDY_SLOTS)] = codes
+        return cls(fixed_index.classes, fixed_index.days, fixed_index.courses, grid)
+
+    def course(self, ci, di, slot):
+        """某班某天某时段的课程名称，没有安排时为空字符串"""
+        course_id = self.grid[ci, di, slot]
+        return self.courses[course_id] if course_id != EMPTY else ""
+
+    def teacher_timetable(self, teachers):
+        """按老师的倒排索引（TeacherTimetable），同一组老师只建一次"""
+        key = tuple(teachers)
+        if key not in self._teacher_timetables:
+            self._teacher_timetables[key] = TeacherTimetable(self, teachers)
+        return self._teacher_timetables[key]
+
+    def to_dict(self):
+        """转换成 {班级: {天: [{"period", "course", "type"}, ...]}}，用于保存结果"""
+        types = [SLOT_TYPES[slot_type] for slot_type in SLOT_TYPE]
+        names = self.courses + [""]  # 下标 EMPTY(-1) 取到空字符串
+        return {
+            class_name: {
+                day: [{"period": slot, "course": names[course_id], "type": types[slot]}
+                      for slot, course_id in enumerate(self.grid[ci, di].tolist())]
+                for di, day in enumerate(self.days)
+            }
+            for ci, class_name in enumerate(self.classes)
+        }
+
+
+class TeacherTimetable:
+    """完整课表按老师的倒排索引
+
+    classes[老师下标][天下标][时段] 为这位老师在该时段上课的班级（按任教班级的顺序），
+    counts[老师, 天, 时段] 为对应的班级数。老师课表、周课时统计、课程详情和连续上课次数都读这里，
+    不必为每位老师的每个时段再扫描所有班级。
+    """
+
+    def __init__(self, complete_schedule, teachers):
+        self.teachers = list(teachers)
+        grid = complete_schedule.grid
+        n_classes, n_days, _ = grid.shape
+        class_idx = {class_name: ci for ci, class_name in enumerate(complete_schedule.classes)}
+        # 班级×课程 的任课老师和该班在老师任教班级中的位置；多出的最后一列对应 EMPTY
+        teacher_of = np.full((n_classes, len(complete_schedule.courses) + 1), -1, dtype=np.intp)
+        rank = np.zeros_like(teacher_of)
+        class_names = []
+        for ti, info in enumerate(teachers.values()):
+            class_ids = [class_idx[class_name] for class_name in info['classes']]
+            teacher_of[class_ids, complete_schedule.course_id[info['subject']]] = ti
+            rank[class_ids, complete_schedule.course_id[info['subject']]] = np.arange(len(class_ids))
+            class_names.append(info['classes'])
+
+        # 一次扫描整个课表：每节有任课老师的课按 老师、天、时段、任教班级顺序 排好
+        ci, di, slot = np.nonzero(teacher_of[np.arange(n_classes)[:, None, None], grid] >= 0)
+        course = grid[ci, di, slot]
+        ti, k = teacher_of[ci, course], rank[ci, course]
+        order = np.lexsort((k, slot, di, ti))
+        self.counts = np.zeros((len(self.teachers), n_days, SLOTS_PER_DAY), dtype=np.int16)
+        np.add.at(self.counts, (ti, di, slot), 1)
+
+        self.classes = [[[[] for _ in range(SLOTS_PER_DAY)] for _ in range(n_days)] for _ in self.teachers]
+        for t, d, p, j in zip(ti[order].tolist(), di[order].tolist(), slot[order].tolist(), k[order].tolist()):
+            self.classes[t][d][p].append(class_names[t][j])
+
+    @property
+    def daily_hours(self):
+        """老师×天 的课时数"""
+        return self.counts.sum(axis=2)
+
+    def continuous_windows(self):
+        """老师×天×起始时段：从该时段起连续3个时段都有课"""
+        busy = self.counts > 0
+        return busy[..., :-2] & busy[..., 1:-1] & busy[..., 2:]
+
+    def continuous_counts(self):
+        """每位老师一周中连续3个时段都有课的次数"""
+        return self.continuous_windows().sum(axis=(1, 2))
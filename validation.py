@@ -0,0 +1,178 @@
+import numpy as np
+
+from timetable import EMPTY, STUDY_SLOTS
+
+
+class ValidationResult:
+    """单个排课方案的验证结果
+
+    violations 按规则名称分组保存硬约束的违反说明，soft_violations 保存软约束的违反说明，
+    soft_amounts 为各条软约束违反的节数，soft_penalty 为按权重合计的惩罚；
+    actual 为每个约束行的实际节数（左端取值加上正课的常数），可用 CompiledConstraints.figures 按规则汇总；
+    details 保存连续上课统计数组，由 StudySessionScheduler.validate_constraints 负责打印。
+    """
+
+    def __init__(self):
+        self.violations = {}
+        self.actual = None
+        self.soft_violations = {}
+        self.soft_amounts = {}
+        self.soft_penalty = 0
+        self.details = {}
+        self.continuous_count = 0
+        self.science_continuous = 0
+        self.penalty = 0
+
+    def add(self, rule, message):
+        self.violations.setdefault(rule, []).append(message)
+
+    def add_soft(self, rule, message, amount, weight):
+        self.soft_violations.setdefault(rule, []).append(message)
+        self.soft_amounts[rule] = self.soft_amounts.get(rule, 0) + amount
+        self.soft_penalty += amount * weight
+
+    @property
+    def valid(self):
+        return not any(self.violations.values())
+
+    @property
+    def messages(self):
+        return [message for messages in self.violations.values() for message in messages]
+
+
+class ScheduleScores:
+    """批量评分结果，每个字段都是长度为 N 的数组；soft_penalty 为软约束按权重合计的惩罚"""
+
+    def __init__(self, hard_violations, continuous_count, science_continuous, penalty, soft_penalty):
+        self.hard_violations = hard_violations
+        self.continuous_count = continuous_count
+        self.science_continuous = science_continuous
+        self.penalty = penalty
+        self.soft_penalty = soft_penalty
+
+    @property
+    def valid(self):
+        return self.hard_violations == 0
+
+
+class ScheduleValidator:
+    """向量化的排课验证引擎
+
+    排课方案先转换成 班级×天×自修时段 的科目编号数组（EMPTY 表示未安排），
+    再展开成0/1变量，对约束规则编译出的约束行一次算出左端取值并判断违反；
+    "连续3节"软指标用老师的11时段时间表计算。数组可以额外带一个批量维度，
+    一次评估成千上万个候选方案。
+    """
+
+    def __init__(self, scheduler):
+        self.classes = scheduler.classes
+        self.days = scheduler.days
+        self.subjects = scheduler.subjects
+        self.study_periods = scheduler.study_periods
+        self.teachers = scheduler.teachers
+        self.compiled = scheduler.compiled
+        self.subject_idx = scheduler.subject_idx
+        self.fixed_timeline = scheduler.fixed_timeline > 0
+        # 自修时段在11个时段中的位置，按 study_periods 的顺序排列
+        self.study_slots = [slot for slot, pi in sorted(STUDY_SLOTS.items(), key=lambda item: item[1])]
+
+        # 老师：任教科目、(班级,科目)->老师 的映射和连续上课权重
+        self.teacher_names = list(self.teachers)
+        teacher_subject = np.array([self.subject_idx[info['subject']] for info in self.teachers.values()],
+                                   dtype=np.intp)
+        teacher_of = np.full((len(self.classes), len(self.subjects)), -1, dtype=np.intp)
+        for ti, info in enumerate(self.teachers.values()):
+            for class_name in info['classes']:
+                teacher_of[scheduler.class_idx[class_name], self.subject_idx[info['subject']]] = ti
+        # 每个班的每门自修科目都要有任课老师，否则无法按老师汇总
+        missing = np.argwhere(teacher_of < 0)
+        if len(missing):
+            ci, si = missing[0]
+            raise ValueError(f"{self.classes[ci]}的{self.subjects[si]}没有任课老师")
+        # 按老师排序后可以用 reduceat 一次把班级×科目汇总到老师
+        self._teacher_order = np.argsort(teacher_of.ravel(), kind='stable')
+        self._teacher_starts = np.searchsorted(teacher_of.ravel()[self._teacher_order],
+                                               np.arange(len(self.teacher_names)))
+        self.teacher_weight = np.array([scheduler.continuity_weights[t] for t in self.teacher_names])
+        self.science_teachers = teacher_subject == self.subject_idx['科']
+
+    def encode(self, schedule):
+        """把排课方案（字典）转换成 班级×天×自修时段 的科目编号数组"""
+        codes = np.full((len(self.classes), len(self.days), len(self.study_periods)), EMPTY, dtype=np.int8)
+        for ci, class_name in enumerate(self.classes):
+            for di, day in enumerate(self.days):
+                for pi, period in enumerate(self.study_periods):
+                    subject = schedule[class_name][day][period]
+                    if subject:
+                        codes[ci, di, pi] = self.subject_idx[subject]
+        return codes
+
+    def decode(self, codes):
+        """把 班级×天×自修时段 的科目编号数组转换回排课方案（字典），未安排为 None"""
+        return {class_name: {day: {period: self.subjects[codes[ci, di, pi]] if codes[ci, di, pi] != EMPTY else None
+                                   for pi, period in enumerate(self.study_periods)}
+                             for di, day in enumerate(self.days)}
+                for ci, class_name in enumerate(self.classes)}
+
+    def encode_batch(self, schedules):
+        """把多个排课方案转换成 N×班级×天×自修时段 的数组"""
+        return np.stack([self.encode(schedule) for schedule in schedules])
+
+    def _evaluate(self, codes):
+        """对 N×班级×天×自修时段 的数组计算各约束行的取值、违反情况和连续上课统计"""
+        n = codes.shape[0]
+        onehot = codes[..., None] == np.arange(len(self.subjects), dtype=codes.dtype)
+
+        # 硬约束：所有约束行一次算完
+        activity = self.compiled.activity(onehot.reshape(n, -1))
+        violated = self.compiled.violated(activity)
+
+        # 按老师汇总自修课：N×老师×天×自修时段 的上课班级数
+        per_class_subject = onehot.transpose(0, 1, 4, 2, 3).reshape(n, -1, len(self.days), len(self.study_periods))
+        teacher_study = np.add.reduceat(per_class_subject[:, self._teacher_order].astype(np.int16),
+                                        self._teacher_starts, axis=1)
+
+        # 软约束: 老师连续3节
+        timeline = np.broadcast_to(self.fixed_timeline, (n,) + self.fixed_timeline.shape).copy()
+        timeline[..., self.study_slots] |= teacher_study > 0
+        windows = timeline[..., :-2] & timeline[..., 1:-1] & timeline[..., 2:]
+        return activity, violated, windows
+
+    def score(self, codes):
+        """批量评分：codes 为 N×班级×天×自修时段 的数组，返回 ScheduleScores"""
+        codes = np.asarray(codes)
+        if codes.ndim == 3:
+            codes = codes[None]
+        activity, violated, windows = self._evaluate(codes)
+        continuous = windows.sum(axis=(2, 3))
+        soft = self.compiled.soft
+        return ScheduleScores(
+            hard_violations=violated[:, ~soft].sum(axis=1),
+            continuous_count=continuous.sum(axis=1),
+            science_continuous=continuous[:, self.science_teachers].sum(axis=1),
+            penalty=continuous @ self.teacher_weight,
+            soft_penalty=self.compiled.violation(activity)[:, soft] @ self.compiled.weights[soft],
+        )
+
+    def validate(self, schedule):
+        """验证单个排课方案（字典或编号数组），返回按规则分组的 ValidationResult"""
+        codes = schedule if isinstance(schedule, np.ndarray) else self.encode(schedule)
+        activity, violated, windows = self._evaluate(codes[None])
+        activity, violated, windows = activity[0], violated[0], windows[0]
+
+        result = ValidationResult()
+        result.actual = activity + self.compiled.offset
+        amounts = self.compiled.violation(activity)
+        for r in np.flatnonzero(violated):
+            name, message = self.compiled.names[self.compiled.family[r]], self.compiled.describe(r, activity[r])
+            if self.compiled.soft[r]:
+                result.add_soft(name, message, int(amounts[r]), float(self.compiled.weights[r]))
+            else:
+                result.add(name, message)
+
+        continuous = windows.sum(axis=(1, 2))
+        result.details = {'continuous_windows': windows, 'teacher_continuous': continuous}
+        result.continuous_count = int(continuous.sum())
+        result.science_continuous = int(continuous[self.science_teachers].sum())
+        result.penalty = int(continuous @ self.teacher_weight)
+        return result